@@ -0,0 +1,84 @@
+"""
+Benchmark latest-file selection and document creation over a synthetic commit history.
+
+Usage:
+    python -m benchmarks.bench_github_documents --commits 50000 --files 5000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from models.commit import CommitData, FileInfo
+from services.github_service import create_document, create_documents, get_latest_files
+
+
+def build_history(commit_count: int, file_count: int, files_per_commit: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    history = []
+    for i in range(commit_count):
+        sha = f"{i:040x}"
+        files = [
+            FileInfo(filename=f"src/module_{n}.py", status="modified", additions=1, deletions=1, changes=2,
+                     patch="@@ -1 +1 @@\n-old\n+new")
+            for n in rng.sample(range(file_count), files_per_commit)
+        ]
+        history.append(CommitData(author="bench", message=f"commit {i}",
+                                  date=(start + timedelta(minutes=i)).isoformat(),
+                                  url=f"https://github.com/bench/repo/commit/{sha}", repo_name="repo",
+                                  commit_id=sha, files=files))
+    rng.shuffle(history)
+    return history
+
+
+def previous_get_latest_files(all_commit_data):
+    """The previous implementation, kept for comparison: one pass, comparing ISO date strings."""
+    latest_files = {}
+    for commit_data in all_commit_data:
+        for file in commit_data.files:
+            if file.filename not in latest_files or commit_data.date > latest_files[file.filename]['date']:
+                latest_files[file.filename] = {'file': file, 'commit_id': commit_data.commit_id,
+                                               'date': commit_data.date}
+    return latest_files
+
+
+def previous_create_documents(latest_files, all_commit_data, job_id):
+    """The previous implementation, kept for comparison: scans the commits for every file, O(files x commits)."""
+    documents = []
+    for file_info in latest_files.values():
+        commit_data = next((cd for cd in all_commit_data if cd.commit_id == file_info['commit_id']), None)
+        if commit_data:
+            document = create_document(file_info['file'], commit_data, job_id)
+            if document:
+                documents.append(document)
+    return documents
+
+
+def run(label, latest_files_func, create_documents_func, history):
+    start = time.perf_counter()
+    latest_files = latest_files_func(history)
+    documents = create_documents_func(latest_files, history, "bench-job")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f}s  {len(documents)} documents")
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commits", type=int, default=50000)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--files-per-commit", type=int, default=3)
+    parser.add_argument("--skip-baseline", action="store_true", help="Only time the current implementation")
+    args = parser.parse_args()
+
+    history = build_history(args.commits, args.files, args.files_per_commit)
+    print(f"{args.commits} commits touching {args.files} files")
+    current = run("current", get_latest_files, create_documents, history)
+    if not args.skip_baseline:
+        baseline = run("previous", previous_get_latest_files, previous_create_documents, history)
+        assert [d.metadata["vector_id"] for d in baseline] == [d.metadata["vector_id"] for d in current]
+
+
+if __name__ == "__main__":
+    main()
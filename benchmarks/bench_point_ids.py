@@ -0,0 +1,35 @@
+"""
+Benchmark point ID generation for a batch of vector_ids.
+
+Usage:
+    python -m benchmarks.bench_point_ids --documents 100000
+"""
+import argparse
+import time
+
+from services.vectordb_service import generate_uuid_from_string
+from utils.point_ids import generate_point_ids
+
+
+def run(label, func, values):
+    start = time.perf_counter()
+    ids = func(values)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f}s  {len(values) / elapsed:12,.0f} ids/s")
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100000)
+    args = parser.parse_args()
+
+    values = [f"repo/src/module_{i}.py:{i:040x}" for i in range(args.documents)]
+    print(f"{args.documents} vector_ids")
+    baseline = run("baseline", lambda vs: [str(generate_uuid_from_string(v)) for v in vs], values)
+    batch = run("batch", generate_point_ids, values)
+    assert batch == baseline
+
+
+if __name__ == "__main__":
+    main()
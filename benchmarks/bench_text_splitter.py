@@ -0,0 +1,62 @@
+"""
+Benchmark PDF chunking with langchain's RecursiveCharacterTextSplitter and the pipeline's splitter.
+
+Usage:
+    python -m benchmarks.bench_text_splitter --pages 2000
+"""
+import argparse
+import random
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.text_splitter import FastRecursiveCharacterTextSplitter
+
+
+def build_pages(page_count: int, shape: str = "lines", seed: int = 0):
+    """
+    "lines" mimics PyMuPDF page text (one short line per text line, occasional blank
+    lines); "prose" is unbroken text, which forces splitting down to single words.
+    """
+    rng = random.Random(seed)
+    words = ["gutenberg", "press", "movable", "type", "ink", "paper", "printing", "the", "of", "and", "a"]
+
+    def line():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 14)))
+
+    pages = []
+    for _ in range(page_count):
+        if shape == "prose":
+            pages.append(" ".join(rng.choice(words) for _ in range(500)))
+        else:
+            pages.append("\n".join(line() if rng.random() > 0.05 else "" for _ in range(45)))
+    return pages
+
+
+def run(label, splitter, pages):
+    start = time.perf_counter()
+    chunks = [chunk for page in pages for chunk in splitter.split_text(page)]
+    elapsed = time.perf_counter() - start
+    size_mb = sum(len(page) for page in pages) / 1e6
+    print(f"{label:<10} {elapsed:8.3f}s  {size_mb / elapsed:8.2f} MB/s  {len(chunks)} chunks")
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=20)
+    parser.add_argument("--shape", choices=["lines", "prose"], default="lines")
+    args = parser.parse_args()
+
+    pages = build_pages(args.pages, args.shape)
+    print(f"{args.pages} {args.shape} pages, {sum(len(page) for page in pages) / 1e6:.1f} MB")
+    baseline = run("langchain", RecursiveCharacterTextSplitter(chunk_size=args.chunk_size,
+                                                               chunk_overlap=args.chunk_overlap), pages)
+    current = run("fast", FastRecursiveCharacterTextSplitter(args.chunk_size, args.chunk_overlap), pages)
+    assert current == baseline
+
+
+if __name__ == "__main__":
+    main()
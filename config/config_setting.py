@@ -2,7 +2,7 @@ import os
 import json
 from functools import lru_cache
 from pydantic import ConfigDict
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, List
 from pydantic_settings import BaseSettings
 
 
@@ -13,26 +13,100 @@ class Settings(BaseSettings):
     DESCRIPTION: str = "Service consuming Kafka topics and adding to vector db."
     VECTOR_DB_HOST: str = "qdrant"
     VECTOR_DB_PORT: int = 6333
+    VECTOR_DB_GRPC_PORT: int = 6334
+    VECTOR_DB_PREFER_GRPC: bool = False
+    QDRANT_VECTOR_SIZE: Optional[int] = None
+    QDRANT_DISTANCE: str = "Cosine"
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_ON_DISK_PAYLOAD: bool = False
+    QDRANT_QUANTIZATION: Optional[str] = None
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True
+    QDRANT_HNSW_M: Optional[int] = None
+    QDRANT_HNSW_EF_CONSTRUCT: Optional[int] = None
+    QDRANT_HNSW_ON_DISK: Optional[bool] = None
+    QDRANT_PAYLOAD_INDEXES: List[str] = ["job_id", "doc_type", "repo_name"]
+    QDRANT_STORE_CACHE_SIZE: int = 32
+    VECTORDB_SKIP_UNCHANGED: bool = True
+    VECTORDB_BATCH_MAX_MESSAGES: int = 50
+    VECTORDB_BATCH_TIMEOUT_SECONDS: float = 1.0
+    VECTORDB_UPSERT_BATCH_SIZE: int = 256
+    VECTORDB_UPSERT_PARALLEL: int = 1
     DOCUMENT_BATCH_ENDPOINT:str ="http://fastapi:8000/api/documents/batch/"
     GITHUB_TOKEN: Optional[str]
+    GITHUB_FETCH_WORKERS: int = 8
+    GITHUB_MAX_IN_FLIGHT: int = 16
+    GITHUB_RATE_LIMIT_RESERVE: int = 50
+    GITHUB_RATE_LIMIT_PACE_FRACTION: float = 0.2
+    GITHUB_RATE_LIMIT_RETRIES: int = 3
+    GITHUB_EMIT_BATCH_SIZE: int = 100
+    GITHUB_RETRIEVER_BACKEND: str = "api"
     BROKERS: Optional[str] = None
     INPUT_TOPIC: Optional[str] = None
     OUTPUT_TOPIC: Optional[str] = None
     RESOURCE_TOPIC: Optional[str] = "resource_topic"
     GITHUB_TOPIC: Optional[str] = "github_topic"
     PDF_INPUT: Optional[str] = None
+    PDF_EXTRACTION_WORKERS: int = 4
+    PDF_EXTRACTION_PAGES_PER_TASK: int = 16
+    PDF_EXTRACTION_MIN_PARALLEL_PAGES: int = 64
+    PDF_EMIT_BATCH_SIZE: int = 100
+    PDF_EMIT_BATCH_MAX_BYTES: int = 512 * 1024  # stay well below Kafka's default 1 MB message limit
+    PDF_CHUNKING_STRATEGY: str = "characters"  # characters, tokens, layout or adaptive
+    PDF_CHUNK_SIZE: int = 500
+    PDF_CHUNK_OVERLAP: int = 20
+    PDF_CHUNK_TOKENS: int = 256
+    PDF_CHUNK_OVERLAP_TOKENS: int = 16
+    PDF_CHUNK_TOKENS_BY_MODEL: Dict[str, int] = {"openai": 1024, "lmstudio": 384, "fake": 256}
+    PDF_HEADING_SIZE_RATIO: float = 1.15
     CONSUMER_CONFIG: Optional[Dict[str, str]] = None
     PRODUCER_CONFIG: Optional[Dict[str, str]] = None
     MODEL_PROVIDER: Optional[str] = "fake"
     TEMPLATE: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
+    LLM_CHAIN_CACHE_SIZE: int = 32
+    LLM_CONCURRENCY: Dict[str, Dict[str, Any]] = {
+        "default": {"initial_limit": 5, "max_limit": 16},
+        "openai": {"initial_limit": 5, "max_limit": 64, "tokens_per_minute": 30000},
+        "lmstudio": {"initial_limit": 2, "max_limit": 8},
+        "fake": {"initial_limit": 5, "max_limit": 16},
+    }
+    LLM_MAX_ATTEMPTS: int = 3
+    LLM_ASYNC_ENABLED: bool = False
+    LLM_ASYNC_MAX_PENDING_MESSAGES: int = 64
+    LLM_ASYNC_POLL_INTERVAL_SECONDS: float = 0.05
+    LLM_TELEMETRY_SAMPLE_RATE: float = 0.01
+    LLM_TELEMETRY_REPORT_INTERVAL_SECONDS: float = 60.0
+    LLM_PACKING_ENABLED: bool = False
+    LLM_PACK_TOKEN_BUDGET: int = 3000
+    LLM_PACK_MAX_DOCUMENTS: int = 20
     PROCESSED_TOPIC: Optional[str] = None
     VECTORDB_TOPIC_NAME: Optional[str] = "vectordb_added_doc"
     LOCAL_LLM_URL: str
     USER_MANAGEMENT_SERVICE_URL: Optional[str] = "http://fastapi:8000"
+    STATUS_BACKEND: str = "http"
+    STATUS_TOPIC: Optional[str] = "job_status_events"
+    STATUS_UPDATE_ASYNC: bool = True
+    STATUS_FLUSH_INTERVAL_SECONDS: float = 1.0
+    STATUS_FLUSH_MAX_BATCH: int = 100
+    STATUS_UPDATE_TIMEOUT_SECONDS: float = 10.0
     APP_ROOT_DIRECTORY: str = os.getcwd()
 
     LOG_DIRECTORY: str = os.path.join(APP_ROOT_DIRECTORY, "logs")
+    CACHE_DIRECTORY: str = os.path.join(APP_ROOT_DIRECTORY, "cache")
+    GITHUB_INCREMENTAL_INGESTION: bool = True
+    GITHUB_WATERMARK_DIRECTORY: str = os.path.join(CACHE_DIRECTORY, "github_watermarks")
+    GIT_MIRROR_DIRECTORY: str = os.path.join(CACHE_DIRECTORY, "git_mirrors")
+    SUMMARY_CACHE_ENABLED: bool = True
+    SUMMARY_CACHE_PATH: str = os.path.join(CACHE_DIRECTORY, "summaries.sqlite3")
+    SUMMARY_CACHE_MAX_ENTRIES: int = 200000
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = os.path.join(CACHE_DIRECTORY, "embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000
+    PDF_CACHE_ENABLED: bool = True
+    PDF_CACHE_DIRECTORY: str = os.path.join(CACHE_DIRECTORY, "pdfs")
+    PDF_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    PDF_CACHE_REVALIDATE_AFTER_SECONDS: float = 3600
+    PDF_DOWNLOAD_TIMEOUT_SECONDS: float = 60
 
     model_config = ConfigDict(env_file=".env", env_file_encoding='utf-8', extra=None)
 
@@ -1,5 +1,5 @@
 from bytewax.outputs import StatelessSinkPartition, DynamicSink
-from typing import List, Callable, Any, Dict
+from typing import List, Callable, Any, Dict, Optional
 import httpx
 import json
 
@@ -29,7 +29,7 @@ class RetryTransport(httpx.BaseTransport):
 
 class HTTPConnector(StatelessSinkPartition):
     def __init__(self, url: str, auth_header: Dict[str, str], prepare_payload: Callable[[Any], List[Dict]],
-                 timeout: int = 10, max_retries: int = 3):
+                 timeout: int = 10, max_retries: int = 3, on_close: Optional[Callable[[], None]] = None):
         """
         Initializes the connector with URL, authentication details, and a function to prepare payloads.
 
@@ -38,12 +38,14 @@ class HTTPConnector(StatelessSinkPartition):
         :param prepare_payload: A function that takes an item and returns a list of JSON-serializable dictionaries.
         :param timeout: The request timeout in seconds.
         :param max_retries: The maximum number of retries for a failed request.
+        :param on_close: Called when the dataflow shuts the partition down, e.g. to release shared clients.
         """
         self.url = url
         self.auth_header = auth_header
         transport = RetryTransport(transport=httpx.HTTPTransport(), retries=max_retries)
         self.client = httpx.Client(transport=transport, timeout=timeout)
         self.prepare_payload = prepare_payload
+        self.on_close = on_close
 
     def write_batch(self, items: List[Any]) -> None:
         for item in items:
@@ -58,9 +60,14 @@ class HTTPConnector(StatelessSinkPartition):
 
     def close(self) -> None:
         """
-        Close the HTTP client.
+        Close the HTTP client and run the `on_close` hook.
         """
         self.client.close()
+        if self.on_close is not None:
+            try:
+                self.on_close()
+            except Exception as e:
+                logger.error(f"Error while closing the HTTP sink: {e}")
 
     def __del__(self):
         """Ensure clean-up."""
@@ -68,17 +75,20 @@ class HTTPConnector(StatelessSinkPartition):
 
 
 class HTTPSink(DynamicSink):
-    def __init__(self, url: str, auth_header: Dict[str, str], prepare_payload: Callable[[Any], List[Dict]]):
+    def __init__(self, url: str, auth_header: Dict[str, str], prepare_payload: Callable[[Any], List[Dict]],
+                 on_close: Optional[Callable[[], None]] = None):
         """
         Initializes the dynamic sink with the URL, authentication details, and a function to prepare payloads.
 
         :param url: The endpoint URL to which the data will be posted.
         :param auth_header: Authentication headers required for the API.
         :param prepare_payload: A function that takes an item and returns a JSON-serializable dictionary.
+        :param on_close: Called when a partition is closed at dataflow shutdown.
         """
         self.url = url
         self.auth_header = auth_header
         self.prepare_payload = prepare_payload
+        self.on_close = on_close
 
     def build(self, _step_id, _worker_index, _worker_count):
         """
@@ -89,4 +99,4 @@ class HTTPSink(DynamicSink):
         :param _worker_count: The total number of workers.
         :return: An instance of HTTPConnector.
         """
-        return HTTPConnector(self.url, self.auth_header, self.prepare_payload)
+        return HTTPConnector(self.url, self.auth_header, self.prepare_payload, on_close=self.on_close)
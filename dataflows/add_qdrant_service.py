@@ -9,9 +9,10 @@ from config.config_setting import config
 from dataflow_connectors.HTTP_connector import HTTPSink
 from logging_config import setup_logging, get_logger
 from models import constants
-from services.vectordb_service import insert_into_vectordb_with_status
+from services.vectordb_service import collection_key, insert_batch_into_vectordb_with_status
 
 from utils.dataflow_processing_utils import prepare_payload, kafka_to_standardized
+from utils.get_qdrant import close_qdrant_vector_stores
 from utils.status_update import StandardizedMessage, status_updater
 
 setup_logging()
@@ -40,8 +41,17 @@ standardized_messages = op.map(
     kafka_to_standardized,
 )
 
-vectordb_inserted_messages = op.flat_map("insert_into_vectordb", standardized_messages,
-                                         insert_into_vectordb_with_status)
+# Group messages for the same collection so they share one embedding call and upload
+keyed_by_collection = op.map("key_by_collection", standardized_messages, collection_key)
+message_batches = op.collect(
+    "batch_messages_by_collection",
+    keyed_by_collection,
+    timeout=timedelta(seconds=config.VECTORDB_BATCH_TIMEOUT_SECONDS),
+    max_size=config.VECTORDB_BATCH_MAX_MESSAGES,
+)
+
+vectordb_inserted_messages = op.flat_map("insert_into_vectordb", message_batches,
+                                         insert_batch_into_vectordb_with_status)
 valid_messages = op.filter("filter_valid_messages", vectordb_inserted_messages, lambda msg: msg is not None)
 keyed_messages = op.map("key_by_job_id", valid_messages, lambda x: (x["job_id"], x))
 
@@ -56,5 +66,6 @@ batched_messages = op.collect(
 # Remove the key from the batched messages
 keyless_docs = op.map("remove_key", batched_messages, lambda x: x[1])
 
-# Output to the FastAPI using the HTTPSink
-op.output("vectordb-batch-output", keyless_docs, HTTPSink(config.DOCUMENT_BATCH_ENDPOINT, auth_header, prepare_payload))
+# Output to the FastAPI using the HTTPSink; closing it at shutdown also closes the Qdrant clients
+op.output("vectordb-batch-output", keyless_docs,
+          HTTPSink(config.DOCUMENT_BATCH_ENDPOINT, auth_header, prepare_payload, on_close=close_qdrant_vector_stores))
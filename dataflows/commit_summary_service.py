@@ -8,10 +8,9 @@ from bytewax.connectors.kafka import KafkaSource, KafkaSink, KafkaSinkMessage, K
 from confluent_kafka import OFFSET_STORED
 from icecream import ic
 from config.config_setting import config
-from dataflows.github_commit_processing import serialize_standardized_message
 from logging_config import setup_logging, get_logger
-from services.message_processing_service import process_raw_data_with_llm_and_status
-from utils.dataflow_processing_utils import kafka_to_standardized
+from services.message_processing_service import build_async_llm_logic, process_raw_data_with_llm_and_status
+from utils.dataflow_processing_utils import kafka_to_standardized, to_kafka_sink_message
 from utils.status_update import StandardizedMessage
 
 
@@ -43,15 +42,20 @@ standardized_messages = op.map(
     kafka_to_standardized,
 )
 
-llm_processed_messages = op.flat_map("process_with_llm", standardized_messages, process_raw_data_with_llm_and_status)
+if config.LLM_ASYNC_ENABLED:
+    # Summarize on the shared event loop without blocking the worker; outputs stay in order per job
+    keyed_messages = op.key_on("key_by_job_id", standardized_messages, lambda message: message.job_id)
+    llm_processed_messages = op.key_rm(
+        "remove_job_id_key", op.stateful("process_with_llm_async", keyed_messages, build_async_llm_logic))
+else:
+    llm_processed_messages = op.flat_map("process_with_llm", standardized_messages,
+                                         process_raw_data_with_llm_and_status)
 filtered_commits = op.filter(
     "filter_empty_messages",
     llm_processed_messages,
     lambda msg: msg is not None and bool(msg)
 )
 
-serialized_llm_docs = op.map("serialize_llm_documents", filtered_commits , serialize_standardized_message)
-
-kafka_messages = op.map("create_kafka_messages", serialized_llm_docs, lambda x: KafkaSinkMessage(None, x))
+kafka_messages = op.map("create_kafka_messages", filtered_commits, to_kafka_sink_message)
 
 op.output("llm-processed-output", kafka_messages, KafkaSink(brokers=brokers, topic=llm_processed_topic))
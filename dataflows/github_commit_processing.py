@@ -9,7 +9,7 @@ from config.config_setting import config
 from logging_config import setup_logging, get_logger
 from models import constants
 from services.github_service import fetch_and_emit_commits, fetch_and_emit_commits_with_status
-from utils.dataflow_processing_utils import kafka_to_standardized
+from utils.dataflow_processing_utils import kafka_to_standardized, to_kafka_sink_message
 from utils.status_update import status_updater, StandardizedMessage
 
 setup_logging()
@@ -48,10 +48,6 @@ processed_commits = op.flat_map(
 )
 
 
-def serialize_standardized_message(msg: StandardizedMessage):
-    return msg.model_dump_json()
-
-
 filtered_commits = op.filter(
     "filter_empty_messages",
     processed_commits,
@@ -59,10 +55,8 @@ filtered_commits = op.filter(
 )
 
 
-serialized_docs = op.map("serialize_documents", filtered_commits, serialize_standardized_message)
-
-
-kafka_messages = op.map("create_kafka_messages", serialized_docs, lambda x: KafkaSinkMessage(None, x))
+# Keyed by job_id so the chunks of a job stay in order on one partition
+kafka_messages = op.map("create_kafka_messages", filtered_commits, to_kafka_sink_message)
 
 # Output serialized data to Kafka
 op.output("kafka-vector-raw-add", kafka_messages,
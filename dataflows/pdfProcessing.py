@@ -5,8 +5,8 @@ from bytewax.connectors.kafka import KafkaSource, KafkaSink, KafkaSinkMessage
 from bytewax.dataflow import Dataflow
 from config.config_setting import config
 from logging_config import setup_logging, get_logger
-from services.pdf_processing_service import process_pdf, process_pdf_with_status
-from utils.dataflow_processing_utils import kafka_to_standardized
+from services.pdf_processing_service import process_pdf_with_status
+from utils.dataflow_processing_utils import kafka_to_standardized, to_kafka_sink_message
 from utils.status_update import StandardizedMessage
 
 setup_logging()
@@ -34,7 +34,7 @@ standardized_messages = op.map(
     kafka_to_standardized,
 )
 
-# Process PDF and emit each document individually
+# Process PDF into batches of documents
 processed_docs = op.flat_map("pdf processing", standardized_messages, process_pdf_with_status)
 
 # Filter out any None or empty messages
@@ -44,14 +44,10 @@ filtered_docs = op.filter(
     lambda msg: msg is not None and bool(msg.data)
 )
 
-# Serialize StandardizedMessages
-serialized_docs = op.map("serialize_documents", filtered_docs, lambda x: x.model_dump_json())
+# Serialized once and keyed by job_id so the batches of a job stay in order on one partition
+kafka_messages = op.map("create_kafka_messages", filtered_docs, to_kafka_sink_message)
 
-# Create KafkaSinkMessages for each serialized document data
-kafka_messages = op.map("create_kafka_messages", serialized_docs, lambda x: KafkaSinkMessage(None, x))
-
-# Output serialized data to Kafka
-op.output("kafka-raw-pdf-add", kafka_messages,
-          KafkaSink(brokers=brokers, topic=config.PROCESSED_TOPIC, add_config=producer_config))
+# Output serialized data to Kafka. Only the summary stage consumes it: it passes the raw
+# documents on to the vector DB with their summaries, so the sink sees each job's chunks once
 op.output("kafka-output", kafka_messages,
           KafkaSink(brokers=brokers, topic=config.OUTPUT_TOPIC, add_config=producer_config))
\ No newline at end of file
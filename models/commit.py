@@ -17,3 +17,4 @@ class CommitData(BaseModel):
     repo_name: str
     commit_id: str
     files: List[FileInfo]
+    committed_date: Optional[str] = None
@@ -0,0 +1,270 @@
+import base64
+import os
+import re
+import shutil
+import subprocess
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Generator, List, Optional
+
+from config.config_setting import config
+from logging_config import get_logger
+from models.commit import CommitData, FileInfo
+
+logger = get_logger(__name__)
+
+RECORD_SEPARATOR = "\x1e"
+FIELD_SEPARATOR = "\x1f"
+LOG_FORMAT = (f"{RECORD_SEPARATOR}%H{FIELD_SEPARATOR}%an{FIELD_SEPARATOR}%aI{FIELD_SEPARATOR}%cI{FIELD_SEPARATOR}"
+              f"%B{FIELD_SEPARATOR}")
+# Characters GitHub allows in owner and repository names
+GITHUB_NAME_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
+COMMIT_SHA_PATTERN = re.compile(r"^[0-9a-fA-F]{4,40}$")
+
+
+def validate_github_name(name: str, kind: str = "name") -> str:
+    """
+    Rejects owner/repository names that GitHub would not accept, including "." and "..",
+    since they end up in mirror paths and clone URLs.
+    """
+    if not isinstance(name, str) or not GITHUB_NAME_PATTERN.match(name) or name in (".", ".."):
+        raise ValueError(f"Invalid GitHub {kind}: {name!r}")
+    return name
+
+
+def validate_revision(revision: str) -> str:
+    """
+    Accepts a hex commit SHA or a valid ref name (as checked by `git check-ref-format`),
+    never anything git could parse as an option.
+    """
+    if not isinstance(revision, str) or not revision or revision.startswith("-"):
+        raise ValueError(f"Invalid revision: {revision!r}")
+    if COMMIT_SHA_PATTERN.match(revision):
+        return revision
+    result = subprocess.run(["git", "check-ref-format", "--allow-onelevel", revision], capture_output=True)
+    if result.returncode != 0:
+        raise ValueError(f"Invalid revision: {revision!r}")
+    return revision
+
+
+def _unquote_path(path: str) -> str:
+    if len(path) >= 2 and path[0] == path[-1] == '"':
+        return path[1:-1].encode("latin-1", "backslashreplace").decode("unicode_escape").encode(
+            "latin-1").decode("utf-8", "replace")
+    return path
+
+
+def parse_file_diff(block: List[str]) -> FileInfo:
+    """
+    Builds a FileInfo from the lines of one `diff --git` block.
+
+    The patch holds the hunks only (from the first "@@" line), the same text GitHub
+    returns as `file.patch`. Binary files and changes without hunks have no patch.
+
+    :param block: Lines of a single file diff, starting with the "diff --git" header.
+    :return: FileInfo with GitHub style status and line counts.
+    """
+    status = "modified"
+    old_path = new_path = None
+    patch_start = None
+    for index, line in enumerate(block):
+        if line.startswith("@@"):
+            patch_start = index
+            break
+        if line.startswith("new file mode"):
+            status = "added"
+        elif line.startswith("deleted file mode"):
+            status = "removed"
+        elif line.startswith("rename from "):
+            status = "renamed"
+            old_path = _unquote_path(line[len("rename from "):])
+        elif line.startswith("rename to "):
+            new_path = _unquote_path(line[len("rename to "):])
+        elif line.startswith("copy to "):
+            status = "copied"
+            new_path = _unquote_path(line[len("copy to "):])
+        elif line.startswith("--- ") and line[4:] != "/dev/null":
+            old_path = _unquote_path(line[4:])[2:]
+        elif line.startswith("+++ ") and line[4:] != "/dev/null":
+            new_path = _unquote_path(line[4:])[2:]
+
+    if new_path is None and old_path is None:
+        # No ---/+++ lines (binary, mode-only or pure rename): fall back to the header
+        header = block[0][len("diff --git "):]
+        new_path = _unquote_path(header[header.rfind(" b/") + 1:])[2:]
+    filename = new_path if new_path is not None and status != "removed" else old_path
+
+    additions = deletions = 0
+    patch = None
+    if patch_start is not None:
+        hunk_lines = block[patch_start:]
+        while hunk_lines and hunk_lines[-1] == "":
+            hunk_lines.pop()
+        for line in hunk_lines:
+            if line.startswith("+"):
+                additions += 1
+            elif line.startswith("-"):
+                deletions += 1
+        patch = "\n".join(hunk_lines)
+
+    return FileInfo(filename=filename, status=status, additions=additions, deletions=deletions,
+                    changes=additions + deletions, patch=patch)
+
+
+def parse_commit_record(record: str, owner: str, repo_name: str) -> CommitData:
+    """
+    Converts one `git log -p` record produced with LOG_FORMAT into CommitData.
+    """
+    sha, author, date, committed_date, message, diff = record.split(FIELD_SEPARATOR, 5)
+    files = []
+    block: List[str] = []
+    for line in diff.split("\n"):
+        if line.startswith("diff --git "):
+            if block:
+                files.append(parse_file_diff(block))
+            block = [line]
+        elif block:
+            block.append(line)
+    if block:
+        files.append(parse_file_diff(block))
+
+    return CommitData(
+        author=author,
+        message=message.rstrip("\n"),
+        date=datetime.fromisoformat(date).astimezone(timezone.utc).isoformat(),
+        url=f"https://github.com/{owner}/{repo_name}/commit/{sha}",
+        repo_name=repo_name,
+        commit_id=sha,
+        files=files,
+        committed_date=datetime.fromisoformat(committed_date).astimezone(timezone.utc).isoformat(),
+    )
+
+
+class GitMirrorRetriever:
+    """
+    Retrieves commit data from local bare mirrors instead of the GitHub API.
+
+    Each repository is cloned once with `git clone --mirror` into `cache_directory` and
+    refreshed with `git fetch` on later jobs. Per-file patches are computed from git
+    objects, so ingestion costs local disk and CPU rather than one API call per commit.
+    The clone URL is always derived from `base_url` and the validated owner/repo names.
+    """
+
+    def __init__(self, cache_directory: str, token: Optional[str] = None, timeout: int = 3600,
+                 base_url: str = "https://github.com"):
+        self.cache_directory = cache_directory
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def mirror_path(self, owner: str, repo_name: str) -> str:
+        path = os.path.join(self.cache_directory, validate_github_name(owner, "owner"),
+                            f"{validate_github_name(repo_name, 'repository name')}.git")
+        cache_directory = os.path.realpath(self.cache_directory)
+        if os.path.commonpath([cache_directory, os.path.realpath(path)]) != cache_directory:
+            raise ValueError(f"Mirror path for {owner}/{repo_name} escapes {self.cache_directory}")
+        return path
+
+    def clone_url(self, owner: str, repo_name: str) -> str:
+        return f"{self.base_url}/{validate_github_name(owner, 'owner')}/" \
+               f"{validate_github_name(repo_name, 'repository name')}.git"
+
+    def _auth_options(self, clone_url: str) -> List[str]:
+        if not self.token or not clone_url.startswith("https://github.com/"):
+            return []
+        # Passed per command so the token is never written to the mirror's config
+        credentials = base64.b64encode(f"x-access-token:{self.token}".encode("utf-8")).decode("ascii")
+        return ["-c", f"http.https://github.com/.extraheader=AUTHORIZATION: basic {credentials}"]
+
+    def _git(self, args: List[str], clone_url: str = "") -> None:
+        subprocess.run(["git", *self._auth_options(clone_url), *args], check=True, capture_output=True,
+                       timeout=self.timeout)
+
+    def _lock_for(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def sync(self, owner: str, repo_name: str) -> str:
+        """
+        Clones the repository mirror if needed, otherwise fetches new objects.
+
+        :return: Path of the bare mirror.
+        """
+        clone_url = self.clone_url(owner, repo_name)
+        path = self.mirror_path(owner, repo_name)
+        with self._lock_for(path):
+            if os.path.isdir(path):
+                logger.info(f"Fetching updates for mirror {owner}/{repo_name}")
+                self._git([f"--git-dir={path}", "fetch", "--prune", "--quiet", "--", clone_url,
+                           "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"], clone_url)
+            else:
+                logger.info(f"Cloning mirror of {owner}/{repo_name}")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                try:
+                    self._git(["clone", "--mirror", "--quiet", "--", clone_url, tmp_path], clone_url)
+                    os.replace(tmp_path, path)
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+        return path
+
+    @staticmethod
+    def log_arguments(commit_options: Dict[str, Any]) -> List[str]:
+        """
+        Maps PyGithub `get_commits` keyword arguments onto `git log` arguments.
+        """
+        args = []
+        for option in ("since", "until"):
+            value = commit_options.get(option)
+            if value is not None:
+                args.append(f"--{option}={value.isoformat() if isinstance(value, datetime) else value}")
+        if commit_options.get("author"):
+            args.append(f"--author={commit_options['author']}")
+        args.extend(["--end-of-options", validate_revision(commit_options.get("sha") or "HEAD")])
+        if commit_options.get("path"):
+            args.extend(["--", commit_options["path"]])
+        return args
+
+    def iter_commit_data(self, owner: str, repo_name: str,
+                         commit_options: Optional[Dict[str, Any]] = None) -> Generator[CommitData, None, None]:
+        """
+        Syncs the mirror and yields CommitData for each commit, newest first.
+
+        Merge commits are diffed against their first parent, like GitHub does.
+
+        :param owner: Owner of the repository.
+        :param repo_name: Name of the repository.
+        :param commit_options: PyGithub style filters (sha, since, until, author, path).
+        :return: Generator of CommitData objects.
+        """
+        path = self.sync(owner, repo_name)
+        command = ["git", "-c", "core.quotePath=false", f"--git-dir={path}", "log", "-p", "--no-color",
+                   "--no-ext-diff", "--diff-merges=first-parent", f"--format={LOG_FORMAT}",
+                   *self.log_arguments(commit_options or {})]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   encoding="utf-8", errors="replace")
+        try:
+            record: List[str] = []
+            for line in process.stdout:
+                if line.startswith(RECORD_SEPARATOR):
+                    if record:
+                        yield parse_commit_record("".join(record), owner, repo_name)
+                    record = [line[1:]]
+                else:
+                    record.append(line)
+            if record:
+                yield parse_commit_record("".join(record), owner, repo_name)
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, command, stderr=process.stderr.read())
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.stderr.close()
+            process.wait()
+
+
+git_mirror_retriever = GitMirrorRetriever(config.GIT_MIRROR_DIRECTORY, token=config.GITHUB_TOKEN)
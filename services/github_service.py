@@ -1,8 +1,14 @@
+import heapq
+import itertools
+import threading
 import time
-from multiprocessing import Pool, cpu_count
-from typing import Any, Generator, Tuple
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Generator, Iterable, Optional, Tuple
 
-from github import Github, Auth
+from github import Github, Auth, RateLimitExceededException
 from orjson import orjson
 
 from config.config_setting import config
@@ -10,22 +16,231 @@ from logging_config import get_logger
 from models import constants
 from models.commit import CommitData, FileInfo
 from models.document import Document
+from services.git_repository_service import git_mirror_retriever
+from utils.commit_watermarks import COMMIT_WATERMARK_KEY, CommitWatermarkStore, commit_watermarks, watermark_update
+from utils.dataflow_processing_utils import iter_chunks
 from utils.status_update import StandardizedMessage, status_updater
 
 logger = get_logger(__name__)
 
+_github_client: Optional[Github] = None
+_github_client_lock = threading.Lock()
 
-def fetch_repository(owner: str, repo_name: str) -> Any:
+
+class GitHubRequestScheduler:
+    """
+    Process-wide scheduler that paces GitHub API requests against the rate limit budget.
+
+    Every request made on behalf of a job first acquires a slot. Waiting requests are
+    served fairly across concurrent jobs: the job that has used the fewest requests goes
+    first. When the remaining budget drops below `pace_fraction` of the limit, requests
+    are spread evenly until the reset time, and when it reaches `reserve` they wait for
+    the reset instead of failing.
+    """
+
+    def __init__(self, reserve: int = 50, pace_fraction: float = 0.2):
+        """
+        :param reserve: Requests kept in hand for other clients of the same token.
+        :param pace_fraction: Fraction of the limit below which requests are paced.
+        """
+        self.reserve = reserve
+        self.pace_fraction = pace_fraction
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._job_usage: Dict[Any, int] = defaultdict(int)
+        self._remaining: Optional[int] = None
+        self._limit: Optional[int] = None
+        self._reset_at = 0.0
+        self._last_grant = 0.0
+        self.throttled_seconds = 0.0
+        self.total_requests = 0
+
+    def _delay_locked(self, now: float) -> float:
+        if self._remaining is None or now >= self._reset_at:
+            return 0.0
+        if self._remaining <= self.reserve:
+            return self._reset_at - now
+        if self._limit and self._remaining < self._limit * self.pace_fraction:
+            interval = (self._reset_at - now) / (self._remaining - self.reserve)
+            return self._last_grant + interval - now
+        return 0.0
+
+    def acquire(self, job_id: Any = None, priority: Optional[int] = None) -> None:
+        """
+        Blocks until a request may be sent for `job_id`.
+
+        :param job_id: Job the request is made for, used for fair ordering across jobs.
+        :param priority: Explicit priority (lower goes first), overrides fair ordering.
+        """
+        with self._cond:
+            entry = [self._job_usage[job_id] if priority is None else priority, next(self._sequence)]
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    if self._waiting[0] is entry:
+                        now = time.time()
+                        delay = self._delay_locked(now)
+                        if delay <= 0:
+                            break
+                        self._cond.wait(timeout=delay)
+                        self.throttled_seconds += time.time() - now
+                    else:
+                        self._cond.wait()
+                heapq.heappop(self._waiting)
+                self._job_usage[job_id] += 1
+                self.total_requests += 1
+                if self._remaining is not None:
+                    self._remaining -= 1
+                self._last_grant = time.time()
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._cond.notify_all()
+
+    def update(self, remaining: int, limit: int, reset_at: float) -> None:
+        """
+        Record the budget reported by the last response headers.
+        """
+        if limit is None or limit < 0:
+            return
+        with self._cond:
+            self._remaining = remaining
+            self._limit = limit
+            self._reset_at = float(reset_at)
+            self._cond.notify_all()
+
+    def update_from_client(self, client: Github) -> None:
+        remaining, limit = client.requester.rate_limiting
+        self.update(remaining, limit, client.requester.rate_limiting_resettime)
+
+    def backoff_until(self, reset_at: float) -> None:
+        """
+        Mark the budget as exhausted until `reset_at` (epoch seconds).
+        """
+        with self._cond:
+            self._remaining = 0
+            self._reset_at = max(self._reset_at, float(reset_at))
+            self._cond.notify_all()
+
+    def finish_job(self, job_id: Any) -> None:
+        with self._cond:
+            self._job_usage.pop(job_id, None)
+
+    @contextmanager
+    def request(self, job_id: Any = None, client: Optional[Github] = None):
+        """
+        Context manager that acquires a slot and records the budget afterwards.
+        """
+        self.acquire(job_id)
+        try:
+            yield
+        finally:
+            if client is not None:
+                self.update_from_client(client)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "remaining": self._remaining,
+                "limit": self._limit,
+                "reset_at": self._reset_at,
+                "active_jobs": len(self._job_usage),
+                "total_requests": self.total_requests,
+                "throttled_seconds": round(self.throttled_seconds, 2),
+            }
+
+
+github_scheduler = GitHubRequestScheduler(reserve=config.GITHUB_RATE_LIMIT_RESERVE,
+                                          pace_fraction=config.GITHUB_RATE_LIMIT_PACE_FRACTION)
+
+
+def get_github_client() -> Github:
+    """
+    Returns the process-wide authenticated GitHub client.
+
+    The client (and its HTTP connection pool) is shared by every job and every fetch
+    thread, with the pool sized to the number of concurrent commit fetches.
+
+    :return: Shared Github client.
+    """
+    global _github_client
+    if _github_client is None:
+        with _github_client_lock:
+            if _github_client is None:
+                _github_client = Github(auth=Auth.Token(config.GITHUB_TOKEN),
+                                        pool_size=max(config.GITHUB_FETCH_WORKERS, 1))
+    return _github_client
+
+
+def _rate_limit_reset_time(error: RateLimitExceededException) -> float:
+    headers = {key.lower(): value for key, value in (error.headers or {}).items()}
+    if "retry-after" in headers:
+        return time.time() + float(headers["retry-after"])
+    if "x-ratelimit-reset" in headers:
+        return float(headers["x-ratelimit-reset"])
+    return time.time() + 60
+
+
+def call_with_rate_limit(func, *args, job_id: Any = None):
+    """
+    Runs a GitHub API call through the request scheduler.
+
+    On a rate limit error the scheduler is told to hold every request until the reset
+    time and the call is retried, up to GITHUB_RATE_LIMIT_RETRIES times.
+
+    :param func: Callable performing exactly one API request.
+    :param job_id: Job the request is made for.
+    :return: Result of `func(*args)`.
+    """
+    client = get_github_client()
+    for attempt in itertools.count(1):
+        try:
+            with github_scheduler.request(job_id, client):
+                return func(*args)
+        except RateLimitExceededException as e:
+            if attempt > config.GITHUB_RATE_LIMIT_RETRIES:
+                raise
+            reset_at = _rate_limit_reset_time(e)
+            logger.warning(f"GitHub rate limit hit for job {job_id}, waiting until {reset_at:.0f} "
+                           f"(attempt {attempt})")
+            github_scheduler.backoff_until(reset_at)
+
+
+def iter_paginated(items: Iterable[Any], job_id: Any = None, per_page: Optional[int] = None) -> Generator[Any, None, None]:
+    """
+    Iterates a PyGithub PaginatedList, acquiring a scheduler slot before each page load.
+    """
+    client = get_github_client()
+    per_page = per_page or client.per_page
+    iterator = iter(items)
+    for index in itertools.count():
+        if index % per_page == 0:
+            with github_scheduler.request(job_id, client):
+                item = next(iterator, None)
+        else:
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+
+def fetch_repository(owner: str, repo_name: str, job_id: Any = None) -> Any:
     """
     Fetches a GitHub repository object.
 
     :param owner: Owner of the repository.
     :param repo_name: Name of the repository.
+    :param job_id: Job the request is made for, used by the request scheduler.
     :return: Repository object if found, None otherwise.
     """
     try:
-        g = Github(auth=Auth.Token(config.GITHUB_TOKEN))
-        return g.get_repo(f"{owner}/{repo_name}")
+        g = get_github_client()
+        return call_with_rate_limit(g.get_repo, f"{owner}/{repo_name}", job_id=job_id)
     except Exception as e:
         logger.error({
             "error": "Failed to fetch repository",
@@ -83,6 +298,7 @@ def fetch_commit_data(args: Tuple[Any, str]) -> CommitData:
         url=commit.html_url,
         repo_name=repo_name,
         commit_id=commit.sha,
+        committed_date=commit.commit.committer.date.isoformat(),
         files=[FileInfo(
             filename=file.filename,
             status=file.status,
@@ -94,17 +310,97 @@ def fetch_commit_data(args: Tuple[Any, str]) -> CommitData:
     )
 
 
-def fetch_all_commit_data(commits, repo_name):
-    commit_args = [(commit, repo_name) for commit in commits]
-    with Pool(processes=cpu_count()) as pool:
-        return list(pool.imap_unordered(fetch_commit_data, commit_args))
+def fetch_commit_data_scheduled(commit: Any, repo_name: str, job_id: Any = None) -> CommitData:
+    """
+    Fetches commit data through the request scheduler.
+    """
+    return call_with_rate_limit(fetch_commit_data, (commit, repo_name), job_id=job_id)
+
+
+def iter_commit_data(commits: Iterable[Any], repo_name: str, max_workers: Optional[int] = None,
+                     max_in_flight: Optional[int] = None, ordered: bool = False,
+                     job_id: Any = None) -> Generator[CommitData, None, None]:
+    """
+    Fetches commit details on a thread pool and yields CommitData objects as they arrive.
+
+    Loading `commit.files` is one HTTP request per commit, so the work is I/O bound and
+    threads sharing the authenticated client are enough. Commits are pulled lazily from
+    `commits` (e.g. a PaginatedList) and at most `max_in_flight` requests are pending at
+    any time.
+
+    :param commits: Iterable of PyGithub commit objects.
+    :param repo_name: Name of the repository.
+    :param max_workers: Number of fetch threads, defaults to GITHUB_FETCH_WORKERS.
+    :param max_in_flight: Maximum number of pending fetches, defaults to GITHUB_MAX_IN_FLIGHT.
+    :param ordered: Yield results in the order of `commits` instead of completion order.
+    :param job_id: Job the requests are made for, used by the request scheduler.
+    :return: Generator of CommitData objects.
+    """
+    max_workers = max(max_workers or config.GITHUB_FETCH_WORKERS, 1)
+    max_in_flight = max(max_in_flight or config.GITHUB_MAX_IN_FLIGHT, max_workers)
+    commit_iter = iter(commits)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="github-fetch") as executor:
+        pending = deque() if ordered else set()
+
+        def submit_next() -> bool:
+            commit = next(commit_iter, None)
+            if commit is None:
+                return False
+            future = executor.submit(fetch_commit_data_scheduled, commit, repo_name, job_id)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            return True
+
+        exhausted = False
+        while len(pending) < max_in_flight and not exhausted:
+            exhausted = not submit_next()
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+            for future in done:
+                if not exhausted:
+                    exhausted = not submit_next()
+                yield future.result()
+
+
+def fetch_all_commit_data(commits, repo_name, job_id=None):
+    return list(iter_commit_data(commits, repo_name, job_id=job_id))
+
+
+def parse_commit_date(date: str) -> datetime:
+    """
+    Parses an ISO 8601 commit date, accepting a trailing "Z" for UTC.
+    """
+    if date.endswith("Z"):
+        date = date[:-1] + "+00:00"
+    return datetime.fromisoformat(date)
 
 
 def get_latest_files(all_commit_data):
+    """
+    Picks the most recent version of every file in a single pass over the commits.
+
+    Each commit date is parsed once, so files touched by many commits are compared as
+    datetimes rather than by re-reading date strings. On equal dates the first commit wins.
+
+    :param all_commit_data: Iterable of CommitData objects.
+    :return: Mapping of filename to a dict with the FileInfo, commit_id and date.
+    """
     latest_files = {}
+    latest_dates = {}
     for commit_data in all_commit_data:
+        commit_date = parse_commit_date(commit_data.date)
         for file in commit_data.files:
-            if file.filename not in latest_files or commit_data.date > latest_files[file.filename]['date']:
+            current_date = latest_dates.get(file.filename)
+            if current_date is None or commit_date > current_date:
+                latest_dates[file.filename] = commit_date
                 latest_files[file.filename] = {
                     'file': file,
                     'commit_id': commit_data.commit_id,
@@ -113,10 +409,21 @@ def get_latest_files(all_commit_data):
     return latest_files
 
 
+def index_commits(all_commit_data) -> Dict[str, CommitData]:
+    """
+    Indexes commits by SHA, keeping the first occurrence of a duplicated SHA.
+    """
+    commit_index = {}
+    for commit_data in all_commit_data:
+        commit_index.setdefault(commit_data.commit_id, commit_data)
+    return commit_index
+
+
 def create_documents(latest_files, all_commit_data, job_id):
     documents = []
+    commit_index = index_commits(all_commit_data)
     for file_info in latest_files.values():
-        commit_data = next((cd for cd in all_commit_data if cd.commit_id == file_info['commit_id']), None)
+        commit_data = commit_index.get(file_info['commit_id'])
         if commit_data:
             document = create_document(file_info['file'], commit_data, job_id)
             if document:
@@ -124,6 +431,14 @@ def create_documents(latest_files, all_commit_data, job_id):
     return documents
 
 
+def newest_commit(all_commit_data) -> Optional[CommitData]:
+    """
+    The most recently committed commit. Committer dates are used because `since` filters
+    on them; a rebased or cherry-picked commit can have an older author date.
+    """
+    return max(all_commit_data, key=lambda cd: parse_commit_date(cd.committed_date or cd.date), default=None)
+
+
 def fetch_and_emit_commits(message: StandardizedMessage) -> Generator[StandardizedMessage, None, None]:
     start_time = time.time()
     job_id = message.job_id
@@ -146,31 +461,75 @@ def fetch_and_emit_commits(message: StandardizedMessage) -> Generator[Standardiz
             logger.error(f"Missing owner or repo_name for job {job_id}")
             return
 
-        repo = fetch_repository(owner, repo_name)
-
-        if not repo:
-            logger.error(f"Failed to fetch repository {owner}/{repo_name}")
+        retriever = (repo_info.get("retriever") or config.GITHUB_RETRIEVER_BACKEND).lower()
+        if retriever not in ("api", "git"):
+            logger.error(f"Unsupported retriever {retriever} for job {job_id}")
             return
 
+        repo = None
+        if retriever == "api":
+            repo = fetch_repository(owner, repo_name, job_id=job_id)
+            if not repo:
+                logger.error(f"Failed to fetch repository {owner}/{repo_name}")
+                return
+
         commit_options = {key: value for key, value in repo_info.items() if
-                          key not in ["owner", "repo_name", "prompt", "llm_model"]}
-        commits = repo.get_commits(**commit_options)
-        all_commit_data = fetch_all_commit_data(commits, repo_name)
+                          key not in ["owner", "repo_name", "prompt", "llm_model", "full_refresh", "batch_size",
+                                      "retriever", "clone_url"]}
+        incremental = config.GITHUB_INCREMENTAL_INGESTION and not repo_info.get("full_refresh")
+        watermark = commit_watermarks.get(owner, repo_name, commit_options) if incremental else None
+        ingestion_metadata = {"incremental": watermark is not None}
+        query_options = dict(commit_options)
+        if watermark:
+            logger.info(f"Incremental ingestion of {owner}/{repo_name} since commit "
+                        f"{watermark['commit_id']} ({watermark['date']})")
+            query_options["since"] = parse_commit_date(watermark["date"])
+            ingestion_metadata["since"] = watermark["date"]
+
+        if retriever == "git":
+            if repo_info.get("clone_url"):
+                logger.warning(f"Ignoring clone_url of job {job_id}, mirrors are cloned from the GitHub URL")
+            commit_data = git_mirror_retriever.iter_commit_data(owner, repo_name, query_options)
+            if watermark:
+                # `since` is inclusive, so the watermark commit itself comes back
+                commit_data = (data for data in commit_data if data.commit_id != watermark["commit_id"])
+            all_commit_data = list(commit_data)
+        else:
+            commits = iter_paginated(repo.get_commits(**query_options), job_id=job_id)
+            if watermark:
+                # `since` is inclusive, so the watermark commit itself comes back
+                commits = (commit for commit in commits if commit.sha != watermark["commit_id"])
+            all_commit_data = fetch_all_commit_data(commits, repo_name, job_id=job_id)
         latest_files = get_latest_files(all_commit_data)
         documents = [doc.model_dump_json() for doc in create_documents(latest_files, all_commit_data, job_id)]
 
+        latest_commit = newest_commit(all_commit_data)
+        if latest_commit is not None and config.GITHUB_INCREMENTAL_INGESTION:
+            # Written by the vector DB sink once every chunk is stored, not here
+            ingestion_metadata[COMMIT_WATERMARK_KEY] = watermark_update(
+                owner, repo_name, latest_commit.commit_id, latest_commit.committed_date or latest_commit.date,
+                commit_options)
+
         if documents:
+            logger.info(f"Processed combined commit data into {len(documents)} documents for repo {repo_name}")
+        elif watermark:
+            logger.info(f"No changes in {owner}/{repo_name} since commit {watermark['commit_id']} for job {job_id}")
+        else:
+            logger.warning(f"No documents created for job {job_id}")
+
+        # A job without new documents still emits one empty last chunk, so every step
+        # completes and the sink can advance the watermark past commits without patches
+        chunk_size = int(repo_info.get("batch_size", config.GITHUB_EMIT_BATCH_SIZE))
+        for chunk, chunk_metadata in iter_chunks(documents, chunk_size):
             yield StandardizedMessage(
                 job_id=job_id,
                 step_number=message.step_number,
-                data=documents,
-                metadata={**message.metadata, "repo_name": repo_name, "document_count": len(documents)},
+                data=chunk,
+                metadata={**message.metadata, "repo_name": repo_name, "document_count": len(chunk),
+                          **chunk_metadata, **ingestion_metadata},
                 prompt=prompt,
                 llm_model=llm_model
             )
-            logger.info(f"Processed combined commit data into {len(documents)} documents for repo {repo_name}")
-        else:
-            logger.warning(f"No documents created for job {job_id}")
 
     except Exception as e:
         logger.error({
@@ -180,9 +539,11 @@ def fetch_and_emit_commits(message: StandardizedMessage) -> Generator[Standardiz
         })
 
     finally:
+        github_scheduler.finish_job(job_id)
         end_time = time.time()
         total_time = end_time - start_time
         logger.info(f"Total time to process commits: {total_time:.2f} seconds")
+        logger.info(f"GitHub request scheduler: {github_scheduler.metrics()}")
 
 
 @status_updater(constants.Service.DATAFLOW_TYPE_processing_raw)
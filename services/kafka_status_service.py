@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+import orjson
+from confluent_kafka import Producer
+
+from config.config_setting import config
+from logging_config import get_logger
+from models.constants import StepStatus
+
+logger = get_logger(__name__)
+
+# Event fields owned by the client, which extra_data may not override
+RESERVED_EVENT_KEYS = ("job_id", "step_type", "status", "ts")
+
+
+class KafkaStatusClient:
+    """
+    Status client that produces compact job status events to a Kafka topic.
+
+    Events are keyed by job_id so every update for a job lands on the same partition in
+    order, and the status API can consume and compact them at its own pace. Exposes the
+    same update methods as `UserManagementClient` so either can back the status publisher.
+
+    The producer is configured like the dataflows' `KafkaSink`: `brokers` joined into
+    bootstrap.servers (BROKERS by default), overridden by `add_config` (PRODUCER_CONFIG by
+    default).
+    """
+
+    def __init__(self, topic: str, brokers: Optional[Iterable[str]] = None,
+                 add_config: Optional[Dict[str, str]] = None):
+        self.topic = topic
+        brokers = brokers or ([config.BROKERS] if config.BROKERS else [])
+        self.producer_config = {"bootstrap.servers": ",".join(brokers)} if brokers else {}
+        add_config = config.PRODUCER_CONFIG if add_config is None else add_config
+        self.producer_config.update(add_config or {})
+        self._producer: Optional[Producer] = None
+        self._lock = threading.Lock()
+        # Delivery callbacks run inside poll/flush, so errors are collected per batch under _batch_lock
+        self._batch_lock = threading.Lock()
+        self._delivery_errors: List[str] = []
+
+    @property
+    def producer(self) -> Producer:
+        if self._producer is None:
+            with self._lock:
+                if self._producer is None:
+                    self._producer = Producer(self.producer_config)
+        return self._producer
+
+    @staticmethod
+    def build_event(job_id: UUID, step_type: str, status: StepStatus, extra_data: dict = None) -> bytes:
+        extra_data = extra_data or {}
+        overridden = [key for key in RESERVED_EVENT_KEYS if key in extra_data]
+        if overridden:
+            logger.warning(f"Ignoring reserved keys {overridden} in extra_data of status event for job {job_id}")
+        # extra_data goes first so it cannot replace job_id, which is also the message key
+        event = {**extra_data, "job_id": str(job_id), "step_type": step_type, "status": status, "ts": time.time()}
+        return orjson.dumps(event)
+
+    def _delivery_report(self, err, msg):
+        if err is not None:
+            logger.error(f"Failed to deliver status event for job {msg.key()}: {err}")
+            self._delivery_errors.append(str(err))
+
+    def _flush_batch(self, count: int):
+        remaining = self.producer.flush(timeout=10)
+        errors, self._delivery_errors = self._delivery_errors, []
+        if remaining or errors:
+            # Raised so the status publisher queues the batch again
+            raise RuntimeError(f"{remaining + len(errors)} of {count} status events were not delivered to "
+                               f"{self.topic}" + (f": {errors[0]}" if errors else ""))
+
+    def _produce(self, job_id: UUID, step_type: str, status: StepStatus, extra_data: dict = None):
+        self.producer.produce(
+            self.topic,
+            key=str(job_id).encode("utf-8"),
+            value=self.build_event(job_id, step_type, status, extra_data),
+            on_delivery=self._delivery_report,
+        )
+
+    def update_status(self, job_id: UUID, step_type: str, status: StepStatus, extra_data: dict = None):
+        """
+        Produce a single status event and wait for it to be delivered.
+        """
+        logger.info(f"Producing status event for job: {job_id}, step type: {step_type} with status: {status}")
+        with self._batch_lock:
+            self._delivery_errors = []
+            self._produce(job_id, step_type, status, extra_data)
+            self._flush_batch(1)
+
+    def update_statuses(self, updates: List[dict]):
+        """
+        Produce a batch of status events and wait once for the whole batch to be delivered.
+
+        :param updates: List of dictionaries with job_id, step_type, status and optional extra_data
+        """
+        with self._batch_lock:
+            self._delivery_errors = []
+            for update in updates:
+                try:
+                    self._produce(update["job_id"], update["step_type"], update["status"], update.get("extra_data"))
+                except BufferError:
+                    # Local queue is full: drain it and retry once
+                    self.producer.flush()
+                    self._produce(update["job_id"], update["step_type"], update["status"], update.get("extra_data"))
+                self.producer.poll(0)
+            self._flush_batch(len(updates))
+
+    def close(self):
+        if self._producer is not None:
+            self._producer.flush(timeout=10)
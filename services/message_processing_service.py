@@ -1,15 +1,60 @@
-from typing import Dict, Any, Generator, List
+import atexit
+import json
+import re
+import sqlite3
+from concurrent.futures import Future
+from typing import Dict, Any, Generator, List, Optional, Tuple
+from config.config_setting import config
 from logging_config import get_logger
 from models import constants
-from utils.langchain_callback_logger import MyCustomHandler
-from utils.model_utils import setup_chat_model
+from utils.async_runner import BackgroundEventLoop, OrderedFuturesLogic
+from utils.concurrency_limiter import abatch_with_limiter, batch_with_limiter, estimate_tokens, get_concurrency_limiter
+from utils.disk_cache import DiskCache, content_key
+from utils.langchain_callback_logger import LLMTelemetryHandler
+from utils.model_utils import chain_cache, get_cached_chain
 from models.document import Document
 import time
 
-from utils.status_update import StandardizedMessage, status_updater
+from utils.status_update import StandardizedMessage, finish_status, is_empty_completion, start_status, status_updater
 
 logger = get_logger(__name__)
 
+llm_telemetry = LLMTelemetryHandler(
+    logger,
+    sample_rate=config.LLM_TELEMETRY_SAMPLE_RATE,
+    report_interval=config.LLM_TELEMETRY_REPORT_INTERVAL_SECONDS,
+)
+atexit.register(llm_telemetry.close)
+summary_cache = DiskCache(config.SUMMARY_CACHE_PATH, max_entries=config.SUMMARY_CACHE_MAX_ENTRIES)
+atexit.register(summary_cache.close)
+llm_event_loop = BackgroundEventLoop("llm-event-loop", max_pending=config.LLM_ASYNC_MAX_PENDING_MESSAGES)
+atexit.register(llm_event_loop.close)
+
+# A plan is a generator that yields the LLM batches it needs as (chain, inputs, llm_model,
+# run_config), is sent each batch's results and returns its own result. The caching and
+# packing logic is written once as plans and run with blocking calls by `run_plan` or
+# with async calls by `arun_plan`.
+LLMBatchRequest = Tuple[Any, List[Dict[str, str]], Optional[str], Dict[str, Any]]
+LLMPlan = Generator[LLMBatchRequest, List[str], Any]
+
+
+def run_plan(plan: LLMPlan) -> Any:
+    try:
+        request = next(plan)
+        while True:
+            request = plan.send(run_llm_batch(*request))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_plan(plan: LLMPlan) -> Any:
+    try:
+        request = next(plan)
+        while True:
+            request = plan.send(await arun_llm_batch(*request))
+    except StopIteration as stop:
+        return stop.value
+
 
 def prepare_batch_inputs(documents: List[Document]) -> List[Dict[str, str]]:
     """
@@ -25,59 +70,329 @@ def prepare_batch_inputs(documents: List[Document]) -> List[Dict[str, str]]:
     return [{"text": doc.page_content} for doc in documents]
 
 
+def summarize_with_cache_plan(chain, batch_inputs: List[Dict[str, str]], llm_model: Optional[str],
+                              prompt: Optional[str], run_config: Dict[str, Any]) -> LLMPlan:
+    """
+    Summarizes the batch inputs, only calling the LLM for inputs not found in the summary cache.
+
+    Summaries are keyed by a hash of (llm_model, prompt, text), so re-ingesting unchanged
+    files or PDF chunks with the same prompt and model is served from disk. Identical
+    inputs within a batch are only sent to the LLM once.
+
+    Args:
+        chain: The runnable chain used for cache misses.
+        batch_inputs (List[Dict[str, str]]): Inputs as returned by prepare_batch_inputs.
+        llm_model (Optional[str]): Model name the chain was built for.
+        prompt (Optional[str]): Custom prompt, or None for the configured template.
+        run_config (Dict[str, Any]): Runnable config passed to every `chain.invoke`.
+
+    Returns:
+        List[str]: One summary per input, in input order.
+    """
+    if not config.SUMMARY_CACHE_ENABLED:
+        return (yield from summarize_inputs_plan(chain, batch_inputs, llm_model, prompt, run_config))
+
+    keys = [content_key(llm_model, prompt or config.TEMPLATE, item["text"]) for item in batch_inputs]
+    try:
+        cached = summary_cache.get_many(keys)
+    except sqlite3.Error as e:
+        logger.warning(f"Summary cache lookup failed, summarizing every document: {e}")
+        cached = {}
+
+    misses = {key: item for key, item in zip(keys, batch_inputs) if key not in cached}
+    fresh = {}
+    if misses:
+        summaries = yield from summarize_inputs_plan(chain, list(misses.values()), llm_model, prompt, run_config)
+        fresh = dict(zip(misses, summaries))
+        try:
+            summary_cache.set_many({key: summary.encode("utf-8") for key, summary in fresh.items()})
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store {len(fresh)} summaries in the cache: {e}")
+
+    logger.info(f"Summary cache served {len(keys) - len(misses)} of {len(keys)} documents, "
+                f"{len(misses)} sent to the LLM")
+    return [cached[key].decode("utf-8") if key in cached else fresh[key] for key in keys]
+
+
+def summarize_with_cache(chain, batch_inputs: List[Dict[str, str]], llm_model: Optional[str],
+                         prompt: Optional[str], run_config: Dict[str, Any]) -> List[str]:
+    return run_plan(summarize_with_cache_plan(chain, batch_inputs, llm_model, prompt, run_config))
+
+
+def run_llm_batch(chain, batch_inputs: List[Dict[str, str]], llm_model: Optional[str],
+                  run_config: Dict[str, Any]) -> List[str]:
+    """
+    Runs the chain over the batch inputs under the provider's adaptive concurrency limiter.
+
+    Args:
+        chain: The runnable chain to invoke.
+        batch_inputs (List[Dict[str, str]]): Inputs as returned by prepare_batch_inputs.
+        llm_model (Optional[str]): Provider the chain was built for, selects the limiter.
+        run_config (Dict[str, Any]): Runnable config passed to every `chain.invoke`.
+
+    Returns:
+        List[str]: One result per input, in input order.
+    """
+    limiter = get_concurrency_limiter(llm_model)
+    results = batch_with_limiter(
+        lambda item: chain.invoke(item, config=run_config),
+        batch_inputs,
+        limiter,
+        token_counts=[estimate_tokens("".join(str(value) for value in item.values())) for item in batch_inputs],
+        max_attempts=config.LLM_MAX_ATTEMPTS,
+    )
+    logger.info(f"LLM concurrency for {limiter.name}: {limiter.metrics()}")
+    return results
+
+
+async def arun_llm_batch(chain, batch_inputs: List[Dict[str, str]], llm_model: Optional[str],
+                         run_config: Dict[str, Any]) -> List[str]:
+    """
+    Async counterpart of `run_llm_batch`, awaiting `chain.ainvoke` for each input.
+
+    The calls share the provider's adaptive limiter with every other message on the
+    event loop. `abatch` is not used, as its fixed max_concurrency would bypass that limit.
+    """
+    limiter = get_concurrency_limiter(llm_model)
+    results = await abatch_with_limiter(
+        lambda item: chain.ainvoke(item, config=run_config),
+        batch_inputs,
+        limiter,
+        token_counts=[estimate_tokens("".join(str(value) for value in item.values())) for item in batch_inputs],
+        max_attempts=config.LLM_MAX_ATTEMPTS,
+    )
+    logger.info(f"LLM concurrency for {limiter.name}: {limiter.metrics()}")
+    return results
+
+
+def pack_inputs(batch_inputs: List[Dict[str, str]], token_budget: int, max_documents: int) -> List[List[int]]:
+    """
+    Greedily groups consecutive inputs into packs whose estimated size fits the token budget.
+
+    Args:
+        batch_inputs (List[Dict[str, str]]): Inputs as returned by prepare_batch_inputs.
+        token_budget (int): Maximum estimated tokens of document text per pack.
+        max_documents (int): Maximum number of documents per pack.
+
+    Returns:
+        List[List[int]]: Indices into batch_inputs, one list per pack. Documents larger
+        than the budget end up in a pack of their own.
+    """
+    packs: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, item in enumerate(batch_inputs):
+        tokens = estimate_tokens(item["text"])
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_documents):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def format_packed_documents(texts: List[str]) -> str:
+    return "\n\n".join(f'<document id="{index}">\n{text}\n</document>' for index, text in enumerate(texts))
+
+
+def parse_packed_response(response: str, count: int) -> Dict[int, str]:
+    """
+    Extracts the per-document results from a packed response.
+
+    Args:
+        response (str): Raw model output, optionally wrapped in a ```json fence.
+        count (int): Number of documents in the pack.
+
+    Returns:
+        Dict[int, str]: Results by position in the pack. Documents the model skipped or
+        answered with a non-string are left out; an unparseable response gives {}.
+    """
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", response.strip())
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    results = {}
+    for index in range(count):
+        value = parsed.get(str(index))
+        if isinstance(value, str) and value.strip():
+            results[index] = value
+    return results
+
+
+def summarize_inputs_plan(chain, batch_inputs: List[Dict[str, str]], llm_model: Optional[str],
+                          prompt: Optional[str], run_config: Dict[str, Any]) -> LLMPlan:
+    """
+    Summarizes the batch inputs, packing small documents into shared requests when enabled.
+
+    With LLM_PACKING_ENABLED, consecutive documents are packed up to LLM_PACK_TOKEN_BUDGET
+    and the model is asked for a JSON object with one summary per document. Documents whose
+    summary cannot be read from the response are sent again one request per document, as
+    are packs of a single document.
+
+    Args:
+        chain: The single-document chain.
+        batch_inputs (List[Dict[str, str]]): Inputs as returned by prepare_batch_inputs.
+        llm_model (Optional[str]): Model name the chain was built for.
+        prompt (Optional[str]): Custom prompt, or None for the configured template.
+        run_config (Dict[str, Any]): Runnable config passed to every `chain.invoke`.
+
+    Returns:
+        List[str]: One summary per input, in input order.
+    """
+    if not config.LLM_PACKING_ENABLED or len(batch_inputs) < 2:
+        return (yield chain, batch_inputs, llm_model, run_config)
+
+    packs = [pack for pack in pack_inputs(batch_inputs, config.LLM_PACK_TOKEN_BUDGET, config.LLM_PACK_MAX_DOCUMENTS)
+             if len(pack) > 1]
+    results: Dict[int, str] = {}
+    if packs:
+        instruction = prompt or (config.TEMPLATE or "").replace("{text}", "").strip() or "Summarize the document."
+        packed_inputs = [{
+            "instruction": instruction,
+            "count": str(len(pack)),
+            "documents": format_packed_documents([batch_inputs[index]["text"] for index in pack]),
+        } for pack in packs]
+        packed_chain = get_cached_chain(llm_model=llm_model, packed=True)
+        responses = yield packed_chain, packed_inputs, llm_model, run_config
+        for pack, response in zip(packs, responses):
+            for position, summary in parse_packed_response(response, len(pack)).items():
+                results[pack[position]] = summary
+
+    fallback = [index for index in range(len(batch_inputs)) if index not in results]
+    if fallback:
+        summaries = yield chain, [batch_inputs[index] for index in fallback], llm_model, run_config
+        results.update(zip(fallback, summaries))
+    logger.info(f"Packed {len(batch_inputs) - len(fallback)} documents into {len(packs)} requests, "
+                f"{len(fallback)} documents sent individually")
+    return [results[index] for index in range(len(batch_inputs))]
+
+
+def summarize_inputs(chain, batch_inputs: List[Dict[str, str]], llm_model: Optional[str],
+                     prompt: Optional[str], run_config: Dict[str, Any]) -> List[str]:
+    return run_plan(summarize_inputs_plan(chain, batch_inputs, llm_model, prompt, run_config))
+
+
 @status_updater(constants.Service.DATAFLOW_TYPE_processing_llm)
 def process_raw_data_with_llm_and_status(message: StandardizedMessage):
     return process_raw_data_with_llm(message)
 
 
-def process_raw_data_with_llm(message: StandardizedMessage) -> Generator[List[Document], None, None]:
-    start_time = time.time()
+def llm_processing_plan(message: StandardizedMessage) -> LLMPlan:
+    """
+    Summarizes the message's documents; returns the output messages holding each original
+    document followed by its summary.
+    """
     job_id = message.job_id
-    try:
-        documents = [Document.model_validate_json(doc_json) for doc_json in message.data]
-        handler = MyCustomHandler(logger)
-        config = {"max_concurrency": 5, "callbacks": [handler]}
-        if not documents:
-            logger.warning("No valid documents to process.")
-            return
-
-        logger.info(f"Processing {len(documents)} documents.")
-        logger.info(f"First document metadata: {documents[0].metadata}")
-
-        batch_inputs = prepare_batch_inputs(documents)
-        logger.info(f"the passed in model is {message.llm_model} with prompt{message.prompt}")
-        # Use the prompt from the message if available, otherwise use None
-        chain = setup_chat_model(custom_prompt=message.prompt,llm_model=message.llm_model)
-
-        batch_results = chain.batch(batch_inputs, config=config)
-
-        combined_results = []
-
-        for i, summary in enumerate(batch_results):
-            document = documents[i]
-            combined_results.append(document)
-
-            metadata = document.metadata.copy()
-            metadata["vector_id"] = f"{metadata['vector_id']}_llm"
-            metadata["doc_type"] = "SUMMARY"
-            updated_doc = Document(
-                page_content="Summary: " + summary,
-                metadata=metadata
-            )
-            combined_results.append(updated_doc)
-
-        yield StandardizedMessage(
-            job_id=job_id,
-            step_number=message.step_number,
-            data=[doc.model_dump_json() for doc in combined_results],
-            metadata={**message.metadata, "document_count": len(batch_results)}
-            # Note: We don't include the prompt here as it's not needed in the output
+    documents = [Document.model_validate_json(doc_json) for doc_json in message.data]
+    run_config = {"callbacks": [llm_telemetry]}
+    if not documents:
+        if is_empty_completion(message):
+            # Nothing new for this job; pass the empty last chunk on so later steps complete
+            return [StandardizedMessage(job_id=job_id, step_number=message.step_number, data=[],
+                                        metadata={**message.metadata, "document_count": 0})]
+        logger.warning("No valid documents to process.")
+        return []
+
+    logger.info(f"Processing {len(documents)} documents.")
+    logger.info(f"First document metadata: {documents[0].metadata}")
+
+    batch_inputs = prepare_batch_inputs(documents)
+    logger.info(f"the passed in model is {message.llm_model} with prompt{message.prompt}")
+    # Use the prompt from the message if available, otherwise use None
+    chain = get_cached_chain(custom_prompt=message.prompt, llm_model=message.llm_model)
+
+    batch_results = yield from summarize_with_cache_plan(chain, batch_inputs, message.llm_model, message.prompt,
+                                                         run_config)
+
+    combined_results = []
+
+    for i, summary in enumerate(batch_results):
+        document = documents[i]
+        combined_results.append(document)
+
+        metadata = document.metadata.copy()
+        metadata["vector_id"] = f"{metadata['vector_id']}_llm"
+        metadata["doc_type"] = "SUMMARY"
+        updated_doc = Document(
+            page_content="Summary: " + summary,
+            metadata=metadata
         )
-    except ValueError as e:
-        logger.error({"error": "Invalid document format", "details": str(e), "data": message})
+        combined_results.append(updated_doc)
+
+    return [StandardizedMessage(
+        job_id=job_id,
+        step_number=message.step_number,
+        data=[doc.model_dump_json() for doc in combined_results],
+        metadata={**message.metadata, "document_count": len(batch_results)}
+        # Note: We don't include the prompt here as it's not needed in the output
+    )]
+
+
+def log_llm_processing_error(message: StandardizedMessage, error: Exception) -> None:
+    if isinstance(error, ValueError):
+        logger.error({"error": "Invalid document format", "details": str(error), "data": message})
+    else:
+        logger.error({"error": "Failed to process messages", "details": str(error), "data": message})
+
+
+def log_llm_processing_time(start_time: float) -> None:
+    total_time = time.time() - start_time
+    logger.info(f"Total time to process documents: {total_time:.2f} seconds")
+    logger.info(f"LLM chain cache: {chain_cache.metrics()}")
+    logger.info(f"Summary cache: {summary_cache.metrics()}")
+
+
+def process_raw_data_with_llm(message: StandardizedMessage) -> Generator[StandardizedMessage, None, None]:
+    start_time = time.time()
+    try:
+        yield from run_plan(llm_processing_plan(message))
+    except Exception as e:
+        log_llm_processing_error(message, e)
+    finally:
+        log_llm_processing_time(start_time)
+
+
+async def aprocess_raw_data_with_llm(message: StandardizedMessage) -> List[StandardizedMessage]:
+    """
+    Like `process_raw_data_with_llm`, with the LLM calls awaited on the shared event loop.
+    """
+    start_time = time.time()
+    try:
+        return await arun_plan(llm_processing_plan(message))
     except Exception as e:
-        logger.error({"error": "Failed to process messages", "details": str(e), "data": message})
+        log_llm_processing_error(message, e)
+        return []
     finally:
-        end_time = time.time()
-        total_time = end_time - start_time
-        logger.info(f"Total time to process documents: {total_time:.2f} seconds")
\ No newline at end of file
+        log_llm_processing_time(start_time)
+
+
+def start_llm_processing(message: StandardizedMessage) -> Future:
+    start_status(message, constants.Service.DATAFLOW_TYPE_processing_llm)
+    return llm_event_loop.submit(aprocess_raw_data_with_llm(message))
+
+
+def finish_llm_processing(message: StandardizedMessage, future: Future) -> List[Optional[StandardizedMessage]]:
+    try:
+        result = future.result()
+    except Exception as e:
+        return finish_status(message, constants.Service.DATAFLOW_TYPE_processing_llm, error=e)
+    return finish_status(message, constants.Service.DATAFLOW_TYPE_processing_llm, result)
+
+
+def build_async_llm_logic(pending: Optional[List[StandardizedMessage]]) -> OrderedFuturesLogic:
+    """
+    Stateful logic for the LLM_ASYNC_ENABLED mode of the LLM step, keyed by job_id.
+
+    Each message is summarized on the shared event loop while the worker moves on, so a
+    slow job no longer holds up the other jobs on its worker, and the LLM calls of all
+    jobs share one pool of in-flight requests. A job's outputs are emitted in input order,
+    with the same status updates as the blocking mode. Messages still in flight are part
+    of the snapshot and are processed again after a restart.
+    """
+    return OrderedFuturesLogic(start_llm_processing, finish_llm_processing, pending,
+                               poll_interval=config.LLM_ASYNC_POLL_INTERVAL_SECONDS)
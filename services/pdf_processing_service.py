@@ -1,19 +1,62 @@
+from contextlib import nullcontext
 from typing import Generator
-from langchain_community.document_loaders.pdf import PyMuPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from orjson import orjson
+from config.config_setting import config
 from logging_config import get_logger
 from models.document import Document
+from utils.dataflow_processing_utils import iter_streaming_chunks
+from utils.download_cache import DownloadCache
+from utils.pdf_chunking import ChunkingOptions, iter_pdf_chunks, resolve_chunking
 from utils.status_update import StandardizedMessage, status_updater
 from models import constants
 
 logger = get_logger(__name__)
+
+pdf_download_cache = DownloadCache(config.PDF_CACHE_DIRECTORY, max_bytes=config.PDF_CACHE_MAX_BYTES,
+                                   revalidate_after=config.PDF_CACHE_REVALIDATE_AFTER_SECONDS,
+                                   timeout=config.PDF_DOWNLOAD_TIMEOUT_SECONDS)
+
+
 @status_updater(constants.Service.DATAFLOW_TYPE_processing_raw)
-def process_pdf_with_status(message: StandardizedMessage) -> Generator[StandardizedMessage, None, None]:
-    yield process_pdf(message)
+def process_pdf_with_status(message: StandardizedMessage):
+    return process_pdf(message)
+
+
+def iter_pdf_documents(pdf_url: str, collection: str, job_id: str,
+                       chunking: ChunkingOptions) -> Generator[str, None, None]:
+    """
+    Chunks the PDF's pages as they are extracted and yields each chunk as document JSON.
+    """
+    # Reprocessing and retries read the cached copy instead of downloading the PDF again.
+    # The copy is leased until extraction is done, since the extraction workers reopen it.
+    with pdf_download_cache.lease(pdf_url) if config.PDF_CACHE_ENABLED else nullcontext() as file_path:
+        texts = iter_pdf_chunks(pdf_url, chunking, file_path=file_path, workers=config.PDF_EXTRACTION_WORKERS,
+                                pages_per_task=config.PDF_EXTRACTION_PAGES_PER_TASK,
+                                min_parallel_pages=config.PDF_EXTRACTION_MIN_PARALLEL_PAGES)
+
+        for i, doc in enumerate(texts):
+            extra_metadata = {
+                "collection_name": collection,
+                "job_id": job_id,
+                "doc_type": "raw",
+                "vector_id": f"{pdf_url} page {str(doc.metadata['page'])} for chunk {str(i + 1)}"
+            }
+            combined_metadata = {**doc.metadata, **extra_metadata}
+            yield Document(page_content=doc.page_content, metadata=combined_metadata).model_dump_json()
+
+
 def process_pdf(message: StandardizedMessage) -> Generator[StandardizedMessage, None, None]:
     """
-    Processes a PDF document, generating chunks for each page.
+    Processes a PDF document into batches of document JSON.
+
+    The chunking strategy and sizes come from `chunking_strategy`, `chunk_size` and
+    `chunk_overlap` in resource_data, or the PDF_CHUNKING_* settings (see `resolve_chunking`).
+
+    Batches hold at most `batch_size` documents (PDF_EMIT_BATCH_SIZE by default) and
+    PDF_EMIT_BATCH_MAX_BYTES of document JSON, so each Kafka message stays well below the
+    broker's size limit however large the PDF is, and carry chunk_index, is_last_chunk and
+    documents_so_far metadata. Pages are chunked and serialized as they are extracted,
+    but bytewax's flat_map collects every batch of the PDF before emitting any of them.
 
     Args:
         message (StandardizedMessage): A standardized message containing the PDF processing information.
@@ -21,6 +64,7 @@ def process_pdf(message: StandardizedMessage) -> Generator[StandardizedMessage,
     Yields:
         Generator[StandardizedMessage, None, None]: A generator yielding StandardizedMessage objects containing the processed documents.
     """
+    emitted = 0
     try:
         resource_data = orjson.loads(message.data["resource_data"])
         job_id = message.job_id
@@ -28,40 +72,24 @@ def process_pdf(message: StandardizedMessage) -> Generator[StandardizedMessage,
         collection = resource_data["collection_name"]
         prompt = resource_data.get("prompt")
         llm_model = resource_data.get("llm_model")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=20,
-            length_function=len,
-            is_separator_regex=False
-        )
-        loader = PyMuPDFLoader(pdf_url)
-        docs = loader.load()
-
-        texts = text_splitter.split_documents(docs)
-        processed_docs = []
+        batch_size = int(resource_data.get("batch_size", config.PDF_EMIT_BATCH_SIZE))
+        chunking = resolve_chunking(resource_data, llm_model)
+        logger.info(f"Chunking {pdf_url} for job {job_id} with {chunking}")
 
-        for i, doc in enumerate(texts):
-            extra_metadata = {
-                "collection_name": collection,
-                "job_id": job_id,
-                "doc_type": "raw",
-                "vector_id": f"{pdf_url} page {str(doc.metadata['page'])} for chunk {str(i + 1)}"
-            }
-            combined_metadata = {**doc.metadata, **extra_metadata}
-            processed_doc = Document(page_content=doc.page_content, metadata=combined_metadata)
-            processed_docs.append(processed_doc.model_dump_json())
-
-        if processed_docs:
+        documents = iter_pdf_documents(pdf_url, collection, job_id, chunking)
+        for chunk, chunk_metadata in iter_streaming_chunks(documents, batch_size, config.PDF_EMIT_BATCH_MAX_BYTES):
             yield StandardizedMessage(
                 job_id=job_id,
                 step_number=message.step_number,
-                data=processed_docs,
-                metadata={**message.metadata, "pdf_url": pdf_url, "document_count": len(processed_docs)},
+                data=chunk,
+                metadata={**message.metadata, "pdf_url": pdf_url, "document_count": len(chunk), **chunk_metadata},
                 prompt=prompt,
                 llm_model=llm_model
-
             )
-            logger.info(f"Processed PDF into {len(processed_docs)} documents for job {job_id}")
+            emitted = chunk_metadata["documents_so_far"]
+
+        if emitted:
+            logger.info(f"Processed PDF into {emitted} documents for job {job_id}")
         else:
             logger.warning(f"No documents created for job {job_id}")
 
@@ -70,3 +98,6 @@ def process_pdf(message: StandardizedMessage) -> Generator[StandardizedMessage,
             "error": "Failed to process PDF",
             "details": str(e),
         })
+        if emitted:
+            # Drop the batches produced so far rather than pass on part of the PDF as complete
+            raise
@@ -0,0 +1,173 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.config_setting import config
+from logging_config import get_logger
+from services.kafka_status_service import KafkaStatusClient
+from services.user_management_service import user_management_service
+
+logger = get_logger(__name__)
+
+
+class StatusPublisher:
+    """
+    Queues job status updates and sends them from a background thread.
+
+    Only the latest state per (job_id, step_type) is kept, so an IN_PROGRESS update that
+    is superseded by COMPLETE/FAILED before the next flush is never sent. Pending updates
+    are flushed in bulk when `max_batch_size` is reached or every `flush_interval` seconds.
+    A batch that fails to send is queued again behind any newer state for the same keys
+    and retried with exponential backoff. `publish` never blocks on the network, so the
+    dataflow operator is not held up by the status API; once the publisher is closed it
+    sends each update synchronously instead.
+    """
+
+    def __init__(self, client, flush_interval: float = 1.0, max_batch_size: int = 100,
+                 max_retry_delay: float = 30.0):
+        """
+        :param client: Status client exposing `update_statuses(updates)`.
+        :param flush_interval: Maximum number of seconds an update waits before it is sent.
+        :param max_batch_size: Number of pending updates that triggers an early flush.
+        :param max_retry_delay: Upper bound in seconds of the backoff after failed flushes.
+        """
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.max_retry_delay = max_retry_delay
+        self._retry_delay = 0.0
+        self._retry_at: Optional[float] = None
+        self._pending: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.sent_count = 0
+        self.coalesced_count = 0
+
+    def publish(self, job_id: str, step_type: str, status: str, extra_data: dict = None) -> None:
+        """
+        Queue a status update without blocking, or send it right away once the publisher is closed.
+        """
+        key = (str(job_id), step_type)
+        update = {"job_id": job_id, "step_type": step_type, "status": status, "extra_data": extra_data}
+        with self._lock:
+            closed = self._closed.is_set()
+            if not closed:
+                if key in self._pending:
+                    self.coalesced_count += 1
+                    del self._pending[key]
+                self._pending[key] = update
+                pending_count = len(self._pending)
+        if closed:
+            # Nothing will flush the queue any more, e.g. updates sent from atexit handlers
+            logger.warning(f"Status publisher is closed, sending the update for job {job_id} synchronously")
+            self.client.update_statuses([update])
+            return
+        self._ensure_started()
+        if pending_count >= self.max_batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Send every pending update. Returns the number of updates sent.
+
+        Updates that fail are queued again, except where a newer update for the same
+        (job_id, step_type) arrived in the meantime, and the background thread backs off
+        before its next attempt. The client reports failures either by raising, which fails
+        the whole batch, or by returning the updates it could not send.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = OrderedDict()
+            try:
+                failed = list(self.client.update_statuses(list(batch.values())) or [])
+                error = None
+            except Exception as e:
+                failed, error = list(batch.values()), e
+
+            if failed:
+                self._requeue(failed)
+                logger.error(f"Failed to publish {len(failed)} of {len(batch)} status updates, "
+                             f"retrying in {self._retry_delay:.1f}s" + (f": {error}" if error else ""))
+            else:
+                with self._lock:
+                    self._retry_delay = 0.0
+                    self._retry_at = None
+            sent = len(batch) - len(failed)
+            self.sent_count += sent
+            return sent
+
+    def _requeue(self, updates: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            requeued: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict(
+                ((str(update["job_id"]), update["step_type"]), update) for update in updates)
+            for key in self._pending:
+                requeued.pop(key, None)
+            requeued.update(self._pending)
+            self._pending = requeued
+            self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), self.max_retry_delay)
+            self._retry_at = time.monotonic() + self._retry_delay
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2 + 5)
+        self.flush()
+        dropped = self.pending_count()
+        if dropped:
+            logger.error(f"Dropping {dropped} status updates that could not be published before shutdown")
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="status-publisher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            retry_at = self._retry_at
+            timeout = self.flush_interval if retry_at is None else max(retry_at - time.monotonic(), 0)
+            self._wakeup.wait(timeout=timeout)
+            self._wakeup.clear()
+            retry_at = self._retry_at
+            if retry_at is not None and time.monotonic() < retry_at and not self._closed.is_set():
+                continue  # Still backing off after a failed flush
+            self.flush()
+
+
+def create_status_client():
+    """
+    Build the status client selected by STATUS_BACKEND ("http" or "kafka").
+    """
+    backend = (config.STATUS_BACKEND or "http").lower()
+    if backend == "http":
+        return user_management_service
+    elif backend == "kafka":
+        return KafkaStatusClient(config.STATUS_TOPIC)
+    else:
+        raise ValueError(f"Unsupported status backend: {config.STATUS_BACKEND}")
+
+
+status_client = create_status_client()
+atexit.register(status_client.close)
+status_publisher = StatusPublisher(
+    status_client,
+    flush_interval=config.STATUS_FLUSH_INTERVAL_SECONDS,
+    max_batch_size=config.STATUS_FLUSH_MAX_BATCH,
+)
+atexit.register(status_publisher.close)
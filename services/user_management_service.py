@@ -1,3 +1,4 @@
+from typing import List, Optional
 from uuid import UUID
 import requests
 from requests import RequestException
@@ -10,9 +11,10 @@ logger = get_logger(__name__)
 
 
 class UserManagementClient:
-    def __init__(self):
+    def __init__(self, timeout: Optional[float] = None):
         self.base_url = config.USER_MANAGEMENT_SERVICE_URL
         self.session = requests.Session()
+        self.timeout = config.STATUS_UPDATE_TIMEOUT_SECONDS if timeout is None else timeout
 
 
     def update_status(self, job_id: UUID, step_type: str, status: StepStatus, extra_data: dict = None):
@@ -34,7 +36,8 @@ class UserManagementClient:
         try:
             response = self.session.put(
                 f"{self.base_url}/jobs/{job_id}/steps/{step_type}",
-                json=data
+                json=data,
+                timeout=self.timeout,
             )
             response.raise_for_status()
             logger.info(f"Step updated successfully for job: {job_id}, step type: {step_type}")
@@ -43,9 +46,26 @@ class UserManagementClient:
             logger.error(f"Error updating step for job: {job_id}, step type: {step_type}. Error: {str(e)}")
             raise
 
+    def update_statuses(self, updates: List[dict]) -> List[dict]:
+        """
+        Send a batch of status updates, continuing past individual failures.
+
+        :param updates: List of dictionaries with job_id, step_type, status and optional extra_data
+        :return: The updates that could not be sent, for the status publisher to retry
+        """
+        failed = []
+        for update in updates:
+            try:
+                self.update_status(update["job_id"], update["step_type"], update["status"],
+                                   update.get("extra_data"))
+            except RequestException:
+                # Already logged by update_status; one failing job must not drop the rest of the batch
+                failed.append(update)
+        return failed
+
     def get_job_status(self, job_id: UUID):
         logger.info(f"Getting status for job: {job_id}")
-        response = self.session.get(f"{self.base_url}/jobs/{job_id}/status")
+        response = self.session.get(f"{self.base_url}/jobs/{job_id}/status", timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
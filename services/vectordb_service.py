@@ -1,15 +1,22 @@
 import hashlib
 import json
 import uuid
-from typing import Generator, Dict, Any, List
+from typing import Generator, Dict, Any, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
 
 from config.config_setting import config
 from logging_config import get_logger
 from models import constants
 from models.document import Document
+from utils.commit_watermarks import watermark_tracker
+from utils.embedding_cache import embedding_namespace
 from utils.get_qdrant import get_qdrant_vector_store
-from utils.model_utils import setup_embedding_model
-from utils.status_update import StandardizedMessage, status_updater
+from utils.model_utils import setup_cached_embedding_model
+from utils.point_ids import generate_point_ids
+from utils.status_update import StandardizedMessage, batch_status_updater, is_empty_completion, status_updater
 
 logging = get_logger(__name__)
 
@@ -24,9 +31,115 @@ def generate_uuid_from_string(val: str) -> uuid.UUID:
         uuid.UUID: The generated UUID.
     """
     hex_string = hashlib.md5(val.encode("UTF-8")).hexdigest()
-    logging.info(f"id produced {hex_string}")
+    logging.debug(f"id produced {hex_string}")
     return uuid.UUID(hex=hex_string)
 
+
+def document_point_ids(documents: List[Document]) -> List[str]:
+    """
+    Point IDs for the documents' vector_ids, see `generate_point_ids`.
+    """
+    return generate_point_ids([f"{doc.metadata.get('vector_id')}" for doc in documents])
+
+def content_fingerprint(document: Document, namespace: str = "") -> str:
+    """
+    Fingerprint of what determines a point's vector: the embedding model and the content.
+
+    `namespace` identifies the embedding model (see `fingerprint_namespace`), so changing
+    provider, model or size re-embeds unchanged text instead of keeping the old model's
+    vectors. Metadata such as job_id changes on every run and would otherwise make every
+    document look modified; it is refreshed separately (see `refresh_payloads`).
+    """
+    return hashlib.sha256(f"{namespace}\0{document.page_content}".encode("UTF-8")).hexdigest()
+
+
+def fingerprint_namespace(embeddings: Embeddings) -> str:
+    """
+    The embedding model's namespace, the same one the embedding cache keys vectors by.
+    """
+    return embedding_namespace(embeddings)
+
+
+def fetch_existing_fingerprints(client: QdrantClient, collection_name: str, ids: List[str],
+                                batch_size: int = 256) -> Dict[str, str]:
+    """
+    Looks up the stored content fingerprints of existing points with batched retrieves.
+
+    Args:
+        client (QdrantClient): Client of the collection.
+        collection_name (str): Collection to look in.
+        ids (List[str]): Point IDs to look up.
+        batch_size (int): Number of IDs per retrieve call.
+
+    Returns:
+        Dict[str, str]: Fingerprint by point ID, for points that exist and have one.
+    """
+    fingerprints = {}
+    for start in range(0, len(ids), batch_size):
+        points = client.retrieve(
+            collection_name=collection_name,
+            ids=ids[start:start + batch_size],
+            with_payload=["metadata.content_fingerprint"],
+            with_vectors=False,
+        )
+        for point in points:
+            fingerprint = ((point.payload or {}).get("metadata") or {}).get("content_fingerprint")
+            if fingerprint:
+                fingerprints[str(point.id)] = fingerprint
+    return fingerprints
+
+
+def select_changed(client: QdrantClient, collection_name: str, ids: List[str],
+                   metadatas: List[Dict[str, Any]]) -> List[int]:
+    """
+    Returns the indices of documents whose stored fingerprint differs from their current one.
+
+    Every index is returned when VECTORDB_SKIP_UNCHANGED is off or the lookup fails.
+    """
+    changed = list(range(len(ids)))
+    if not config.VECTORDB_SKIP_UNCHANGED:
+        return changed
+    try:
+        existing = fetch_existing_fingerprints(client, collection_name, ids)
+    except Exception as e:
+        logging.warning(f"Failed to look up existing points, upserting every document: {e}")
+        return changed
+    return [i for i in changed if existing.get(ids[i]) != metadatas[i]["content_fingerprint"]]
+
+
+def refresh_unchanged(vectordb, collection_name: str, ids: List[str], metadatas: List[Dict[str, Any]],
+                      changed: List[int]) -> None:
+    """
+    Refreshes the payload of the points `select_changed` left out.
+    """
+    changed_set = set(changed)
+    unchanged = [i for i in range(len(ids)) if i not in changed_set]
+    if unchanged:
+        refresh_payloads(vectordb.client, collection_name, [ids[i] for i in unchanged],
+                         [metadatas[i] for i in unchanged],
+                         metadata_key=getattr(vectordb, "metadata_payload_key", "metadata"))
+
+
+def refresh_payloads(client: QdrantClient, collection_name: str, ids: List[str],
+                     metadatas: List[Dict[str, Any]], metadata_key: str = "metadata") -> None:
+    """
+    Replaces the metadata of points whose vectors were kept, so they carry the current
+    job_id (and other metadata) like re-embedded points do, and filters on the job_id
+    payload index find them. One request per VECTORDB_UPSERT_BATCH_SIZE points.
+    """
+    batch_size = max(config.VECTORDB_UPSERT_BATCH_SIZE, 1)
+    for start in range(0, len(ids), batch_size):
+        client.batch_update_points(
+            collection_name=collection_name,
+            update_operations=[
+                models.SetPayloadOperation(set_payload=models.SetPayload(payload={metadata_key: metadata},
+                                                                         points=[point_id]))
+                for point_id, metadata in zip(ids[start:start + batch_size], metadatas[start:start + batch_size])
+            ],
+            wait=False,
+        )
+
+
 @status_updater(constants.Service.DATAFLOW_TYPE_DATASINK)
 def insert_into_vectordb_with_status(message: StandardizedMessage):
     return process_message_to_vectordb(message)
@@ -57,17 +170,29 @@ def process_message_to_vectordb(message:StandardizedMessage) -> Generator[Dict[s
         collection_name = documents[0].metadata['collection_name']
         job_id = documents[0].metadata['job_id']
         logging.info(f"Received request for {documents[0].metadata['collection_name']}")
-        embed = setup_embedding_model()
+        embed = setup_cached_embedding_model()
         vectordb = get_qdrant_vector_store(host=config.VECTOR_DB_HOST, port=config.VECTOR_DB_PORT,
                                            embeddings=embed, collection_name=collection_name)
 
         texts = [doc.page_content for doc in documents]
-        metadatas = [doc.metadata for doc in documents]
-        ids = [str(generate_uuid_from_string(f"{doc.metadata.get('vector_id')}")) for doc in documents]
+        namespace = fingerprint_namespace(embed)
+        metadatas = [{**doc.metadata, "content_fingerprint": content_fingerprint(doc, namespace)}
+                     for doc in documents]
+        ids = document_point_ids(documents)
+
+        changed = select_changed(vectordb.client, collection_name, ids, metadatas)
+        refresh_unchanged(vectordb, collection_name, ids, metadatas, changed)
 
-        added_ids = vectordb.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+        added_ids = []
+        if changed:
+            added_ids = vectordb.add_texts(texts=[texts[i] for i in changed],
+                                           metadatas=[metadatas[i] for i in changed],
+                                           ids=[ids[i] for i in changed])
 
-        logging.info(f"Processed {len(added_ids)} documents into vectordb collection")
+        logging.info(f"Processed {len(added_ids)} documents into vectordb collection, "
+                     f"skipped {len(documents) - len(changed)} unchanged")
+        if hasattr(embed, "metrics"):
+            logging.info(f"Embedding cache: {embed.metrics()}")
         for id, metadata in zip(ids, metadatas):
             result_message = {
                 "collection_name": collection_name,
@@ -79,3 +204,143 @@ def process_message_to_vectordb(message:StandardizedMessage) -> Generator[Dict[s
     except Exception as e:
         logging.error(f"Failed to add documents to Qdrant: {e}")
 
+
+def parse_message_documents(message: StandardizedMessage) -> Optional[List[Document]]:
+    """
+    Parses the JSON documents of a message, or returns None if any of them is invalid.
+    """
+    try:
+        documents = [Document.model_validate(json.loads(doc)) for doc in message.data]
+    except json.JSONDecodeError as e:
+        logging.error(f"Failed to parse JSON in message for job {message.job_id}: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Failed to validate documents for job {message.job_id}: {e}")
+        return None
+    if not documents:
+        logging.error(f"No documents in message for job {message.job_id}")
+        return None
+    return documents
+
+
+def collection_key(message: StandardizedMessage) -> Tuple[str, StandardizedMessage]:
+    """
+    Keys a message by the collection of its first document, for batching with `op.collect`.
+
+    Messages that cannot be parsed get an empty key; they are reported as failed when
+    their batch is processed.
+    """
+    try:
+        return json.loads(message.data[0])["metadata"]["collection_name"], message
+    except Exception:
+        return "", message
+
+
+def upsert_documents(vectordb, collection_name: str, documents: List[Document], ids: List[str],
+                     metadatas: List[Dict[str, Any]]) -> None:
+    """
+    Embeds the documents in one call and uploads them without waiting for indexing.
+
+    Points use the same payload layout as the langchain Qdrant store. The upload is split
+    into VECTORDB_UPSERT_BATCH_SIZE requests sent by VECTORDB_UPSERT_PARALLEL processes.
+    """
+    vectors = vectordb.embeddings.embed_documents([doc.page_content for doc in documents])
+    content_key = getattr(vectordb, "content_payload_key", "page_content")
+    metadata_key = getattr(vectordb, "metadata_payload_key", "metadata")
+    points = [
+        models.PointStruct(id=point_id, vector=vector,
+                           payload={content_key: doc.page_content, metadata_key: metadata})
+        for point_id, vector, doc, metadata in zip(ids, vectors, documents, metadatas)
+    ]
+    vectordb.client.upload_points(
+        collection_name=collection_name,
+        points=points,
+        batch_size=config.VECTORDB_UPSERT_BATCH_SIZE,
+        parallel=config.VECTORDB_UPSERT_PARALLEL,
+        wait=False,
+    )
+
+
+def insert_batch_into_vectordb(messages: List[StandardizedMessage]) -> List[List[Dict[str, Any]]]:
+    """
+    Stores the documents of several messages for the same collection with a single
+    embedding call and upload.
+
+    Args:
+        messages (List[StandardizedMessage]): Messages collected for one collection.
+
+    Returns:
+        List[List[Dict[str, Any]]]: Result messages for each input message, in order. A
+        message whose documents could not be parsed, or whose collection differs from the
+        batch, gets an empty list; if the upload fails every message does.
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in messages]
+    batch: List[Tuple[int, Document, str]] = []
+    collection_name = None
+    for index, message in enumerate(messages):
+        if is_empty_completion(message):
+            continue
+        documents = parse_message_documents(message)
+        if documents is None:
+            continue
+        message_collection = documents[0].metadata.get("collection_name")
+        collection_name = collection_name or message_collection
+        if message_collection != collection_name:
+            logging.error(f"Message for job {message.job_id} targets {message_collection}, "
+                          f"batched with {collection_name}")
+            continue
+        for doc, point_id in zip(documents, document_point_ids(documents)):
+            batch.append((index, doc, point_id))
+
+    if not batch:
+        record_delivered(messages, results)
+        return results
+
+    try:
+        embed = setup_cached_embedding_model()
+        vectordb = get_qdrant_vector_store(host=config.VECTOR_DB_HOST, port=config.VECTOR_DB_PORT,
+                                           embeddings=embed, collection_name=collection_name)
+        ids = [point_id for _, _, point_id in batch]
+        namespace = fingerprint_namespace(embed)
+        metadatas = [{**doc.metadata, "content_fingerprint": content_fingerprint(doc, namespace)}
+                     for _, doc, _ in batch]
+        changed = select_changed(vectordb.client, collection_name, ids, metadatas)
+        refresh_unchanged(vectordb, collection_name, ids, metadatas, changed)
+        if changed:
+            upsert_documents(vectordb, collection_name, [batch[i][1] for i in changed],
+                             [ids[i] for i in changed], [metadatas[i] for i in changed])
+        logging.info(f"Upserted {len(changed)} documents from {len(messages)} messages into {collection_name}, "
+                     f"skipped {len(batch) - len(changed)} unchanged")
+        if hasattr(embed, "metrics"):
+            logging.info(f"Embedding cache: {embed.metrics()}")
+    except Exception as e:
+        logging.error(f"Failed to add batch of {len(batch)} documents to Qdrant: {e}")
+        return [[] for _ in messages]
+
+    for index, doc, point_id in batch:
+        results[index].append({
+            "collection_name": collection_name,
+            "vector_db_id": point_id,
+            "job_id": doc.metadata.get("job_id", messages[index].job_id),
+            "document_type": doc.metadata.get('doc_type', 'UNKNOWN')
+        })
+    record_delivered(messages, results)
+    return results
+
+
+def record_delivered(messages: List[StandardizedMessage], results: List[List[Dict[str, Any]]]) -> None:
+    """
+    Tells the watermark tracker which messages are stored, so a GitHub job's commit
+    watermark advances once all of its chunks are.
+    """
+    for message, message_results in zip(messages, results):
+        if message_results or is_empty_completion(message):
+            try:
+                watermark_tracker.delivered(message.job_id, message.metadata)
+            except Exception as e:
+                logging.error(f"Failed to advance the commit watermark for job {message.job_id}: {e}")
+
+
+@batch_status_updater(constants.Service.DATAFLOW_TYPE_DATASINK)
+def insert_batch_into_vectordb_with_status(messages: List[StandardizedMessage]):
+    return insert_batch_into_vectordb(messages)
@@ -38,6 +38,42 @@ from models.document import Document
 
 
 
+@pytest.fixture(autouse=True)
+def isolated_commit_watermarks(tmp_path):
+    # Keep watermarks out of the working tree so re-running a GitHub test never turns it into a no-op
+    from services.github_service import CommitWatermarkStore
+    with patch('services.github_service.commit_watermarks', CommitWatermarkStore(str(tmp_path / "watermarks"))):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_summary_cache(tmp_path):
+    # Summaries cached by one test must not short-circuit the LLM call in another
+    from utils.disk_cache import DiskCache
+    cache = DiskCache(str(tmp_path / "summaries.sqlite3"))
+    with patch('services.message_processing_service.summary_cache', cache):
+        yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_pdf_download_cache(tmp_path):
+    from utils.download_cache import DownloadCache
+    cache = DownloadCache(str(tmp_path / "pdfs"))
+    with patch('services.pdf_processing_service.pdf_download_cache', cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_embedding_cache(tmp_path):
+    from utils import model_utils
+    from utils.disk_cache import DiskCache
+    cache = DiskCache(str(tmp_path / "embeddings.sqlite3"))
+    with patch.object(model_utils, 'embedding_cache', cache), patch.dict(model_utils._cached_embedding_models, clear=True):
+        yield cache
+    cache.close()
+
+
 @pytest.fixture
 def sample_messages(sample_documents):
     return [doc.model_dump_json() for doc in sample_documents]
@@ -77,7 +113,7 @@ def mock_get_qdrant(mock_qdrant_instance):
 
 @pytest.fixture
 def mock_setup_embedding():
-    with patch('services.vectordb_service.setup_embedding_model') as mock:
+    with patch('services.vectordb_service.setup_cached_embedding_model') as mock:
         yield mock
 
 @pytest.fixture
@@ -199,6 +235,40 @@ def standard_message_factory():
 
         )
     return _create_message
+@pytest.fixture
+def local_pdf_path(tmp_path):
+    # A multi-page PDF with enough text per page to produce several chunks
+    import pymupdf
+    doc = pymupdf.open()
+    for number in range(12):
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800),
+                            " ".join(f"Page {number} sentence {n} about Gutenberg." for n in range(40)))
+    doc.set_metadata({"title": "Sample", "author": "Tests"})
+    path = tmp_path / "sample.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def layout_pdf_path(tmp_path):
+    # Two sections with large-font headings, each followed by several body paragraphs
+    import pymupdf
+    doc = pymupdf.open()
+    for number, heading in enumerate(["Introduction", "Movable Type"]):
+        page = doc.new_page()
+        page.insert_text((50, 60), heading, fontsize=20)
+        for paragraph in range(4):
+            page.insert_textbox(pymupdf.Rect(50, 90 + paragraph * 150, 550, 230 + paragraph * 150),
+                                " ".join(f"Paragraph {paragraph} of section {number} sentence {n}." for n in range(8)),
+                                fontsize=10)
+    path = tmp_path / "layout.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
 @pytest.fixture
 def sample_pdf_input():
     # Fixture for the correct sample PDF input data
@@ -247,7 +317,7 @@ def mock_standardized_message():
     )
 @pytest.fixture
 def mock_user_management_service():
-    with patch('utils.status_update.user_management_service') as mock_service:
+    with patch('utils.status_update.status_client') as mock_service:
         mock_service.update_status.return_value = {"status": "success"}
         yield mock_service
 
@@ -5,7 +5,8 @@ from models.constants import Service, StepStatus
 
 
 def test_update_status():
-    with patch('utils.status_update.user_management_service.update_status') as mock_update_status:
+    with patch('utils.status_update.status_client.update_status') as mock_update_status, \
+            patch('utils.status_update.config.STATUS_UPDATE_ASYNC', False):
         job_id = "test_job_id"
         service = Service.DATAFLOW_TYPE_processing_raw
         status = StepStatus.IN_PROGRESS
@@ -0,0 +1,57 @@
+import asyncio
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+from utils.async_runner import BackgroundEventLoop, OrderedFuturesLogic
+
+
+def test_ordered_futures_logic_emits_in_arrival_order_without_waiting():
+    futures = {"a": Future(), "b": Future()}
+    logic = OrderedFuturesLogic(lambda value: futures[value], lambda value, future: [future.result()])
+
+    assert logic.on_item("a") == ([], False)
+    assert logic.on_item("b") == ([], False)
+    assert logic.notify_at() > datetime.now(timezone.utc)
+
+    futures["b"].set_result("B")
+    assert logic.on_notify() == ([], False)
+    assert logic.snapshot() == ["a", "b"]
+
+    futures["a"].set_result("A")
+    assert logic.on_notify() == (["A", "B"], True)
+    assert logic.notify_at() is None
+
+
+def test_ordered_futures_logic_restarts_snapshotted_items():
+    started = []
+
+    def start(value):
+        started.append(value)
+        future = Future()
+        future.set_result(value.upper())
+        return future
+
+    logic = OrderedFuturesLogic(start, lambda value, future: [future.result()], pending=["a", "b"])
+
+    assert started == ["a", "b"]
+    assert logic.on_eof() == (["A", "B"], True)
+
+
+def test_background_event_loop_submit_does_not_block():
+    runner = BackgroundEventLoop(max_pending=2)
+    release = None
+
+    async def wait_for_release(value):
+        await release.wait()
+        return value
+
+    async def make_event():
+        return asyncio.Event()
+
+    release = runner.run(make_event())
+    future = runner.submit(wait_for_release("done"))
+    assert not future.done()
+
+    runner.loop.call_soon_threadsafe(release.set)
+    assert future.result(timeout=5) == "done"
+    runner.close()
@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+import orjson
+from bytewax.connectors.kafka import KafkaSourceMessage
+
+from models.constants import Service, StepStatus
+from utils.dataflow_processing_utils import (iter_chunks, iter_streaming_chunks, kafka_to_standardized,
+                                             to_kafka_sink_message)
+from utils.status_update import StandardizedMessage, status_updater
+
+
+def test_iter_chunks_describes_each_chunk():
+    chunks = list(iter_chunks(["a", "b", "c", "d", "e"], 2))
+
+    assert [chunk for chunk, _ in chunks] == [["a", "b"], ["c", "d"], ["e"]]
+    assert [meta["chunk_index"] for _, meta in chunks] == [0, 1, 2]
+    assert [meta["is_last_chunk"] for _, meta in chunks] == [False, False, True]
+    assert all(meta["chunk_count"] == 3 and meta["total_document_count"] == 5 for _, meta in chunks)
+
+
+def test_iter_chunks_without_limit_emits_single_chunk():
+    chunks = list(iter_chunks(["a", "b", "c"], 0))
+
+    assert len(chunks) == 1
+    assert chunks[0][1]["is_last_chunk"] is True
+
+
+def test_iter_streaming_chunks_limits_items_and_bytes():
+    chunks = list(iter_streaming_chunks(iter(["aa", "bb", "cc", "dddddd", "e"]), 3, max_bytes=5))
+
+    assert [chunk for chunk, _ in chunks] == [["aa", "bb"], ["cc"], ["dddddd"], ["e"]]
+    assert [meta["documents_so_far"] for _, meta in chunks] == [2, 3, 4, 5]
+    assert [meta["is_last_chunk"] for _, meta in chunks] == [False, False, False, True]
+    assert "chunk_count" not in chunks[0][1]
+    assert chunks[-1][1] == {"chunk_index": 3, "chunk_count": 4, "is_last_chunk": True,
+                             "documents_so_far": 5, "total_document_count": 5}
+    assert list(iter_streaming_chunks(iter([]), 3)) == []
+
+
+def test_kafka_to_standardized_keeps_chunk_position():
+    upstream = StandardizedMessage(job_id="job_1", step_number=1, data=["doc"],
+                                   metadata={"chunk_index": 1, "chunk_count": 2, "is_last_chunk": True,
+                                             "total_document_count": 150, "repo_name": "repo"})
+    msg = KafkaSourceMessage(key=None, value=upstream.model_dump_json().encode("utf-8"), topic="raw",
+                             partition=0, offset=0)
+
+    standardized = kafka_to_standardized(msg)
+
+    assert standardized.step_number == 2
+    assert standardized.metadata == {"original_topic": "raw", "chunk_index": 1, "chunk_count": 2,
+                                     "is_last_chunk": True, "total_document_count": 150}
+
+
+def test_to_kafka_sink_message_is_keyed_by_job():
+    message = StandardizedMessage(job_id="job_1", step_number=1, data=["doc"])
+
+    sink_message = to_kafka_sink_message(message)
+
+    assert sink_message.key == b"job_1"
+    assert orjson.loads(sink_message.value)["data"] == ["doc"]
+
+
+def test_status_updater_completes_chunked_job_on_last_chunk():
+    @status_updater(Service.DATAFLOW_TYPE_processing_llm)
+    def process(message):
+        if message.metadata["chunk_index"] == 0:
+            raise ValueError("bad chunk")
+        return message
+
+    def chunk(index):
+        return StandardizedMessage(job_id="chunked_job", step_number=1, data=["doc"],
+                                   metadata={"chunk_index": index, "chunk_count": 3, "is_last_chunk": index == 2})
+
+    with patch('utils.status_update.update_status') as mock_update_status:
+        process(chunk(1))
+        assert mock_update_status.call_args[0][2] == StepStatus.IN_PROGRESS
+        process(chunk(0))
+        assert mock_update_status.call_args[0][2] == StepStatus.FAILED
+        process(chunk(2))
+        assert mock_update_status.call_args[0][2] == StepStatus.FAILED
+
+    with patch('utils.status_update.update_status') as mock_update_status:
+        for index in range(1, 3):
+            process(chunk(index))
+        assert mock_update_status.call_args[0][2] == StepStatus.COMPLETE
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from utils import concurrency_limiter
+from utils.async_runner import BackgroundEventLoop
+from utils.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter, abatch_with_limiter, batch_with_limiter, estimate_tokens,
+)
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return RateLimitError("Rate limit reached", response=httpx.Response(429, request=request), body=None)
+
+
+def test_limit_increases_additively_on_success():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, max_limit=4)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    assert limiter.limit == 4
+
+
+def test_limit_halves_on_throttling_once_per_latency_window():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=8)
+    limiter.acquire()
+    limiter.release(10.0)
+    start_limit = limiter.limit
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(0.1, throttled=True)
+
+    assert limiter.limit == pytest.approx(start_limit / 2)
+    assert limiter.metrics()["throttled"] == 3
+    assert limiter.metrics()["decreases"] == 1
+
+
+def test_limit_decreases_when_latency_degrades():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=8, latency_tolerance=2.0)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.001)
+    high = limiter.limit
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.05)
+
+    assert limiter.limit < high
+    assert limiter.metrics()["decreases"] >= 1
+
+
+def test_acquire_waits_for_token_budget():
+    limiter = AdaptiveConcurrencyLimiter("test", tokens_per_minute=6000)
+    limiter.acquire(6000)
+    limiter.release(0.01)
+
+    start = time.monotonic()
+    limiter.acquire(10)
+    limiter.release(0.01)
+
+    # 10 tokens at 100 tokens per second
+    assert time.monotonic() - start >= 0.09
+
+
+def test_batch_with_limiter_respects_limit_and_order():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, max_limit=2)
+    in_flight = []
+    active = 0
+    lock = threading.Lock()
+
+    def call(item):
+        nonlocal active
+        with lock:
+            active += 1
+            in_flight.append(active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return item * 2
+
+    assert batch_with_limiter(call, list(range(10)), limiter) == [i * 2 for i in range(10)]
+    assert max(in_flight) <= 2
+
+
+def test_batch_with_limiter_retries_throttled_calls():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=4)
+    attempts = []
+
+    def call(item):
+        attempts.append(item)
+        if len(attempts) == 1:
+            raise rate_limit_error()
+        return item
+
+    assert batch_with_limiter(call, ["a"], limiter, max_attempts=3) == ["a"]
+    assert len(attempts) == 2
+    assert limiter.metrics()["throttled"] == 1
+
+
+def test_batch_with_limiter_raises_other_errors():
+    limiter = AdaptiveConcurrencyLimiter("test")
+
+    def call(item):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        batch_with_limiter(call, ["a"], limiter)
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_estimate_tokens_falls_back_without_tiktoken_encoding():
+    with patch.object(concurrency_limiter, "_encoding", None), \
+            patch.object(concurrency_limiter, "_encoding_failed", True):
+        assert estimate_tokens("a" * 40) == 11
+
+
+def test_abatch_with_limiter_shares_limit_across_coroutines():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, max_limit=2)
+    in_flight = []
+    active = 0
+
+    async def call(item):
+        nonlocal active
+        active += 1
+        in_flight.append(active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return item
+
+    async def two_messages():
+        return await asyncio.gather(abatch_with_limiter(call, [1, 2, 3], limiter),
+                                    abatch_with_limiter(call, [4, 5, 6], limiter))
+
+    assert BackgroundEventLoop().run(two_messages()) == [[1, 2, 3], [4, 5, 6]]
+    assert max(in_flight) <= 2
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_background_event_loop_is_shared_between_threads():
+    runner = BackgroundEventLoop()
+
+    async def loop_id():
+        return id(asyncio.get_running_loop())
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(runner.run(loop_id()))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    runner.close()
+
+    assert len(set(results)) == 1
@@ -0,0 +1,36 @@
+from utils.disk_cache import DiskCache, content_key
+
+
+def test_content_key_depends_on_every_part():
+    assert content_key("fake", "Summarize", "text") == content_key("fake", "Summarize", "text")
+    assert content_key("fake", "Summarize", "text") != content_key("openai", "Summarize", "text")
+    assert content_key("fake", None, "text") != content_key("fake", "text", None)
+
+
+def test_disk_cache_round_trip_and_metrics(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    cache.set_many({"a": b"1", "b": b"2"})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": b"1", "b": b"2"}
+    assert cache.metrics()["hits"] == 2
+    assert cache.metrics()["misses"] == 1
+    assert cache.metrics()["hit_rate"] == round(2 / 3, 4)
+    cache.close()
+
+    reopened = DiskCache(str(tmp_path / "cache.sqlite3"))
+    assert reopened.get("a") == b"1"
+    assert len(reopened) == 2
+    reopened.close()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_entries=4, evict_fraction=0.5)
+    for key in ["a", "b", "c", "d"]:
+        cache.set(key, key.encode())
+    cache.get("a")
+    cache.set("e", b"e")
+
+    assert len(cache) == 2
+    assert cache.metrics()["evictions"] == 3
+    assert set(cache.get_many(["a", "b", "c", "d", "e"])) == {"a", "e"}
+    cache.close()
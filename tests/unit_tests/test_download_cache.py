@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from utils.download_cache import DownloadCache
+
+
+def fake_response(status_code=200, content=b"", headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.side_effect = lambda chunk_size: (content[i:i + chunk_size]
+                                                            for i in range(0, len(content), chunk_size))
+    response.__enter__.return_value = response
+    return response
+
+
+def test_download_is_streamed_and_reused_without_requests(tmp_path):
+    cache = DownloadCache(str(tmp_path), chunk_size=4)
+    with patch("utils.download_cache.requests.get",
+               return_value=fake_response(content=b"%PDF-1.7 body", headers={"ETag": '"v1"'})) as mock_get:
+        path = cache.fetch("https://example.com/a.pdf")
+        assert cache.fetch("https://example.com/a.pdf") == path
+
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs["stream"] is True
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF-1.7 body"
+    assert cache.metrics() == {"hits": 1, "revalidated": 0, "downloads": 1}
+
+
+def test_stale_entry_is_revalidated_with_validators(tmp_path):
+    cache = DownloadCache(str(tmp_path), revalidate_after=0)
+    headers = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"pdf", headers=headers)):
+        path = cache.fetch("https://example.com/a.pdf")
+
+    with patch("utils.download_cache.requests.get", return_value=fake_response(status_code=304)) as mock_get:
+        assert cache.fetch("https://example.com/a.pdf") == path
+    assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"',
+                                                    "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    assert cache.revalidated == 1
+
+    with patch("utils.download_cache.requests.get", side_effect=requests.ConnectionError("offline")):
+        assert cache.fetch("https://example.com/a.pdf") == path
+
+
+def test_identical_content_is_stored_once_and_failures_raise(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"same")):
+        assert cache.fetch("https://example.com/a.pdf") == cache.fetch("https://mirror.example.com/a.pdf")
+
+    with patch("utils.download_cache.requests.get", return_value=fake_response(status_code=404)):
+        with pytest.raises(ValueError):
+            cache.fetch("https://example.com/missing.pdf")
+    assert not os.listdir(os.path.join(str(tmp_path), "tmp"))
+
+
+def test_existing_object_is_not_replaced_by_identical_download(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"same")):
+        with cache.lease("https://example.com/a.pdf") as path:
+            inode = os.stat(path).st_ino
+            assert cache.fetch("https://mirror.example.com/a.pdf") == path
+            assert os.stat(path).st_ino == inode
+    assert not os.listdir(os.path.join(str(tmp_path), "tmp"))
+
+
+def test_eviction_skips_objects_removed_while_listing(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=0)
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"pdf")):
+        path = cache.fetch("https://example.com/a.pdf")
+
+    real_stat = os.stat
+
+    def stat(p, *args, **kwargs):
+        if p == path:
+            raise FileNotFoundError(p)  # removed by another process after os.walk listed it
+        return real_stat(p, *args, **kwargs)
+
+    with patch("utils.download_cache.os.stat", side_effect=stat):
+        cache._evict()
+    assert os.path.exists(path)
+
+
+def test_concurrent_fetches_share_one_download(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+
+    def slow_get(*args, **kwargs):
+        time.sleep(0.1)
+        return fake_response(content=b"pdf")
+
+    with patch("utils.download_cache.requests.get", side_effect=slow_get) as mock_get:
+        threads = [threading.Thread(target=cache.fetch, args=("https://example.com/a.pdf",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert mock_get.call_count == 1
+
+
+def test_least_recently_used_objects_are_evicted(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=10)
+    paths = []
+    for name in ("a", "b", "c"):
+        with patch("utils.download_cache.requests.get", return_value=fake_response(content=name.encode() * 4)):
+            paths.append(cache.fetch(f"https://example.com/{name}.pdf"))
+        time.sleep(0.01)
+
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"aaaa")) as mock_get:
+        cache.fetch("https://example.com/a.pdf")
+    assert mock_get.call_count == 1
+
+
+def test_leased_objects_are_not_evicted(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=10)
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"aaaa")):
+        with cache.lease("https://example.com/a.pdf") as leased:
+            for name in ("b", "c"):
+                time.sleep(0.01)
+                with patch("utils.download_cache.requests.get", return_value=fake_response(content=name.encode() * 4)):
+                    cache.fetch(f"https://example.com/{name}.pdf")
+            assert os.path.exists(leased)
+
+    with patch("utils.download_cache.requests.get", return_value=fake_response(content=b"dddd")):
+        cache.fetch("https://example.com/d.pdf")
+    assert not os.path.exists(leased)
+
+
+def test_caches_sharing_a_directory_share_one_download(tmp_path):
+    # Separate instances stand in for worker processes: only the file lock is shared
+    caches = [DownloadCache(str(tmp_path)) for _ in range(4)]
+
+    def slow_get(*args, **kwargs):
+        time.sleep(0.1)
+        return fake_response(content=b"pdf")
+
+    with patch("utils.download_cache.requests.get", side_effect=slow_get) as mock_get:
+        threads = [threading.Thread(target=cache.fetch, args=("https://example.com/a.pdf",)) for cache in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert mock_get.call_count == 1
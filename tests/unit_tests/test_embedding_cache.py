@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock
+
+from langchain_core.embeddings import FakeEmbeddings
+
+from utils.disk_cache import DiskCache
+from utils.embedding_cache import CachedEmbeddings, decode_vector, encode_vector, embedding_namespace
+from utils.model_utils import setup_cached_embedding_model
+
+
+def test_vectors_round_trip_as_float32():
+    blob = encode_vector([0.5, -1.25, 3.0])
+
+    assert len(blob) == 12
+    assert decode_vector(blob) == [0.5, -1.25, 3.0]
+
+
+def test_cached_embeddings_only_embeds_misses(tmp_path):
+    inner = MagicMock()
+    inner.embed_documents.side_effect = lambda texts: [[float(len(text)), 1.0] for text in texts]
+    cached = CachedEmbeddings(inner, DiskCache(str(tmp_path / "embeddings.sqlite3")), namespace="test-model")
+
+    first = cached.embed_documents(["a", "bb", "a"])
+    second = cached.embed_documents(["bb", "ccc"])
+
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert second == [[2.0, 1.0], [3.0, 1.0]]
+    assert [call.args[0] for call in inner.embed_documents.call_args_list] == [["a", "bb"], ["ccc"]]
+    assert cached.metrics()["hits"] == 2
+    assert cached.metrics()["misses"] == 3
+
+
+def test_cached_embeddings_are_namespaced_by_model(tmp_path):
+    cache = DiskCache(str(tmp_path / "embeddings.sqlite3"))
+    small = CachedEmbeddings(FakeEmbeddings(size=4), cache)
+    large = CachedEmbeddings(FakeEmbeddings(size=8), cache)
+
+    assert embedding_namespace(FakeEmbeddings(size=4)) == "FakeEmbeddings:4"
+    assert len(small.embed_documents(["text"])[0]) == 4
+    assert len(large.embed_documents(["text"])[0]) == 8
+    assert small.embed_documents(["text"]) == small.embed_documents(["text"])
+
+
+def test_setup_cached_embedding_model_is_shared_per_provider():
+    assert setup_cached_embedding_model("fake") is setup_cached_embedding_model("fake")
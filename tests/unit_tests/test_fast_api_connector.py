@@ -48,6 +48,14 @@ def test_fastapi_sink_build(sample_url, sample_auth_header, sample_prepare_paylo
     assert connector.url == sample_url
     assert connector.auth_header == sample_auth_header
 
+def test_fastapi_sink_close_runs_on_close_hook(mock_httpx_client, sample_url, sample_auth_header, sample_prepare_payload):
+    on_close = MagicMock()
+    connector = HTTPSink(sample_url, sample_auth_header, sample_prepare_payload, on_close=on_close).build("step_1", 0, 1)
+    connector.close()
+
+    mock_httpx_client.return_value.close.assert_called()
+    on_close.assert_called_once_with()
+
 @pytest.mark.parametrize("input_data,expected_calls", [
     (["item1", "item2"], 2),
     ([], 0),
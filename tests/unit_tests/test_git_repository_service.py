@@ -0,0 +1,141 @@
+import os
+import subprocess
+from unittest.mock import patch
+
+import orjson
+import pytest
+
+from services.git_repository_service import GitMirrorRetriever, validate_revision
+from services.github_service import fetch_and_emit_commits
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Octo Cat", "GIT_AUTHOR_EMAIL": "octocat@example.com",
+    "GIT_COMMITTER_NAME": "Octo Cat", "GIT_COMMITTER_EMAIL": "octocat@example.com",
+}
+
+
+def git(repo_dir, *args, date="2024-01-01T12:00:00+02:00"):
+    env = {**os.environ, **GIT_ENV, "GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+    return subprocess.run(["git", "-C", str(repo_dir), *args], check=True, capture_output=True, text=True,
+                          env=env).stdout.strip()
+
+
+@pytest.fixture
+def local_repo(tmp_path):
+    # Laid out like <base_url>/<owner>/<repo>.git so the retriever derives its clone URL
+    repo_dir = tmp_path / "remote" / "octocat" / "repo.git"
+    repo_dir.mkdir(parents=True)
+    git(repo_dir, "init", "--quiet", "--initial-branch=main")
+    (repo_dir / "README.md").write_text("Hello World!\n")
+    (repo_dir / "old_name.py").write_text("print('hi')\n")
+    git(repo_dir, "add", ".")
+    git(repo_dir, "commit", "--quiet", "-m", "Initial commit\n\nWith a body.", date="2024-01-01T12:00:00+02:00")
+
+    (repo_dir / "README.md").write_text("Hello Git!\n")
+    git(repo_dir, "mv", "old_name.py", "new_name.py")
+    (repo_dir / "logo.png").write_bytes(b"\x89PNG\x00\x01\x02")
+    git(repo_dir, "add", ".")
+    git(repo_dir, "commit", "--quiet", "-m", "Update readme", date="2024-01-02T12:00:00+00:00")
+
+    git(repo_dir, "rm", "--quiet", "README.md")
+    git(repo_dir, "commit", "--quiet", "-m", "Remove readme", date="2024-01-03T12:00:00+00:00")
+    return repo_dir
+
+
+def test_iter_commit_data_matches_github_shape(tmp_path, local_repo):
+    retriever = GitMirrorRetriever(str(tmp_path / "mirrors"), base_url=str(tmp_path / "remote"))
+
+    commits = list(retriever.iter_commit_data("octocat", "repo"))
+
+    assert [c.message for c in commits] == ["Remove readme", "Update readme", "Initial commit\n\nWith a body."]
+    initial = commits[-1]
+    assert initial.author == "Octo Cat"
+    assert initial.date == "2024-01-01T10:00:00+00:00"
+    assert initial.url == f"https://github.com/octocat/repo/commit/{initial.commit_id}"
+    readme = next(f for f in initial.files if f.filename == "README.md")
+    assert (readme.status, readme.additions, readme.deletions) == ("added", 1, 0)
+    assert readme.patch == "@@ -0,0 +1 @@\n+Hello World!"
+
+    files = {f.filename: f for f in commits[1].files}
+    assert files["README.md"].patch == "@@ -1 +1 @@\n-Hello World!\n+Hello Git!"
+    assert files["README.md"].changes == 2
+    assert files["new_name.py"].status == "renamed"
+    assert files["new_name.py"].patch is None
+    assert files["logo.png"].status == "added"
+    assert files["logo.png"].patch is None
+
+    removed = commits[0].files[0]
+    assert (removed.filename, removed.status, removed.deletions) == ("README.md", "removed", 1)
+
+
+def test_sync_fetches_new_commits_into_existing_mirror(tmp_path, local_repo):
+    retriever = GitMirrorRetriever(str(tmp_path / "mirrors"), base_url=str(tmp_path / "remote"))
+    assert len(list(retriever.iter_commit_data("octocat", "repo"))) == 3
+
+    (local_repo / "CHANGELOG.md").write_text("v2\n")
+    git(local_repo, "add", ".")
+    git(local_repo, "commit", "--quiet", "-m", "Add changelog", date="2024-01-04T12:00:00+00:00")
+    commits = list(retriever.iter_commit_data("octocat", "repo", {"since": "2024-01-03T13:00:00+00:00"}))
+
+    assert [c.message for c in commits] == ["Add changelog"]
+
+
+def test_auth_header_is_not_persisted_in_mirror(tmp_path):
+    retriever = GitMirrorRetriever(str(tmp_path / "mirrors"), token="secret-token")
+
+    assert retriever._auth_options("/some/local/path") == []
+    options = retriever._auth_options("https://github.com/octocat/repo.git")
+    assert "secret-token" not in " ".join(options)
+
+
+def test_fetch_and_emit_commits_with_git_retriever(tmp_path, local_repo, standard_message_factory):
+    resource_data = {"owner": "octocat", "repo_name": "repo", "retriever": "git"}
+    message = standard_message_factory(job_id="job_1", step_number=1,
+                                       data={"resource_data": orjson.dumps(resource_data).decode("utf-8")})
+    retriever = GitMirrorRetriever(str(tmp_path / "mirrors"), base_url=str(tmp_path / "remote"))
+
+    with patch("services.github_service.git_mirror_retriever", retriever), \
+            patch("services.github_service.fetch_repository") as fetch_repository:
+        messages = list(fetch_and_emit_commits(message))
+
+    fetch_repository.assert_not_called()
+    documents = [orjson.loads(doc) for doc in messages[0].data]
+    # Renames and binary files have no patch, so only text changes become documents
+    assert sorted((doc["metadata"]["filename"], doc["metadata"]["status"]) for doc in documents) == [
+        ("README.md", "removed"), ("old_name.py", "added")]
+
+
+@pytest.mark.parametrize("owner,repo_name", [("..", "repo"), ("octocat", ".."), ("../etc", "repo"),
+                                             ("octocat", "repo/../../x"), ("octo cat", "repo")])
+def test_mirror_path_rejects_unsafe_names(tmp_path, owner, repo_name):
+    retriever = GitMirrorRetriever(str(tmp_path / "mirrors"))
+
+    with pytest.raises(ValueError):
+        retriever.mirror_path(owner, repo_name)
+    with pytest.raises(ValueError):
+        retriever.sync(owner, repo_name)
+
+
+def test_clone_url_is_derived_from_owner_and_repo(tmp_path):
+    retriever = GitMirrorRetriever(str(tmp_path / "mirrors"))
+
+    assert retriever.clone_url("octocat", "Hello-World") == "https://github.com/octocat/Hello-World.git"
+    assert retriever.mirror_path("octocat", "Hello-World") == str(tmp_path / "mirrors" / "octocat" / "Hello-World.git")
+
+
+@pytest.mark.parametrize("revision", ["--output=/tmp/pwned", "-p", "main..other", "bad ref", ""])
+def test_option_like_revisions_are_rejected(revision):
+    with pytest.raises(ValueError):
+        validate_revision(revision)
+    if revision:
+        with pytest.raises(ValueError):
+            GitMirrorRetriever.log_arguments({"sha": revision})
+
+
+def test_log_arguments_pass_revision_after_end_of_options():
+    args = GitMirrorRetriever.log_arguments({"sha": "feature/login", "author": "octocat", "path": "src"})
+    assert args == ["--author=octocat", "--end-of-options", "feature/login", "--", "src"]
+
+    sha = "a" * 40
+    assert GitMirrorRetriever.log_arguments({"sha": sha})[-1] == sha
+    assert GitMirrorRetriever.log_arguments({})[-2:] == ["--end-of-options", "HEAD"]
@@ -1,5 +1,12 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
 import pytest
-from github import Github, Auth
+from unittest.mock import MagicMock, patch
+from github import Github, Auth, RateLimitExceededException
 import orjson
 
 from logging_config import get_logger, setup_logging
@@ -8,13 +15,20 @@ from services.github_service import (
     create_document,
     fetch_commit_data,
     fetch_all_commit_data,
+    iter_commit_data,
     get_latest_files,
     create_documents,
     fetch_and_emit_commits,
+    fetch_and_emit_commits_with_status,
+    call_with_rate_limit,
+    GitHubRequestScheduler,
+    CommitWatermarkStore,
 )
 from models.commit import CommitData, FileInfo
+from models.constants import StepStatus
 from models.document import Document
 from config.config_setting import config
+from utils.commit_watermarks import WatermarkDeliveryTracker, watermark_update
 from utils.status_update import StandardizedMessage
 
 
@@ -154,6 +168,20 @@ def test_get_latest_files():
     assert latest_files["file1.txt"]["commit_id"] == "222"
 
 
+def test_get_latest_files_compares_dates_not_strings():
+    files = [FileInfo(filename="file1.txt", status="modified", additions=1, deletions=0, changes=1, patch="patch")]
+    older = CommitData(author="User1", message="Commit 1", date="2023-06-28T12:00:00+02:00",
+                       url="https://github.com/test/repo/commit/111", repo_name="test/repo", commit_id="111",
+                       files=files)
+    newer = CommitData(author="User2", message="Commit 2", date="2023-06-28T11:00:00Z",
+                       url="https://github.com/test/repo/commit/222", repo_name="test/repo", commit_id="222",
+                       files=files)
+
+    latest_files = get_latest_files([newer, older])
+
+    assert latest_files["file1.txt"]["commit_id"] == "222"
+
+
 def test_create_documents():
     file_info = FileInfo(
         filename="README.md",
@@ -181,3 +209,245 @@ def test_create_documents():
     assert isinstance(documents[0], Document)
     assert documents[0].metadata["job_id"] == job_id
 
+
+class SlowFilesCommit:
+    """Commit double whose `files` attribute simulates PyGithub's lazy HTTP fetch."""
+    in_flight = 0
+    max_seen = 0
+    lock = threading.Lock()
+
+    def __init__(self, index, delay=0.01, author_date=None):
+        self.sha = f"{index:040x}"
+        self.html_url = f"https://github.com/test/repo/commit/{self.sha}"
+        committed_date = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index)
+        self.commit = SimpleNamespace(
+            message=f"Commit {index}",
+            author=SimpleNamespace(name="Test User", date=author_date or committed_date),
+            committer=SimpleNamespace(name="Test User", date=committed_date),
+        )
+        self._delay = delay
+        self._index = index
+
+    @property
+    def files(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_seen = max(cls.max_seen, cls.in_flight)
+        time.sleep(self._delay * (self._index % 3))
+        with cls.lock:
+            cls.in_flight -= 1
+        return [SimpleNamespace(filename=f"file{self._index}.py", status="added", additions=1, deletions=0,
+                                changes=1, patch="@@ -0,0 +1 @@\n+print()")]
+
+
+def test_iter_commit_data_bounds_in_flight_requests():
+    SlowFilesCommit.in_flight = SlowFilesCommit.max_seen = 0
+    commits = (SlowFilesCommit(i) for i in range(20))
+
+    results = list(iter_commit_data(commits, "repo", max_workers=4, max_in_flight=4))
+
+    assert len(results) == 20
+    assert {cd.commit_id for cd in results} == {f"{i:040x}" for i in range(20)}
+    assert SlowFilesCommit.max_seen <= 4
+
+
+def test_iter_commit_data_ordered_preserves_input_order():
+    commits = [SlowFilesCommit(i) for i in range(10)]
+
+    results = list(iter_commit_data(commits, "repo", max_workers=4, ordered=True))
+
+    assert [cd.commit_id for cd in results] == [c.sha for c in commits]
+
+
+def test_scheduler_waits_for_reset_when_budget_exhausted():
+    scheduler = GitHubRequestScheduler(reserve=10)
+    scheduler.update(remaining=10, limit=5000, reset_at=time.time() + 0.3)
+
+    start = time.time()
+    scheduler.acquire("job_1")
+
+    assert time.time() - start >= 0.25
+    assert scheduler.metrics()["throttled_seconds"] > 0
+
+
+def test_scheduler_serves_least_served_job_first():
+    scheduler = GitHubRequestScheduler(reserve=0)
+    for _ in range(3):
+        scheduler.acquire("busy_job")
+    scheduler.update(remaining=0, limit=5000, reset_at=time.time() + 0.3)
+    granted = []
+
+    def request(job_id):
+        scheduler.acquire(job_id)
+        granted.append(job_id)
+
+    busy = threading.Thread(target=request, args=("busy_job",))
+    busy.start()
+    time.sleep(0.05)
+    fresh = threading.Thread(target=request, args=("fresh_job",))
+    fresh.start()
+    time.sleep(0.05)
+    assert scheduler.metrics()["queue_depth"] == 2
+    busy.join()
+    fresh.join()
+
+    assert granted == ["fresh_job", "busy_job"]
+
+
+def test_call_with_rate_limit_retries_after_backoff():
+    calls = []
+
+    def flaky_request():
+        calls.append(time.time())
+        if len(calls) == 1:
+            raise RateLimitExceededException(403, {"message": "rate limited"}, {"Retry-After": "0.2"})
+        return "ok"
+
+    with patch("services.github_service.github_scheduler", GitHubRequestScheduler(reserve=0)):
+        assert call_with_rate_limit(flaky_request, job_id="job_1") == "ok"
+
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.15
+
+
+def test_watermark_store_round_trip(tmp_path):
+    store = CommitWatermarkStore(str(tmp_path))
+    assert store.get("octocat", "Hello-World") is None
+
+    store.set("octocat", "Hello-World", "abc123", "2024-01-01T00:00:00+00:00")
+    store.set("octocat", "Hello-World", "def456", "2024-02-01T00:00:00+00:00", {"sha": "dev"})
+
+    assert store.get("octocat", "Hello-World")["commit_id"] == "abc123"
+    assert store.get("octocat", "Hello-World", {"sha": "dev"})["commit_id"] == "def456"
+
+
+def test_watermark_store_keeps_files_inside_its_directory(tmp_path):
+    store = CommitWatermarkStore(str(tmp_path / "watermarks"))
+    store.set("..", "../../escaped", "abc123", "2024-01-01T00:00:00+00:00")
+
+    assert store.get("..", "../../escaped")["commit_id"] == "abc123"
+    assert os.listdir(tmp_path) == ["watermarks"]
+    assert store.get("octocat", "escaped") is None
+
+
+def deliver(tracker, messages):
+    for message in messages:
+        tracker.delivered(message.job_id, message.metadata)
+
+
+def test_fetch_and_emit_commits_is_incremental(tmp_path, standard_message_factory):
+    store = CommitWatermarkStore(str(tmp_path))
+    tracker = WatermarkDeliveryTracker(store)
+    commits = [SlowFilesCommit(i, delay=0) for i in range(3)]
+    repo = MagicMock()
+    repo.get_commits.return_value = list(reversed(commits))
+    message = standard_message_factory(
+        job_id="job_1", step_number=1,
+        data={"resource_data": orjson.dumps({"owner": "octocat", "repo_name": "repo"}).decode("utf-8")}
+    )
+
+    with patch("services.github_service.fetch_repository", return_value=repo), \
+            patch("services.github_service.commit_watermarks", store), \
+            patch("services.github_service.iter_paginated", side_effect=lambda items, job_id=None: iter(items)):
+        first = list(fetch_and_emit_commits(message))
+        assert first[0].metadata["document_count"] == 3
+        assert first[0].metadata["incremental"] is False
+        # The watermark only advances once the sink has stored the job
+        assert store.get("octocat", "repo") is None
+        deliver(tracker, first)
+        assert store.get("octocat", "repo")["commit_id"] == commits[2].sha
+
+        # Second run: the API returns the watermark commit (since is inclusive) plus one new commit
+        new_commit = SlowFilesCommit(3, delay=0)
+        repo.get_commits.return_value = [new_commit, commits[2]]
+        second = list(fetch_and_emit_commits(message))
+        deliver(tracker, second)
+
+    since = repo.get_commits.call_args.kwargs["since"]
+    assert since.isoformat() == commits[2].commit.committer.date.isoformat()
+    assert second[0].metadata["incremental"] is True
+    assert second[0].metadata["document_count"] == 1
+    assert orjson.loads(second[0].data[0])["metadata"]["id"] == new_commit.sha
+    assert store.get("octocat", "repo")["commit_id"] == new_commit.sha
+
+
+def test_fetch_and_emit_commits_completes_without_new_commits(tmp_path, standard_message_factory):
+    store = CommitWatermarkStore(str(tmp_path))
+    watermark_commit = SlowFilesCommit(2, delay=0)
+    store.set("octocat", "repo", watermark_commit.sha, watermark_commit.commit.committer.date.isoformat())
+    repo = MagicMock()
+    repo.get_commits.return_value = [watermark_commit]
+    message = standard_message_factory(
+        job_id="job_1", step_number=1,
+        data={"resource_data": orjson.dumps({"owner": "octocat", "repo_name": "repo"}).decode("utf-8")}
+    )
+
+    with patch("services.github_service.fetch_repository", return_value=repo), \
+            patch("services.github_service.commit_watermarks", store), \
+            patch("services.github_service.iter_paginated", side_effect=lambda items, job_id=None: iter(items)), \
+            patch("utils.status_update.update_status") as mock_update_status:
+        results = fetch_and_emit_commits_with_status(message)
+
+    assert len(results) == 1
+    assert results[0].data == []
+    assert results[0].metadata["is_last_chunk"] is True
+    assert results[0].metadata["total_document_count"] == 0
+    assert mock_update_status.call_args[0][2] == StepStatus.COMPLETE
+
+
+def test_watermark_uses_committer_date(tmp_path, standard_message_factory):
+    store = CommitWatermarkStore(str(tmp_path))
+    # Rebased commit: authored long before the commits it was replayed on top of
+    rebased = SlowFilesCommit(5, delay=0, author_date=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    repo = MagicMock()
+    repo.get_commits.return_value = [rebased, SlowFilesCommit(4, delay=0)]
+    message = standard_message_factory(
+        job_id="job_1", step_number=1,
+        data={"resource_data": orjson.dumps({"owner": "octocat", "repo_name": "repo"}).decode("utf-8")}
+    )
+
+    with patch("services.github_service.fetch_repository", return_value=repo), \
+            patch("services.github_service.commit_watermarks", store), \
+            patch("services.github_service.iter_paginated", side_effect=lambda items, job_id=None: iter(items)):
+        deliver(WatermarkDeliveryTracker(store), fetch_and_emit_commits(message))
+
+    watermark = store.get("octocat", "repo")
+    assert watermark["commit_id"] == rebased.sha
+    assert watermark["date"] == rebased.commit.committer.date.isoformat()
+
+
+def test_watermark_tracker_waits_for_every_chunk(tmp_path):
+    store = CommitWatermarkStore(str(tmp_path))
+    tracker = WatermarkDeliveryTracker(store)
+    watermark = watermark_update("octocat", "repo", "abc123", "2024-01-01T00:00:00+00:00")
+
+    def chunk(index):
+        return {"chunk_index": index, "chunk_count": 3, "is_last_chunk": index == 2, "commit_watermark": watermark}
+
+    # Chunk 1 was lost in the LLM step: the last chunk alone must not advance the watermark
+    assert tracker.delivered("job_1", chunk(0)) is False
+    assert tracker.delivered("job_1", chunk(2)) is False
+    assert store.get("octocat", "repo") is None
+
+    assert tracker.delivered("job_1", chunk(1)) is True
+    assert store.get("octocat", "repo")["commit_id"] == "abc123"
+    assert tracker.delivered("job_2", {"chunk_index": 0, "chunk_count": 1}) is False
+
+
+def test_fetch_and_emit_commits_emits_chunks(standard_message_factory):
+    repo = MagicMock()
+    repo.get_commits.return_value = [SlowFilesCommit(i, delay=0) for i in range(5)]
+    resource_data = {"owner": "octocat", "repo_name": "repo", "batch_size": 2}
+    message = standard_message_factory(job_id="job_1", step_number=1,
+                                       data={"resource_data": orjson.dumps(resource_data).decode("utf-8")})
+
+    with patch("services.github_service.fetch_repository", return_value=repo), \
+            patch("services.github_service.iter_paginated", side_effect=lambda items, job_id=None: iter(items)):
+        chunks = list(fetch_and_emit_commits(message))
+
+    assert "batch_size" not in repo.get_commits.call_args.kwargs
+    assert [len(chunk.data) for chunk in chunks] == [2, 2, 1]
+    assert [chunk.metadata["chunk_index"] for chunk in chunks] == [0, 1, 2]
+    assert [chunk.metadata["is_last_chunk"] for chunk in chunks] == [False, False, True]
+    assert all(chunk.metadata["total_document_count"] == 5 for chunk in chunks)
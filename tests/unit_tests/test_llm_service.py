@@ -1,8 +1,19 @@
 import pytest
 import json
+from unittest.mock import MagicMock, patch
+
+import bytewax.operators as op
+from bytewax.dataflow import Dataflow
+from bytewax.testing import TestingSink, TestingSource, run_main
+
+from models.constants import StepStatus
 from models.document import Document
 from utils.status_update import StandardizedMessage
-from services.message_processing_service import prepare_batch_inputs, process_raw_data_with_llm
+from services.message_processing_service import (
+    aprocess_raw_data_with_llm, build_async_llm_logic, llm_event_loop, pack_inputs, parse_packed_response,
+    prepare_batch_inputs, process_raw_data_with_llm, summarize_inputs, summarize_with_cache,
+)
+from utils.model_utils import ChainCache
 
 def test_prepare_batch_inputs(sample_documents):
     result = prepare_batch_inputs(sample_documents)
@@ -87,4 +98,130 @@ def test_process_raw_data_with_llm_batch_processing(fake_event_data, standard_me
         assert original_doc['page_content'].startswith("Filename: README, Status: added")
         assert summary_doc['page_content'].startswith("Summary: ")
         assert summary_doc['metadata']['vector_id'].endswith('_llm')
-        assert summary_doc['metadata']['doc_type'] == "SUMMARY"
\ No newline at end of file
+        assert summary_doc['metadata']['doc_type'] == "SUMMARY"
+
+def test_chain_cache_reuses_chain_and_client():
+    cache = ChainCache(max_chains=2)
+
+    first = cache.get_chain(custom_prompt="Summarize", llm_model="fake")
+    again = cache.get_chain(custom_prompt="Summarize", llm_model="fake")
+    other = cache.get_chain(custom_prompt="Explain", llm_model="fake")
+
+    assert first is again
+    assert other is not first
+    # Both prompts share the one warm client for the provider
+    assert first.steps[1] is other.steps[1]
+    assert cache.metrics() == {"hits": 1, "misses": 2, "chains": 2, "models": 1}
+
+
+def test_chain_cache_evicts_least_recently_used():
+    cache = ChainCache(max_chains=2)
+    first = cache.get_chain(custom_prompt="one", llm_model="fake")
+    cache.get_chain(custom_prompt="two", llm_model="fake")
+    cache.get_chain(custom_prompt="one", llm_model="fake")
+    cache.get_chain(custom_prompt="three", llm_model="fake")
+
+    assert cache.get_chain(custom_prompt="one", llm_model="fake") is first
+    assert cache.metrics()["chains"] == 2
+    assert cache.metrics()["misses"] == 3
+
+
+def test_chain_cache_rejects_unknown_provider():
+    cache = ChainCache()
+    with pytest.raises(ValueError):
+        cache.get_chain(custom_prompt="Summarize", llm_model="unknown")
+    assert cache.metrics()["chains"] == 0
+
+
+def test_summarize_with_cache_only_sends_misses(isolated_summary_cache):
+    chain = MagicMock()
+    chain.invoke.side_effect = lambda item, config=None: f"summary of {item['text']}"
+    inputs = [{"text": "a"}, {"text": "b"}, {"text": "a"}]
+
+    first = summarize_with_cache(chain, inputs, "fake", "Summarize", {})
+    second = summarize_with_cache(chain, inputs + [{"text": "c"}], "fake", "Summarize", {})
+
+    assert first == ["summary of a", "summary of b", "summary of a"]
+    assert second == first + ["summary of c"]
+    assert sorted(call.args[0]["text"] for call in chain.invoke.call_args_list) == ["a", "b", "c"]
+    assert isolated_summary_cache.metrics()["hits"] == 2
+
+
+def test_summarize_with_cache_keys_on_prompt(isolated_summary_cache):
+    chain = MagicMock()
+    chain.invoke.return_value = "summary"
+
+    summarize_with_cache(chain, [{"text": "a"}], "fake", "Summarize", {})
+    summarize_with_cache(chain, [{"text": "a"}], "fake", "Explain", {})
+
+    assert chain.invoke.call_count == 2
+
+
+def test_pack_inputs_respects_token_budget_and_document_limit():
+    inputs = [{"text": "a" * 40}] * 5 + [{"text": "b" * 400}] + [{"text": "c" * 4}]
+
+    with patch("services.message_processing_service.estimate_tokens", side_effect=lambda text: len(text) // 4):
+        assert pack_inputs(inputs, token_budget=30, max_documents=2) == [[0, 1], [2, 3], [4], [5], [6]]
+
+
+def test_parse_packed_response_handles_fences_and_missing_entries():
+    response = '```json\n{"0": "first", "2": "third", "1": 5}\n```'
+
+    assert parse_packed_response(response, 3) == {0: "first", 2: "third"}
+    assert parse_packed_response("This is a fake response.", 3) == {}
+
+
+def test_summarize_inputs_packs_documents_and_falls_back_per_document():
+    chain = MagicMock()
+    chain.invoke.side_effect = lambda item, config=None: f"single {item['text']}"
+    packed_chain = MagicMock()
+    # The model answers for the first document only
+    packed_chain.invoke.return_value = '{"0": "packed a"}'
+    inputs = [{"text": "a"}, {"text": "b"}]
+
+    with patch("services.message_processing_service.config.LLM_PACKING_ENABLED", True), \
+            patch("services.message_processing_service.get_cached_chain", return_value=packed_chain):
+        summaries = summarize_inputs(chain, inputs, "fake", "Summarize", {})
+
+    assert summaries == ["packed a", "single b"]
+    packed_input = packed_chain.invoke.call_args.args[0]
+    assert packed_input["instruction"] == "Summarize"
+    assert '<document id="1">\nb\n</document>' in packed_input["documents"]
+    assert [call.args[0] for call in chain.invoke.call_args_list] == [{"text": "b"}]
+
+
+def test_process_raw_data_with_llm_packing_keeps_vector_id_scheme(fake_event_data, standard_message_factory):
+    input_message = standard_message_factory(job_id="test_job", step_number=1, data=fake_event_data * 3)
+
+    # The fake model never returns JSON, so every pack falls back to one request per document
+    with patch("services.message_processing_service.config.LLM_PACKING_ENABLED", True), \
+            patch("services.message_processing_service.config.SUMMARY_CACHE_ENABLED", False):
+        results = list(process_raw_data_with_llm(input_message))
+
+    summaries = [json.loads(doc) for doc in results[0].data[1::2]]
+    assert len(summaries) == 3
+    assert all(doc["page_content"].startswith("Summary: ") for doc in summaries)
+    assert all(doc["metadata"]["vector_id"].endswith("_llm") for doc in summaries)
+
+
+
+def test_async_llm_logic_matches_blocking_mode_and_reports_status(fake_event_data, standard_message_factory):
+    first = standard_message_factory(job_id="job_1", step_number=1, data=fake_event_data)
+    second = standard_message_factory(job_id="job_1", step_number=1, data=fake_event_data * 2)
+    flow = Dataflow("async_llm_test")
+    keyed = op.key_on("key", op.input("in", flow, TestingSource([first, second])), lambda message: message.job_id)
+    out = []
+    op.output("out", op.key_rm("unkey", op.stateful("llm", keyed, build_async_llm_logic)), TestingSink(out))
+
+    with patch("utils.status_update.update_status") as update_status:
+        run_main(flow)
+
+    assert [len(message.data) for message in out] == [2, 4]
+    assert json.loads(out[0].data[1])["page_content"] == "Summary: This is a fake response."
+    assert [call.args[2] for call in update_status.call_args_list].count(StepStatus.COMPLETE) == 2
+
+
+def test_aprocess_raw_data_with_llm_logs_invalid_input(standard_message_factory):
+    input_message = standard_message_factory(job_id="test_job", step_number=1, data=['not json at all'])
+
+    assert llm_event_loop.run(aprocess_raw_data_with_llm(input_message)) == []
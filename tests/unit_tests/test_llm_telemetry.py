@@ -0,0 +1,88 @@
+import logging
+import time
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from utils.langchain_callback_logger import Histogram, LLMTelemetryHandler, MyCustomHandler
+from utils.model_utils import get_fake_chat_model
+
+
+def test_histogram_summary():
+    histogram = Histogram((1, 2, 5))
+    for value in (0.5, 1.5, 1.5, 4, 10):
+        histogram.observe(value)
+
+    summary = histogram.summary()
+    assert summary["count"] == 5
+    assert summary["min"] == 0.5
+    assert summary["max"] == 10
+    assert summary["p50"] == 2
+    assert summary["p99"] == 10
+
+
+def test_telemetry_records_latency_tokens_and_first_token():
+    logger = MagicMock()
+    handler = LLMTelemetryHandler(logger, sample_rate=0, report_interval=3600)
+    run_id = uuid4()
+    response = LLMResult(generations=[[ChatGeneration(message=AIMessage(
+        content="summary", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}))]])
+
+    handler.on_chat_model_start({}, [[]], run_id=run_id)
+    for token in ("sum", "mary"):
+        handler.on_llm_new_token(token, run_id=run_id)
+    handler.on_llm_end(response, run_id=run_id)
+
+    metrics = handler.metrics()
+    assert metrics["latency_seconds"]["count"] == 1
+    assert metrics["time_to_first_token_seconds"]["count"] == 1
+    assert metrics["prompt_tokens"]["max"] == 120
+    assert metrics["completion_tokens"]["max"] == 30
+    assert metrics["in_flight"] == 0
+    logger.info.assert_not_called()
+
+
+def test_telemetry_samples_payloads_and_reports_periodically():
+    logger = MagicMock()
+    handler = LLMTelemetryHandler(logger, sample_rate=1.0, report_interval=0)
+
+    get_fake_chat_model().invoke("hello", config={"callbacks": [handler]})
+
+    messages = [call.args[0] for call in logger.info.call_args_list]
+    assert any(message.startswith("Sampled LLM call") and "prompts" in message for message in messages)
+    assert any(message.startswith("LLM telemetry:") for message in messages)
+    assert handler.metrics()["latency_seconds"]["count"] == 1
+
+
+def test_telemetry_reports_from_timer_and_on_close():
+    logger = MagicMock()
+    handler = LLMTelemetryHandler(logger, sample_rate=0, report_interval=0.2)
+    run_id = uuid4()
+
+    handler.on_llm_start({}, ["hello"], run_id=run_id)
+    handler._last_report = time.monotonic()
+    handler.on_llm_end(LLMResult(generations=[]), run_id=run_id)
+    logger.info.assert_not_called()
+
+    # No further calls finish, so the report comes from the background thread
+    deadline = time.time() + 2
+    while not logger.info.called and time.time() < deadline:
+        time.sleep(0.01)
+    assert logger.info.call_args.args[0].startswith("LLM telemetry:")
+
+    handler.on_llm_error(RuntimeError("boom"), run_id=uuid4())
+    handler.report_interval = 3600
+    handler.close()
+    assert logger.info.call_count == 2
+    assert "'errors': 1" in logger.info.call_args.args[0]
+    assert not handler._thread.is_alive()
+
+
+def test_custom_handler_does_not_log_tokens_at_info():
+    logger = MagicMock(spec=logging.Logger)
+    MyCustomHandler(logger).on_llm_new_token("token")
+
+    logger.info.assert_not_called()
+    logger.debug.assert_called_once()
@@ -0,0 +1,67 @@
+import pytest
+from langchain_community.document_loaders.pdf import PyMuPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pydantic import ValidationError
+
+from config.config_setting import config
+from utils.concurrency_limiter import estimate_tokens
+from utils.pdf_chunking import ChunkingOptions, iter_pdf_chunks, resolve_chunking
+from utils.pdf_extraction import iter_pdf_page_blocks
+
+
+def test_resolve_chunking_from_resource_data_and_config(monkeypatch):
+    assert resolve_chunking({}) == ChunkingOptions(strategy="characters", chunk_size=500, chunk_overlap=20)
+    assert resolve_chunking({"chunking_strategy": "tokens", "chunk_size": 128}) == \
+        ChunkingOptions(strategy="tokens", chunk_size=128, chunk_overlap=config.PDF_CHUNK_OVERLAP_TOKENS)
+    assert resolve_chunking({"chunking_strategy": "adaptive"}, "openai").chunk_size == \
+        config.PDF_CHUNK_TOKENS_BY_MODEL["openai"]
+    assert resolve_chunking({"chunking_strategy": "adaptive"}, "unknown").chunk_size == config.PDF_CHUNK_TOKENS
+
+    monkeypatch.setattr(config, "PDF_CHUNKING_STRATEGY", "layout")
+    assert resolve_chunking({}).strategy == "layout"
+    with pytest.raises(ValidationError):
+        resolve_chunking({"chunking_strategy": "sentences"})
+
+
+def test_character_chunks_match_langchain_and_record_tokens(local_pdf_path):
+    chunks = list(iter_pdf_chunks(local_pdf_path, ChunkingOptions(), workers=1))
+    expected = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=20).split_documents(
+        PyMuPDFLoader(local_pdf_path).load())
+
+    assert [chunk.page_content for chunk in chunks] == [doc.page_content for doc in expected]
+    for chunk, doc in zip(chunks, expected):
+        assert chunk.metadata == {**doc.metadata, "chunking_strategy": "characters",
+                                  "token_count": estimate_tokens(doc.page_content)}
+
+
+def test_token_chunks_stay_within_budget(local_pdf_path):
+    options = ChunkingOptions(strategy="tokens", chunk_size=64, chunk_overlap=8)
+    chunks = list(iter_pdf_chunks(local_pdf_path, options, workers=1))
+
+    assert len(chunks) > len(list(iter_pdf_chunks(local_pdf_path, ChunkingOptions(), workers=1)))
+    assert all(chunk.metadata["chunking_strategy"] == "tokens" for chunk in chunks)
+    assert all(0 < chunk.metadata["token_count"] <= 64 for chunk in chunks)
+
+
+def test_layout_chunks_follow_headings_and_blocks(layout_pdf_path):
+    options = ChunkingOptions(strategy="layout", chunk_size=200, chunk_overlap=0)
+    chunks = list(iter_pdf_chunks(layout_pdf_path, options, workers=1))
+    blocks = [text for _, page in iter_pdf_page_blocks(layout_pdf_path, workers=1) for text, _ in page]
+
+    assert chunks[0].page_content.startswith("Introduction\n\nParagraph 0 of section 0")
+    assert [chunk.metadata["section"] for chunk in chunks if chunk.metadata["page"] == 0] == \
+        ["Introduction"] * sum(chunk.metadata["page"] == 0 for chunk in chunks)
+    assert chunks[-1].metadata["section"] == "Movable Type"
+    assert any(chunk.page_content.startswith("Movable Type") for chunk in chunks)
+    # Blocks within the budget are never cut
+    for block in blocks:
+        assert any(block in chunk.page_content for chunk in chunks)
+    assert all(chunk.metadata["token_count"] <= 200 for chunk in chunks)
+
+
+def test_layout_chunks_split_oversized_blocks(layout_pdf_path):
+    options = ChunkingOptions(strategy="layout", chunk_size=20, chunk_overlap=0)
+    chunks = list(iter_pdf_chunks(layout_pdf_path, options, workers=1))
+
+    assert all(chunk.metadata["token_count"] <= 20 for chunk in chunks)
+    assert {chunk.metadata["section"] for chunk in chunks} == {"Introduction", "Movable Type"}
@@ -1,6 +1,13 @@
+from unittest.mock import MagicMock, patch
+
 import pytest
 import orjson
-from services.pdf_processing_service import process_pdf
+from langchain_community.document_loaders.pdf import PyMuPDFLoader
+
+from config.config_setting import config
+from models.constants import StepStatus
+from services.pdf_processing_service import process_pdf, process_pdf_with_status
+from utils.pdf_extraction import iter_pdf_pages
 from utils.status_update import StandardizedMessage
 
 
@@ -154,4 +161,87 @@ def test_process_pdf_edge_cases(input_data, expected_length, description):
     results = list(process_pdf(message))
 
     # Assert the length of the results matches the expected length
-    assert len(results) == expected_length, description
\ No newline at end of file
+    assert len(results) == expected_length, description
+
+def pdf_message(pdf_path, **resource_data):
+    return StandardizedMessage(
+        job_id="83a47a96-8144-42ed-815a-6409fad83a40",
+        step_number=1,
+        data={"resource_data": orjson.dumps({"pdf_url": pdf_path, "collection_name": "test",
+                                             **resource_data}).decode()},
+        metadata={"original_topic": "resource_topic"},
+    )
+
+
+def test_parallel_page_extraction_matches_loader(local_pdf_path):
+    expected = PyMuPDFLoader(local_pdf_path).load()
+    pages = list(iter_pdf_pages(local_pdf_path, workers=2, pages_per_task=5, min_parallel_pages=1))
+
+    assert [page.page_content for page in pages] == [doc.page_content for doc in expected]
+    assert [page.metadata for page in pages] == [doc.metadata for doc in expected]
+
+
+def test_process_pdf_output_unchanged_by_parallel_extraction(local_pdf_path, monkeypatch):
+    monkeypatch.setattr(config, "PDF_EXTRACTION_WORKERS", 1)
+    sequential = list(process_pdf(pdf_message(local_pdf_path)))
+    monkeypatch.setattr(config, "PDF_EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(config, "PDF_EXTRACTION_PAGES_PER_TASK", 3)
+    monkeypatch.setattr(config, "PDF_EXTRACTION_MIN_PARALLEL_PAGES", 1)
+    parallel = list(process_pdf(pdf_message(local_pdf_path)))
+
+    assert [result.data for result in parallel] == [result.data for result in sequential]
+    vector_ids = [orjson.loads(doc)["metadata"]["vector_id"] for result in parallel for doc in result.data]
+    assert vector_ids[0] == f"{local_pdf_path} page 0 for chunk 1"
+    assert len(vector_ids) > 12
+
+
+def test_process_pdf_emits_batches(local_pdf_path, monkeypatch):
+    monkeypatch.setattr(config, "PDF_EMIT_BATCH_SIZE", 10)
+    results = list(process_pdf(pdf_message(local_pdf_path)))
+    documents = [doc for result in results for doc in result.data]
+
+    assert len(results) == (len(documents) + 9) // 10
+    assert all(result.metadata["document_count"] == len(result.data) <= 10 for result in results)
+    assert [result.metadata["chunk_index"] for result in results] == list(range(len(results)))
+    assert [result.metadata["is_last_chunk"] for result in results] == [False] * (len(results) - 1) + [True]
+    assert results[-1].metadata["total_document_count"] == len(documents)
+    chunk_numbers = [orjson.loads(doc)["metadata"]["vector_id"].rsplit(" ", 1)[1] for doc in documents]
+    assert chunk_numbers == [str(i + 1) for i in range(len(documents))]
+
+
+def test_process_pdf_with_status_returns_every_batch(local_pdf_path, monkeypatch):
+    monkeypatch.setattr(config, "PDF_EMIT_BATCH_SIZE", 10)
+    with patch('utils.status_update.update_status') as mock_update_status:
+        results = list(process_pdf_with_status(pdf_message(local_pdf_path)))
+
+    assert len(results) > 1
+    assert all(isinstance(result, StandardizedMessage) for result in results)
+    assert mock_update_status.call_args[0][2] == StepStatus.COMPLETE
+
+
+def test_process_pdf_reads_cached_download(local_pdf_path):
+    with open(local_pdf_path, "rb") as f:
+        response = MagicMock(status_code=200, headers={"ETag": '"v1"'})
+        response.iter_content.return_value = [f.read()]
+        response.__enter__.return_value = response
+    url = "https://example.com/sample.pdf"
+
+    with patch("utils.download_cache.requests.get", return_value=response) as mock_get:
+        first = list(process_pdf(pdf_message(url)))
+        second = list(process_pdf(pdf_message(url)))
+
+    assert mock_get.call_count == 1
+    assert [result.data for result in first] == [result.data for result in second]
+    metadata = orjson.loads(first[0].data[0])["metadata"]
+    assert metadata["source"] == url
+    assert metadata["vector_id"] == f"{url} page 0 for chunk 1"
+
+
+def test_process_pdf_uses_job_chunking_strategy(layout_pdf_path):
+    results = list(process_pdf(pdf_message(layout_pdf_path, chunking_strategy="layout", chunk_size=200)))
+    metadata = [orjson.loads(doc)["metadata"] for result in results for doc in result.data]
+
+    assert {meta["chunking_strategy"] for meta in metadata} == {"layout"}
+    assert metadata[0]["section"] == "Introduction"
+    assert all(meta["token_count"] <= 200 for meta in metadata)
+    assert metadata[0]["vector_id"] == f"{layout_pdf_path} page 0 for chunk 1"
@@ -0,0 +1,9 @@
+from services.vectordb_service import generate_uuid_from_string
+from utils.point_ids import generate_point_ids
+
+
+def test_md5_point_ids_match_existing_ids():
+    values = ["test_vector_id", "repo/src/main.py", ""]
+    assert generate_point_ids(values) == [str(generate_uuid_from_string(value)) for value in values]
+    assert generate_point_ids(["test_vector_id"]) == ["ee21dd38-8b8c-8c73-8493-8dea245afcc2"]
+
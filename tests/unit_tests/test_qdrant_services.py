@@ -1,5 +1,21 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
 from logging_config import get_logger
-from services.vectordb_service import process_message_to_vectordb
+from models.document import Document
+from models.constants import StepStatus
+from services.vectordb_service import (
+    collection_key, content_fingerprint, fetch_existing_fingerprints, fingerprint_namespace,
+    insert_batch_into_vectordb, insert_batch_into_vectordb_with_status, process_message_to_vectordb,
+)
+from utils.status_update import StandardizedMessage
+from langchain_core.embeddings import FakeEmbeddings
+from qdrant_client.http import models
+
+from utils.embedding_cache import CachedEmbeddings
+from utils.get_qdrant import QdrantStoreRegistry, build_collection_config, embedding_dimension
 
 logger = get_logger(__name__)
 
@@ -45,3 +61,231 @@ def test_process_message_to_vectordb_qdrant_error(mock_get_qdrant, mock_setup_em
     logger.info(f"Result: {result}")
     assert len(result) == 0
     logger.info("test_process_message_to_vectordb_qdrant_error completed successfully")
+
+
+def test_process_message_to_vectordb_skips_unchanged_documents(mock_get_qdrant, mock_setup_embedding,
+                                                                sample_standardized_message, mock_qdrant_instance):
+    document = Document.model_validate_json(sample_standardized_message.data[0])
+    mock_setup_embedding.return_value.namespace = "FakeEmbeddings:1536"
+    mock_qdrant_instance.metadata_payload_key = "metadata"
+    mock_qdrant_instance.client.retrieve.return_value = [
+        SimpleNamespace(id="ee21dd38-8b8c-8c73-8493-8dea245afcc2",
+                        payload={"metadata": {"content_fingerprint": content_fingerprint(document,
+                                                                                         "FakeEmbeddings:1536")}})
+    ]
+
+    result = list(process_message_to_vectordb(sample_standardized_message))
+
+    assert [r["vector_db_id"] for r in result] == ["ee21dd38-8b8c-8c73-8493-8dea245afcc2"]
+    mock_qdrant_instance.add_texts.assert_not_called()
+    kwargs = mock_qdrant_instance.client.retrieve.call_args.kwargs
+    assert kwargs["ids"] == ["ee21dd38-8b8c-8c73-8493-8dea245afcc2"]
+    assert kwargs["with_vectors"] is False
+    # The kept point's payload is refreshed with this run's job_id
+    operation = mock_qdrant_instance.client.batch_update_points.call_args.kwargs["update_operations"][0]
+    assert operation.set_payload.points == ["ee21dd38-8b8c-8c73-8493-8dea245afcc2"]
+    assert operation.set_payload.payload["metadata"]["job_id"] == "test_job_id"
+
+
+def test_content_fingerprint_changes_with_embedding_model():
+    document = Document(page_content="same text", metadata={})
+
+    assert content_fingerprint(document, "FakeEmbeddings:1536") != content_fingerprint(document, "FakeEmbeddings:384")
+    assert fingerprint_namespace(FakeEmbeddings(size=384)) == "FakeEmbeddings:384"
+    assert fingerprint_namespace(CachedEmbeddings(FakeEmbeddings(size=384), MagicMock())) == "FakeEmbeddings:384"
+
+
+def test_process_message_to_vectordb_upserts_changed_documents(mock_get_qdrant, mock_setup_embedding,
+                                                                sample_standardized_message, mock_qdrant_instance):
+    mock_qdrant_instance.client.retrieve.return_value = [
+        SimpleNamespace(id="ee21dd38-8b8c-8c73-8493-8dea245afcc2",
+                        payload={"metadata": {"content_fingerprint": "stale"}})
+    ]
+
+    list(process_message_to_vectordb(sample_standardized_message))
+
+    metadatas = mock_qdrant_instance.add_texts.call_args.kwargs["metadatas"]
+    assert metadatas[0]["content_fingerprint"] != "stale"
+
+
+def test_fetch_existing_fingerprints_batches_ids():
+    client = MagicMock()
+    client.retrieve.side_effect = lambda collection_name, ids, **kwargs: [
+        SimpleNamespace(id=point_id, payload={"metadata": {"content_fingerprint": f"fp-{point_id}"}})
+        for point_id in ids if point_id != "b"
+    ]
+
+    fingerprints = fetch_existing_fingerprints(client, "collection", ["a", "b", "c"], batch_size=2)
+
+    assert fingerprints == {"a": "fp-a", "c": "fp-c"}
+    assert client.retrieve.call_count == 2
+
+
+@patch('utils.get_qdrant.Qdrant')
+@patch('utils.get_qdrant.QdrantClient')
+def test_registry_reuses_client_and_store(mock_client_cls, mock_qdrant_cls):
+    mock_client_cls.return_value.collection_exists.return_value = False
+    embeddings = MagicMock()
+    mock_qdrant_cls.return_value.embeddings = embeddings
+    registry = QdrantStoreRegistry(max_stores=2)
+
+    first = registry.get_store("localhost", 6333, embeddings, "collection_a")
+    second = registry.get_store("localhost", 6333, embeddings, "collection_a")
+
+    assert first is second
+    mock_client_cls.assert_called_once_with(host="localhost", port=6333, grpc_port=6334, prefer_grpc=False)
+    mock_client_cls.return_value.collection_exists.assert_called_once_with(collection_name="collection_a")
+    mock_client_cls.return_value.create_collection.assert_called_once()
+    mock_qdrant_cls.assert_called_once()
+
+
+@patch('utils.get_qdrant.Qdrant')
+@patch('utils.get_qdrant.QdrantClient')
+def test_registry_evicts_least_recently_used_store(mock_client_cls, mock_qdrant_cls):
+    mock_client_cls.return_value.collection_exists.return_value = True
+    embeddings = MagicMock()
+    mock_qdrant_cls.side_effect = lambda **kwargs: MagicMock(embeddings=kwargs["embeddings"])
+    registry = QdrantStoreRegistry(max_stores=2)
+
+    store_a = registry.get_store("localhost", 6333, embeddings, "collection_a")
+    registry.get_store("localhost", 6333, embeddings, "collection_b")
+    registry.get_store("localhost", 6333, embeddings, "collection_c")
+
+    assert registry.get_store("localhost", 6333, embeddings, "collection_a") is not store_a
+    # Known collections are not re-checked after their store was evicted
+    assert mock_client_cls.return_value.collection_exists.call_count == 3
+
+
+@patch('utils.get_qdrant.Qdrant')
+@patch('utils.get_qdrant.QdrantClient')
+def test_registry_keys_stores_by_embedding_model(mock_client_cls, mock_qdrant_cls):
+    mock_client_cls.return_value.collection_exists.return_value = True
+    mock_qdrant_cls.side_effect = lambda **kwargs: MagicMock(embeddings=kwargs["embeddings"])
+    registry = QdrantStoreRegistry()
+
+    # A new but equivalent embeddings object, as built per call when the cache is disabled
+    first = registry.get_store("localhost", 6333, FakeEmbeddings(size=384), "collection_a")
+    second = registry.get_store("localhost", 6333, FakeEmbeddings(size=384), "collection_a")
+    other_model = registry.get_store("localhost", 6333, FakeEmbeddings(size=768), "collection_a")
+
+    assert first is second
+    assert other_model is not first
+    assert mock_qdrant_cls.call_count == 2
+
+
+@patch('utils.get_qdrant.QdrantClient')
+def test_registry_close_closes_clients(mock_client_cls):
+    registry = QdrantStoreRegistry()
+    registry.get_client("localhost", 6333)
+    registry.close()
+
+    mock_client_cls.return_value.close.assert_called_once()
+    assert registry.get_client("localhost", 6333) is mock_client_cls.return_value
+    assert mock_client_cls.call_count == 2
+
+
+def make_message(job_id, collection_name, vector_ids):
+    documents = [Document(page_content=f"content {vector_id}",
+                          metadata={"collection_name": collection_name, "job_id": job_id,
+                                    "vector_id": vector_id, "doc_type": "SUMMARY"})
+                 for vector_id in vector_ids]
+    return StandardizedMessage(job_id=job_id, step_number=1, data=[doc.model_dump_json() for doc in documents])
+
+
+@pytest.fixture
+def batch_qdrant_instance(mock_qdrant_instance):
+    # Attributes the langchain Qdrant store sets, which a bare MagicMock would fake
+    mock_qdrant_instance.content_payload_key = "page_content"
+    mock_qdrant_instance.metadata_payload_key = "metadata"
+    mock_qdrant_instance.embeddings.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+    mock_qdrant_instance.client.retrieve.return_value = []
+    return mock_qdrant_instance
+
+
+def test_insert_batch_embeds_and_uploads_messages_together(mock_get_qdrant, mock_setup_embedding,
+                                                            batch_qdrant_instance):
+    mock_qdrant_instance = batch_qdrant_instance
+    messages = [make_message("job_1", "shared", ["a", "b"]), make_message("job_2", "shared", ["c"])]
+
+    results = insert_batch_into_vectordb(messages)
+
+    mock_qdrant_instance.embeddings.embed_documents.assert_called_once_with(["content a", "content b", "content c"])
+    kwargs = mock_qdrant_instance.client.upload_points.call_args.kwargs
+    assert kwargs["wait"] is False
+    assert kwargs["collection_name"] == "shared"
+    assert [point.payload["metadata"]["vector_id"] for point in kwargs["points"]] == ["a", "b", "c"]
+    assert [[r["job_id"] for r in message_results] for message_results in results] == [["job_1", "job_1"], ["job_2"]]
+    mock_qdrant_instance.add_texts.assert_not_called()
+
+
+def test_insert_batch_reports_status_per_job(mock_get_qdrant, mock_setup_embedding, batch_qdrant_instance):
+    invalid = StandardizedMessage(job_id="job_bad", step_number=1, data=["not json"])
+    messages = [make_message("job_1", "shared", ["a"]), invalid]
+
+    with patch('utils.status_update.update_status') as mock_update_status:
+        results = insert_batch_into_vectordb_with_status(("shared", messages))
+
+    assert [r["job_id"] for r in results] == ["job_1"]
+    final_statuses = {call.args[0]: call.args[2] for call in mock_update_status.call_args_list}
+    assert final_statuses == {"job_1": StepStatus.COMPLETE, "job_bad": StepStatus.FAILED}
+
+
+def test_collection_key_reads_first_document():
+    message = make_message("job_1", "shared", ["a"])
+
+    assert collection_key(message) == ("shared", message)
+    assert collection_key(StandardizedMessage(job_id="job", step_number=1, data=["not json"]))[0] == ""
+
+
+def test_embedding_dimension_reads_wrapped_model_size():
+    cached = CachedEmbeddings(FakeEmbeddings(size=384), MagicMock(), namespace="fake")
+
+    assert embedding_dimension(cached) == 384
+    with patch('utils.get_qdrant.config.QDRANT_VECTOR_SIZE', 768):
+        assert embedding_dimension(cached) == 768
+
+
+def test_build_collection_config_from_settings():
+    with patch('utils.get_qdrant.config.QDRANT_ON_DISK_VECTORS', True), \
+            patch('utils.get_qdrant.config.QDRANT_QUANTIZATION', "scalar"), \
+            patch('utils.get_qdrant.config.QDRANT_HNSW_M', 32):
+        collection_config = build_collection_config(384)
+
+    assert collection_config["vectors_config"].size == 384
+    assert collection_config["vectors_config"].on_disk is True
+    assert collection_config["quantization_config"].scalar.type == models.ScalarType.INT8
+    assert collection_config["hnsw_config"].m == 32
+    assert collection_config["hnsw_config"].ef_construct is None
+
+    with patch('utils.get_qdrant.config.QDRANT_QUANTIZATION', "binary-ish"):
+        with pytest.raises(ValueError):
+            build_collection_config(384)
+
+
+@patch('utils.get_qdrant.QdrantClient')
+def test_registry_creates_collection_with_payload_indexes(mock_client_cls):
+    client = mock_client_cls.return_value
+    client.collection_exists.return_value = False
+    registry = QdrantStoreRegistry()
+
+    registry.ensure_collection(client, "localhost", 6333, "collection_a", FakeEmbeddings(size=384))
+
+    assert client.create_collection.call_args.kwargs["vectors_config"].size == 384
+    indexed = [call.kwargs["field_name"] for call in client.create_payload_index.call_args_list]
+    assert indexed == ["metadata.job_id", "metadata.doc_type", "metadata.repo_name"]
+
+
+@patch('utils.get_qdrant.QdrantClient')
+def test_registry_adds_missing_payload_indexes_to_existing_collection(mock_client_cls):
+    client = mock_client_cls.return_value
+    client.collection_exists.return_value = True
+    client.get_collection.return_value = SimpleNamespace(payload_schema={"metadata.job_id": MagicMock()})
+    registry = QdrantStoreRegistry()
+
+    registry.ensure_collection(client, "localhost", 6333, "collection_a")
+    registry.ensure_collection(client, "localhost", 6333, "collection_a")
+
+    client.create_collection.assert_not_called()
+    indexed = [call.kwargs["field_name"] for call in client.create_payload_index.call_args_list]
+    assert indexed == ["metadata.doc_type", "metadata.repo_name"]
+    client.get_collection.assert_called_once_with(collection_name="collection_a")
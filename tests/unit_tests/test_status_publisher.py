@@ -0,0 +1,213 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import orjson
+import pytest
+import requests
+
+from models.constants import StepStatus
+from services.kafka_status_service import KafkaStatusClient
+from services.status_publisher import StatusPublisher, create_status_client
+from services.user_management_service import UserManagementClient
+
+
+def test_publish_keeps_latest_state_per_job_step():
+    client = MagicMock()
+    publisher = StatusPublisher(client, flush_interval=60, max_batch_size=100)
+
+    publisher.publish("job_1", "data_sink", StepStatus.IN_PROGRESS.value)
+    publisher.publish("job_2", "data_sink", StepStatus.IN_PROGRESS.value)
+    publisher.publish("job_1", "data_sink", StepStatus.COMPLETE.value)
+    sent = publisher.flush()
+    publisher.close()
+
+    assert sent == 2
+    assert publisher.coalesced_count == 1
+    updates = client.update_statuses.call_args[0][0]
+    assert [(u["job_id"], u["status"]) for u in updates] == [
+        ("job_2", StepStatus.IN_PROGRESS.value),
+        ("job_1", StepStatus.COMPLETE.value),
+    ]
+
+
+def test_publish_flushes_in_background_when_batch_is_full():
+    client = MagicMock()
+    publisher = StatusPublisher(client, flush_interval=60, max_batch_size=2)
+
+    publisher.publish("job_1", "gateway", StepStatus.COMPLETE.value)
+    publisher.publish("job_2", "gateway", StepStatus.COMPLETE.value)
+    deadline = time.time() + 5
+    while client.update_statuses.call_count == 0 and time.time() < deadline:
+        time.sleep(0.01)
+
+    client.update_statuses.assert_called_once()
+    assert publisher.pending_count() == 0
+    publisher.close()
+
+
+def test_failed_flush_requeues_updates_without_overwriting_newer_ones():
+    client = MagicMock()
+    client.update_statuses.side_effect = Exception("status api down")
+    publisher = StatusPublisher(client, flush_interval=60, max_batch_size=100)
+
+    publisher.publish("job_1", "gateway", StepStatus.IN_PROGRESS.value)
+    publisher.publish("job_2", "gateway", StepStatus.IN_PROGRESS.value)
+
+    def fail_after_newer_update(updates):
+        publisher.publish("job_1", "gateway", StepStatus.COMPLETE.value)
+        raise Exception("status api down")
+
+    client.update_statuses.side_effect = fail_after_newer_update
+    assert publisher.flush() == 0
+    assert publisher.pending_count() == 2
+    assert publisher._retry_at is not None
+
+    client.update_statuses.side_effect = None
+    assert publisher.flush() == 2
+    updates = client.update_statuses.call_args[0][0]
+    assert [(u["job_id"], u["status"]) for u in updates] == [
+        ("job_2", StepStatus.IN_PROGRESS.value),
+        ("job_1", StepStatus.COMPLETE.value),
+    ]
+    assert publisher._retry_at is None
+    publisher.close()
+
+
+def test_failed_flushes_back_off_exponentially():
+    client = MagicMock()
+    client.update_statuses.side_effect = Exception("status api down")
+    publisher = StatusPublisher(client, flush_interval=1, max_batch_size=100, max_retry_delay=3)
+
+    publisher.publish("job_1", "gateway", StepStatus.FAILED.value)
+    delays = []
+    for _ in range(4):
+        publisher.flush()
+        delays.append(publisher._retry_delay)
+
+    assert delays == [1, 2, 3, 3]
+    publisher.close()
+
+
+def test_publish_after_close_sends_synchronously():
+    client = MagicMock()
+    publisher = StatusPublisher(client, flush_interval=60, max_batch_size=100)
+    publisher.close()
+
+    publisher.publish("job_1", "gateway", StepStatus.COMPLETE.value)
+
+    updates = client.update_statuses.call_args[0][0]
+    assert [(u["job_id"], u["status"]) for u in updates] == [("job_1", StepStatus.COMPLETE.value)]
+    assert publisher.pending_count() == 0
+
+
+def test_close_sends_pending_updates():
+    client = MagicMock()
+    publisher = StatusPublisher(client, flush_interval=60, max_batch_size=100)
+
+    publisher.publish("job_1", "gateway", StepStatus.COMPLETE.value)
+    publisher.close()
+
+    client.update_statuses.assert_called_once()
+
+
+def test_http_client_failures_are_requeued_by_the_publisher():
+    client = UserManagementClient(timeout=5)
+    client.session = MagicMock()
+
+    def put(url, json, timeout):
+        if "/jobs/job_2/" in url:
+            raise requests.ConnectionError("status api down")
+        return MagicMock()
+
+    client.session.put.side_effect = put
+    publisher = StatusPublisher(client, flush_interval=60, max_batch_size=100)
+    publisher.publish("job_1", "data_sink", StepStatus.COMPLETE.value)
+    publisher.publish("job_2", "data_sink", StepStatus.COMPLETE.value)
+
+    assert publisher.flush() == 1
+    assert publisher.pending_count() == 1
+    assert publisher._retry_at is not None
+    assert all(call.kwargs["timeout"] == 5 for call in client.session.put.call_args_list)
+
+    client.session.put.side_effect = None
+    assert publisher.flush() == 1
+    assert client.session.put.call_args[0][0].endswith("/jobs/job_2/steps/data_sink")
+    assert publisher.pending_count() == 0
+    publisher.close()
+
+
+@patch('services.kafka_status_service.Producer')
+def test_kafka_status_client_produces_events_keyed_by_job(mock_producer_cls):
+    mock_producer_cls.return_value.flush.return_value = 0
+    client = KafkaStatusClient("job_status_events", brokers=["localhost:9092"], add_config={"acks": "all"})
+
+    client.update_statuses([
+        {"job_id": "job_1", "step_type": "gateway", "status": StepStatus.COMPLETE.value},
+        {"job_id": "job_2", "step_type": "data_sink", "status": StepStatus.FAILED.value,
+         "extra_data": {"total_documents": 3}},
+    ])
+
+    producer = mock_producer_cls.return_value
+    assert producer.produce.call_count == 2
+    producer.flush.assert_called_once()
+    args, kwargs = producer.produce.call_args_list[1]
+    assert args[0] == "job_status_events"
+    assert kwargs["key"] == b"job_2"
+    event = orjson.loads(kwargs["value"])
+    assert event["status"] == StepStatus.FAILED.value
+    assert event["step_type"] == "data_sink"
+    assert event["total_documents"] == 3
+    mock_producer_cls.assert_called_once_with({"bootstrap.servers": "localhost:9092", "acks": "all"})
+
+
+def test_kafka_status_event_extra_data_cannot_override_job_id():
+    event = orjson.loads(KafkaStatusClient.build_event("job_1", "gateway", StepStatus.COMPLETE.value,
+                                                       {"job_id": "job_2", "status": "bogus", "total_documents": 3}))
+
+    assert event["job_id"] == "job_1"
+    assert event["status"] == StepStatus.COMPLETE.value
+    assert event["total_documents"] == 3
+
+
+@patch('services.kafka_status_service.Producer')
+def test_kafka_status_client_raises_when_events_are_not_delivered(mock_producer_cls):
+    mock_producer_cls.return_value.flush.return_value = 1
+    client = KafkaStatusClient("job_status_events", brokers=["localhost:9092"])
+
+    with pytest.raises(RuntimeError):
+        client.update_statuses([{"job_id": "job_1", "step_type": "gateway", "status": StepStatus.COMPLETE.value}])
+
+
+@patch('services.kafka_status_service.Producer')
+def test_kafka_status_client_raises_when_delivery_reports_an_error(mock_producer_cls):
+    client = KafkaStatusClient("job_status_events", brokers=["localhost:9092"])
+    producer = mock_producer_cls.return_value
+
+    def flush(timeout=None):
+        for call in producer.produce.call_args_list:
+            message = MagicMock()
+            message.key.return_value = call.kwargs["key"]
+            call.kwargs["on_delivery"]("Broker: Message size too large" if call.kwargs["key"] == b"job_2" else None,
+                                       message)
+        producer.produce.reset_mock()
+        return 0
+
+    producer.flush.side_effect = flush
+    updates = [{"job_id": "job_1", "step_type": "gateway", "status": StepStatus.COMPLETE.value},
+               {"job_id": "job_2", "step_type": "gateway", "status": StepStatus.COMPLETE.value}]
+
+    with pytest.raises(RuntimeError, match="1 of 2"):
+        client.update_statuses(updates)
+    # Errors belong to the batch that produced them
+    client.update_statuses(updates[:1])
+
+
+def test_create_status_client_rejects_unknown_backend():
+    with patch('services.status_publisher.config.STATUS_BACKEND', "carrier_pigeon"):
+        with pytest.raises(ValueError):
+            create_status_client()
+
+
+def test_create_status_client_selects_kafka_backend():
+    with patch('services.status_publisher.config.STATUS_BACKEND', "kafka"):
+        assert isinstance(create_status_client(), KafkaStatusClient)
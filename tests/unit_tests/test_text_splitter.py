@@ -0,0 +1,65 @@
+import random
+
+import pytest
+from langchain_core.documents import Document as LangchainDocument
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.text_splitter import FastRecursiveCharacterTextSplitter
+
+GOLDEN_TEXTS = [
+    "",
+    "   \n\n  ",
+    "short text",
+    "First paragraph about Gutenberg.\n\nSecond paragraph,\nwith a line break.\n\n\n\nThird after blank lines.",
+    "averyveryverylongwordwithoutanyseparatorsthatmustbesplitbycharacter" * 20,
+    "Unicode text: café, naïve, 中文字符, emoji 🙂.\n" * 40,
+    "\n\nleading and trailing separators\n\n",
+    " ".join(f"sentence {n} of the document." for n in range(400)),
+    "\t tabs\tand  double  spaces \n mixed\n\n with\nnewlines " * 50,
+]
+
+
+def langchain_splitter(chunk_size, chunk_overlap, separators=None):
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators,
+                                          length_function=len, is_separator_regex=False)
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(500, 20), (100, 0), (50, 50), (10, 3), (1, 0)])
+@pytest.mark.parametrize("text", GOLDEN_TEXTS)
+def test_matches_langchain_on_golden_texts(text, chunk_size, chunk_overlap):
+    expected = langchain_splitter(chunk_size, chunk_overlap).split_text(text)
+    assert FastRecursiveCharacterTextSplitter(chunk_size, chunk_overlap).split_text(text) == expected
+
+
+def test_matches_langchain_on_random_texts():
+    rng = random.Random(0)
+    alphabet = ["a", "é", "中", " ", "  ", "\n", "\n\n", "\n\n\n", "\t", "word", "unbrokenword" * 5, ". "]
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+        chunk_size = rng.choice([2, 5, 20, 100, 500])
+        chunk_overlap = rng.randint(0, chunk_size)
+        separators = rng.choice([None, ["\n", " "], [". ", "\n"], ["\n\n"]])
+        expected = langchain_splitter(chunk_size, chunk_overlap, separators).split_text(text)
+        actual = FastRecursiveCharacterTextSplitter(chunk_size, chunk_overlap, separators).split_text(text)
+        assert actual == expected, (text, chunk_size, chunk_overlap, separators)
+
+
+@pytest.mark.parametrize("length_function", [lambda text: len(text) // 4 + 1, lambda text: len(text.split())])
+@pytest.mark.parametrize("text", GOLDEN_TEXTS)
+def test_matches_langchain_with_length_function(text, length_function):
+    expected = RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=8,
+                                              length_function=length_function).split_text(text)
+    actual = FastRecursiveCharacterTextSplitter(40, 8, length_function=length_function).split_text(text)
+    assert actual == expected
+
+
+def test_split_documents_matches_langchain():
+    documents = [LangchainDocument(page_content=text, metadata={"page": page})
+                 for page, text in enumerate(GOLDEN_TEXTS)]
+    expected = langchain_splitter(500, 20).split_documents(documents)
+    assert FastRecursiveCharacterTextSplitter(500, 20).split_documents(documents) == expected
+
+
+def test_rejects_overlap_larger_than_chunk():
+    with pytest.raises(ValueError):
+        FastRecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=20)
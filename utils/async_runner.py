@@ -0,0 +1,136 @@
+import asyncio
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Coroutine, Iterable, List, Optional, Tuple
+
+from bytewax.operators import StatefulLogic
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class BackgroundEventLoop:
+    """
+    A long-lived asyncio event loop running on its own daemon thread.
+
+    Bytewax operators are synchronous, so workers hand coroutines to this loop with
+    `submit` and get a future back without waiting for it. Coroutines submitted by
+    different workers and jobs run on the same loop concurrently, which lets them share
+    async clients and limiters. At most `max_pending` coroutines are outstanding;
+    `submit` blocks once that many are running, so a fast input cannot queue up
+    unbounded work.
+    """
+
+    def __init__(self, name: str = "async-runner", max_pending: int = 64):
+        self.name = name
+        self.max_pending = max_pending
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._loop.is_closed():
+            with self._lock:
+                if self._loop is None or self._loop.is_closed():
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+
+                    def run_loop():
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(ready.set)
+                        loop.run_forever()
+
+                    self._thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+                    self._thread.start()
+                    ready.wait()
+                    self._loop = loop
+                    logger.info(f"Started event loop thread {self.name}")
+        return self._loop
+
+    def submit(self, coroutine: Coroutine[Any, Any, Any]) -> Future:
+        """
+        Schedules the coroutine on the background loop and returns its future right away.
+        """
+        self._slots.acquire()
+        try:
+            future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        except BaseException:
+            self._slots.release()
+            coroutine.close()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, coroutine: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Runs the coroutine on the background loop and blocks until it finishes.
+        """
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+
+
+class OrderedFuturesLogic(StatefulLogic):
+    """
+    Bytewax stateful logic that processes each item of a key as a future without blocking.
+
+    `start(value)` is called as soon as an item arrives and returns a future. The logic
+    asks to be notified every `poll_interval` seconds while futures are outstanding and
+    emits `finish(value, future)` for the finished ones, oldest first, stopping at the
+    first one still running. Items of one key are therefore emitted in arrival order,
+    while other keys on the same worker keep flowing. Snapshots hold the items whose
+    output has not been emitted yet; they are started again on resume.
+    """
+
+    def __init__(self, start: Callable[[Any], Future], finish: Callable[[Any, Future], Iterable[Any]],
+                 pending: Optional[Iterable[Any]] = None, poll_interval: float = 0.05):
+        self.start = start
+        self.finish = finish
+        self.poll_interval = poll_interval
+        self._pending: "deque[Tuple[Any, Future]]" = deque((value, start(value)) for value in pending or ())
+
+    def _drain(self, wait: bool = False) -> List[Any]:
+        emitted = []
+        while self._pending and (wait or self._pending[0][1].done()):
+            value, future = self._pending.popleft()
+            emitted.extend(self.finish(value, future))
+        return emitted
+
+    def on_item(self, value: Any) -> Tuple[Iterable[Any], bool]:
+        self._pending.append((value, self.start(value)))
+        return self._drain(), not self._pending
+
+    def on_notify(self) -> Tuple[Iterable[Any], bool]:
+        return self._drain(), not self._pending
+
+    def on_eof(self) -> Tuple[Iterable[Any], bool]:
+        return self._drain(wait=True), StatefulLogic.DISCARD
+
+    def notify_at(self) -> Optional[datetime]:
+        if not self._pending:
+            return None
+        return datetime.now(timezone.utc) + timedelta(seconds=self.poll_interval)
+
+    def snapshot(self) -> List[Any]:
+        return [value for value, _ in self._pending]
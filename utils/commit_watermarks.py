@@ -0,0 +1,121 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+import orjson
+
+from config.config_setting import config
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Metadata key of the watermark a GitHub job advances to once all of its chunks are stored
+COMMIT_WATERMARK_KEY = "commit_watermark"
+
+
+class CommitWatermarkStore:
+    """
+    Persists the last ingested commit per repository so later jobs only fetch new commits.
+
+    Each watermark is a small JSON file holding the newest commit SHA and committer date
+    seen for an (owner, repo) pair. Jobs that pass extra commit filters (branch, path, ...)
+    get their own watermark, since their history differs from the default one. File names
+    are a hash of the key, so owner and repo names never reach the filesystem path.
+
+    Later jobs fetch commits whose committer date is at or after the watermark's, which is
+    what GitHub's `since` filters on. A commit that only becomes reachable afterwards but
+    kept an older committer date, e.g. one on a branch merged after the watermark was
+    written or one committed on a machine with a skewed clock, is therefore never fetched
+    incrementally; a `full_refresh` job picks it up. Rebased and cherry-picked commits get
+    a new committer date and are fetched.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, owner: str, repo_name: str, commit_options: Optional[Dict[str, Any]] = None) -> str:
+        key = orjson.dumps([owner, repo_name, commit_options or {}], default=str, option=orjson.OPT_SORT_KEYS)
+        return os.path.join(self.directory, f"{hashlib.sha1(key).hexdigest()}.json")
+
+    def get(self, owner: str, repo_name: str, commit_options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, str]]:
+        path = self._path(owner, repo_name, commit_options)
+        try:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Ignoring unreadable watermark {path}: {e}")
+            return None
+
+    def set(self, owner: str, repo_name: str, commit_id: str, date: str,
+            commit_options: Optional[Dict[str, Any]] = None) -> None:
+        path = self._path(owner, repo_name, commit_options)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps({"commit_id": commit_id, "date": date, "updated_at": time.time()}))
+            os.replace(tmp_path, path)
+
+
+def watermark_update(owner: str, repo_name: str, commit_id: str, date: str,
+                     commit_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The watermark a job will advance to, carried in its messages' metadata until every
+    chunk has been stored (see `WatermarkDeliveryTracker`).
+    """
+    return {"owner": owner, "repo_name": repo_name, "commit_id": commit_id, "date": date,
+            "commit_options": commit_options or {}}
+
+
+class WatermarkDeliveryTracker:
+    """
+    Advances a job's commit watermark only once every chunk of the job has been stored.
+
+    The GitHub service attaches the watermark to each chunk instead of writing it when
+    the commits are fetched, so a chunk lost in the LLM or vector DB step leaves the
+    watermark where it was and the next job fetches those commits again. The sink calls
+    `delivered` for each chunk it has stored; chunks of a job are routed to the same
+    worker, so tracking them in memory is enough. A restart forgets partly delivered jobs,
+    which only means they are ingested again.
+    """
+
+    def __init__(self, store: CommitWatermarkStore, max_jobs: int = 1024):
+        self.store = store
+        self.max_jobs = max_jobs
+        self._delivered: "OrderedDict[str, Set[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def delivered(self, job_id: str, metadata: Dict[str, Any]) -> bool:
+        """
+        Records that the chunk described by `metadata` is stored. Returns True when this
+        completed the job and its watermark was written.
+        """
+        watermark = metadata.get(COMMIT_WATERMARK_KEY)
+        if not watermark:
+            return False
+        chunk_count = metadata.get("chunk_count", 1)
+        with self._lock:
+            chunks = self._delivered.pop(job_id, set())
+            chunks.add(metadata.get("chunk_index", 0))
+            if len(chunks) < chunk_count:
+                self._delivered[job_id] = chunks
+                while len(self._delivered) > self.max_jobs:
+                    dropped, _ = self._delivered.popitem(last=False)
+                    logger.warning(f"Forgetting partly delivered job {dropped}, its watermark will not advance")
+                return False
+
+        self.store.set(watermark["owner"], watermark["repo_name"], watermark["commit_id"], watermark["date"],
+                       watermark.get("commit_options") or None)
+        logger.info(f"Advanced watermark of {watermark['owner']}/{watermark['repo_name']} to commit "
+                    f"{watermark['commit_id']} after job {job_id} was stored")
+        return True
+
+
+commit_watermarks = CommitWatermarkStore(config.GITHUB_WATERMARK_DIRECTORY)
+watermark_tracker = WatermarkDeliveryTracker(commit_watermarks)
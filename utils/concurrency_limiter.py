@@ -0,0 +1,281 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openai import APITimeoutError, RateLimitError
+
+from config.config_setting import config
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the token count of `text` with tiktoken's cl100k_base encoding.
+
+    The encoding is downloaded on first use; when that is not possible (e.g. no network
+    access) the estimate falls back to roughly four characters per token.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+                    _encoding_failed = True
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """
+    True for errors that mean the backend is overloaded: 429 responses and timeouts.
+    """
+    if isinstance(error, (RateLimitError, APITimeoutError, TimeoutError)):
+        return True
+    return getattr(error, "status_code", None) == 429
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit for calls to one LLM provider, with an optional token budget.
+
+    The limit grows by one per window of successful calls (additive increase) and is cut
+    by `backoff_ratio` on a 429, a timeout, or when the short-term average latency rises
+    above `latency_tolerance` times the long-term average (multiplicative decrease). At
+    most one decrease happens per observed latency period so a burst of failures from the
+    same window only counts once. This lets each backend settle at the highest concurrency it
+    can serve: a single local LM Studio instance stays low, OpenAI climbs until it throttles.
+
+    When `tokens_per_minute` is set, calls also wait for a token bucket refilled at that rate.
+    """
+
+    def __init__(self, name: str, initial_limit: float = 5, min_limit: float = 1, max_limit: float = 64,
+                 latency_tolerance: float = 2.0, backoff_ratio: float = 0.5,
+                 tokens_per_minute: Optional[int] = None):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.tokens_per_minute = tokens_per_minute
+        self._tokens = float(tokens_per_minute or 0)
+        self._tokens_updated_at = time.monotonic()
+        self._in_flight = 0
+        self._baseline_latency: Optional[float] = None
+        self._smoothed_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self.successes = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    def _refill(self, now: float) -> None:
+        if self.tokens_per_minute:
+            elapsed = now - self._tokens_updated_at
+            self._tokens = min(float(self.tokens_per_minute), self._tokens + elapsed * self.tokens_per_minute / 60)
+        self._tokens_updated_at = now
+
+    def _token_wait(self, tokens: int) -> float:
+        if not self.tokens_per_minute:
+            return 0.0
+        # A single request larger than the whole budget waits for a full bucket
+        needed = min(tokens, self.tokens_per_minute) - self._tokens
+        return max(needed, 0) * 60 / self.tokens_per_minute
+
+    def _try_acquire(self, tokens: int) -> Tuple[bool, Optional[float]]:
+        """
+        Takes a slot if one is free and the token budget allows. Must hold the condition.
+
+        :return: (acquired, seconds to wait for tokens, or None to wait for a release)
+        """
+        self._refill(time.monotonic())
+        if self._in_flight >= math.floor(self.limit):
+            return False, None
+        wait_for = self._token_wait(tokens)
+        if wait_for > 0:
+            return False, wait_for
+        self._in_flight += 1
+        if self.tokens_per_minute:
+            self._tokens -= min(tokens, self.tokens_per_minute)
+        return True, None
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Blocks until a concurrency slot and `tokens` of the token budget are available.
+        """
+        with self._condition:
+            while True:
+                acquired, wait_for = self._try_acquire(tokens)
+                if acquired:
+                    return
+                self._condition.wait(timeout=wait_for)
+
+    async def acquire_async(self, tokens: int = 0, poll_interval: float = 0.05) -> None:
+        """
+        Like `acquire`, but waits on the event loop instead of blocking the thread.
+        """
+        while True:
+            with self._condition:
+                acquired, wait_for = self._try_acquire(tokens)
+            if acquired:
+                return
+            await asyncio.sleep(poll_interval if wait_for is None else min(wait_for, poll_interval))
+
+    def release(self, latency: float, throttled: bool = False) -> None:
+        """
+        Frees a slot and adjusts the limit from the outcome of the call.
+
+        :param latency: Seconds the call took.
+        :param throttled: True when the call failed with a 429 or a timeout.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                self._decrease(now, "throttled")
+            else:
+                self.successes += 1
+                if self._baseline_latency is None:
+                    self._baseline_latency = self._smoothed_latency = latency
+                else:
+                    self._baseline_latency = 0.98 * self._baseline_latency + 0.02 * latency
+                    self._smoothed_latency = 0.8 * self._smoothed_latency + 0.2 * latency
+                if self._smoothed_latency > self._baseline_latency * self.latency_tolerance:
+                    self._decrease(now, "latency")
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _decrease(self, now: float, reason: str) -> None:
+        if now - self._last_decrease < (self._smoothed_latency or 0):
+            return
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        self._last_decrease = now
+        self.decreases += 1
+        if reason == "latency":
+            # Forget the degraded average so the next window is judged on fresh samples
+            self._smoothed_latency = self._baseline_latency
+        logger.info(f"Reduced {self.name} concurrency from {previous:.1f} to {self.limit:.1f} ({reason})")
+
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        self.acquire(tokens)
+        start = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except BaseException as e:
+            throttled = is_throttling_error(e)
+            raise
+        finally:
+            self.release(time.monotonic() - start, throttled=throttled)
+
+    @asynccontextmanager
+    async def async_slot(self, tokens: int = 0):
+        await self.acquire_async(tokens)
+        start = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except BaseException as e:
+            throttled = is_throttling_error(e)
+            raise
+        finally:
+            self.release(time.monotonic() - start, throttled=throttled)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self._in_flight,
+                "successes": self.successes,
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+                "baseline_latency": self._baseline_latency,
+                "smoothed_latency": self._smoothed_latency,
+            }
+
+
+def batch_with_limiter(func: Callable[[Any], Any], inputs: Sequence[Any], limiter: AdaptiveConcurrencyLimiter,
+                       token_counts: Optional[Sequence[int]] = None, max_attempts: int = 3) -> List[Any]:
+    """
+    Calls `func` for each input under the limiter and returns the results in input order.
+
+    Throttled calls are retried up to `max_attempts` times once the limiter lets them
+    through again; any other error is raised, like `Runnable.batch` does.
+    """
+    token_counts = token_counts or [0] * len(inputs)
+
+    def call(index: int):
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with limiter.slot(token_counts[index]):
+                    return func(inputs[index])
+            except Exception as e:
+                if attempt == max_attempts or not is_throttling_error(e):
+                    raise
+                logger.warning(f"Throttled by {limiter.name} (attempt {attempt}/{max_attempts}): {e}")
+
+    if not inputs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(len(inputs), int(limiter.max_limit)))) as executor:
+        return list(executor.map(call, range(len(inputs))))
+
+
+async def abatch_with_limiter(func: Callable[[Any], Awaitable[Any]], inputs: Sequence[Any],
+                              limiter: AdaptiveConcurrencyLimiter, token_counts: Optional[Sequence[int]] = None,
+                              max_attempts: int = 3) -> List[Any]:
+    """
+    Async counterpart of `batch_with_limiter`: awaits `func` for each input under the limiter.
+
+    Every coroutine running on the same loop shares the limiter, so calls from several
+    messages interleave in one pool of in-flight requests. Results are in input order.
+    """
+    token_counts = token_counts or [0] * len(inputs)
+
+    async def call(index: int):
+        for attempt in range(1, max_attempts + 1):
+            try:
+                async with limiter.async_slot(token_counts[index]):
+                    return await func(inputs[index])
+            except Exception as e:
+                if attempt == max_attempts or not is_throttling_error(e):
+                    raise
+                logger.warning(f"Throttled by {limiter.name} (attempt {attempt}/{max_attempts}): {e}")
+
+    return list(await asyncio.gather(*(call(index) for index in range(len(inputs)))))
+
+
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(llm_model: Optional[str]) -> AdaptiveConcurrencyLimiter:
+    """
+    Returns the shared limiter for a provider, configured from LLM_CONCURRENCY.
+    """
+    name = llm_model or "default"
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            settings = config.LLM_CONCURRENCY.get(name, config.LLM_CONCURRENCY.get("default", {}))
+            limiter = AdaptiveConcurrencyLimiter(name, **settings)
+            _limiters[name] = limiter
+        return limiter
@@ -1,22 +1,29 @@
 import datetime
+from typing import Any, Dict, Generator, Iterable, List, Tuple
 
-from bytewax.connectors.kafka import KafkaSourceMessage
+from bytewax.connectors.kafka import KafkaSinkMessage, KafkaSourceMessage
 from orjson import orjson
 from logging_config import get_logger
-from utils.status_update import StandardizedMessage
+from utils.commit_watermarks import COMMIT_WATERMARK_KEY
+from utils.status_update import StandardizedMessage, CHUNK_METADATA_KEYS
 
 logger = get_logger(__name__)
 
 def kafka_to_standardized(msg: KafkaSourceMessage) -> StandardizedMessage:
     data = orjson.loads(msg.value)
     payload = data["data"]
+    upstream_metadata = data.get("metadata") or {}
 
     # Create the base parameters for the StandardizedMessage object
     kwargs = {
         "job_id": data["job_id"],
         "step_number": data["step_number"] + 1,
         "data": payload,
-        "metadata": {"original_topic": msg.topic}
+        "metadata": {"original_topic": msg.topic,
+                     # Chunk position travels with the message so each stage knows when a job is done,
+                     # and the commit watermark so the sink can advance it once the job is stored
+                     **{key: upstream_metadata[key] for key in (*CHUNK_METADATA_KEYS, COMMIT_WATERMARK_KEY)
+                        if key in upstream_metadata}}
     }
 
     # Add 'prompt' and 'llm_model' to kwargs if they are present in data
@@ -51,3 +58,84 @@ def prepare_payload(items) -> list:
             rtn.append(item)
 
     return rtn
+
+
+def iter_chunks(items: List[Any], chunk_size: int) -> Generator[Tuple[List[Any], Dict[str, Any]], None, None]:
+    """
+    Split items into chunks of at most `chunk_size` and describe each chunk's position.
+
+    Args:
+        items (List[Any]): The items to split, e.g. serialized documents.
+        chunk_size (int): Maximum items per chunk. Zero or less emits a single chunk.
+
+    Yields:
+        Tuple[List[Any], Dict[str, Any]]: The chunk and its metadata (chunk_index, chunk_count,
+        is_last_chunk and total_document_count).
+    """
+    if chunk_size <= 0:
+        chunk_size = max(len(items), 1)
+    chunk_count = max((len(items) + chunk_size - 1) // chunk_size, 1)
+    for chunk_index in range(chunk_count):
+        chunk = items[chunk_index * chunk_size:(chunk_index + 1) * chunk_size]
+        yield chunk, {
+            "chunk_index": chunk_index,
+            "chunk_count": chunk_count,
+            "is_last_chunk": chunk_index == chunk_count - 1,
+            "total_document_count": len(items),
+        }
+
+
+def iter_streaming_chunks(items: Iterable[str], chunk_size: int,
+                          max_bytes: int = 0) -> Generator[Tuple[List[str], Dict[str, Any]], None, None]:
+    """
+    Like `iter_chunks`, for serialized items produced lazily, e.g. while a file is parsed.
+
+    A chunk is closed once it holds `chunk_size` items or adding the next item would take
+    it past `max_bytes` (zero or less disables either limit; a single oversized item still
+    gets a chunk of its own). Since the total is unknown until the input ends, chunks carry
+    `documents_so_far` instead of `chunk_count`, and only the last chunk gets `chunk_count`
+    and `total_document_count`. One chunk is held back to know whether it is the last.
+
+    Args:
+        items (Iterable[str]): Serialized items, e.g. document JSON.
+        chunk_size (int): Maximum items per chunk.
+        max_bytes (int): Maximum UTF-8 size of a chunk's items.
+
+    Yields:
+        Tuple[List[str], Dict[str, Any]]: The chunk and its metadata (chunk_index,
+        is_last_chunk, documents_so_far, and on the last chunk chunk_count and
+        total_document_count).
+    """
+    def fill_chunks():
+        chunk, chunk_bytes = [], 0
+        for item in items:
+            item_bytes = len(item.encode("utf-8")) if max_bytes > 0 else 0
+            if chunk and ((0 < chunk_size <= len(chunk)) or (max_bytes > 0 and chunk_bytes + item_bytes > max_bytes)):
+                yield chunk
+                chunk, chunk_bytes = [], 0
+            chunk.append(item)
+            chunk_bytes += item_bytes
+        if chunk:
+            yield chunk
+
+    documents_so_far = 0
+    pending = None
+    chunk_index = 0
+    for chunk in fill_chunks():
+        if pending is not None:
+            documents_so_far += len(pending)
+            yield pending, {"chunk_index": chunk_index, "is_last_chunk": False, "documents_so_far": documents_so_far}
+            chunk_index += 1
+        pending = chunk
+    if pending is not None:
+        documents_so_far += len(pending)
+        yield pending, {"chunk_index": chunk_index, "chunk_count": chunk_index + 1, "is_last_chunk": True,
+                        "documents_so_far": documents_so_far, "total_document_count": documents_so_far}
+
+
+def to_kafka_sink_message(message: StandardizedMessage) -> KafkaSinkMessage:
+    """
+    Serialize a message for Kafka, keyed by job_id so all chunks of a job stay on one
+    partition and are consumed in order.
+    """
+    return KafkaSinkMessage(message.job_id.encode("utf-8"), message.model_dump_json())
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def content_key(*parts: Optional[str]) -> str:
+    """
+    Builds a stable cache key from the given parts, e.g. (model, prompt, page_content).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(("" if part is None else str(part)).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Size-bounded key/value cache stored in a local SQLite database.
+
+    Values are bytes. Every read refreshes the entry's access time, and once the cache
+    holds more than `max_entries` the least recently used entries are evicted in one
+    batch (`evict_fraction` of the limit) so eviction is not paid on every write.
+    Safe to share between the worker threads of a process.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, evict_fraction: float = 0.1):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_fraction = evict_fraction
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._entry_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+            self._entry_count = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """
+        Returns the cached values for the keys that are present.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.connection.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                            [(now, key) for key in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN")
+            try:
+                for key, value in items.items():
+                    inserted = connection.execute(
+                        "INSERT OR IGNORE INTO cache (key, value, accessed_at) VALUES (?, ?, ?)", (key, value, now)
+                    ).rowcount
+                    if inserted:
+                        self._entry_count += 1
+                    else:
+                        connection.execute("UPDATE cache SET value = ?, accessed_at = ? WHERE key = ?",
+                                           (value, now, key))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            if self._entry_count > self.max_entries:
+                self._evict()
+
+    def set(self, key: str, value: bytes) -> None:
+        self.set_many({key: value})
+
+    def _evict(self) -> None:
+        target = max(int(self.max_entries * (1 - self.evict_fraction)), 0)
+        excess = self._entry_count - target
+        self.connection.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (excess,)
+        )
+        self._entry_count = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.evictions += excess
+        logger.debug(f"Evicted {excess} entries from {self.path}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def metrics(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._entry_count,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,269 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+import orjson
+import requests
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class DownloadCache:
+    """
+    Size-bounded, content-addressed on-disk cache for downloaded files such as PDFs.
+
+    Files are stored once per SHA-256 of their content under `objects/`, and a small JSON
+    index entry per URL records which object it resolved to along with the ETag and
+    Last-Modified headers. A cached URL is reused without any request for
+    `revalidate_after` seconds, then revalidated with a conditional GET, so an unchanged
+    file is never transferred twice. Downloads stream to disk in `chunk_size` pieces, and
+    concurrent fetches of the same URL share one download, across threads and, through
+    file locks, across worker processes using the same directory (threads only where
+    `fcntl` is unavailable). Once the objects exceed `max_bytes` the least recently used
+    ones are removed, except those currently leased (see `lease`).
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3, revalidate_after: float = 3600,
+                 timeout: float = 60, chunk_size: int = 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._pins: Dict[str, int] = {}
+        self._pins_lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    @contextmanager
+    def _file_lock(self, url: str) -> Iterator[None]:
+        with self._lock_file(hashlib.sha1(url.encode("utf-8")).hexdigest() + ".lock"):
+            yield
+
+    @contextmanager
+    def _lock_file(self, name: str) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        path = os.path.join(self.directory, "locks", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.directory, "index", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _read_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._index_path(url), "rb") as f:
+                entry = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Ignoring unreadable download cache entry for {url}: {e}")
+            return None
+        return entry if os.path.exists(self.object_path(entry["sha256"])) else None
+
+    def _write_entry(self, url: str, entry: Dict[str, Any]) -> None:
+        path = self._index_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(entry))
+        os.replace(tmp_path, path)
+
+    def fetch(self, url: str) -> str:
+        """
+        Returns a local path holding the content of `url`, downloading it only if needed.
+
+        Local paths are returned unchanged. If revalidation fails on a network error the
+        cached copy is used.
+        """
+        if os.path.isfile(url):
+            return url
+        with self._url_lock(url), self._file_lock(url):
+            entry = self._read_entry(url)
+            if entry is not None and time.time() - entry["checked_at"] < self.revalidate_after:
+                self.hits += 1
+                return self._touch(entry)
+            try:
+                return self._download(url, entry)
+            except requests.RequestException as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Could not revalidate {url}, using cached copy: {e}")
+                self.hits += 1
+                return self._touch(entry)
+
+    @contextmanager
+    def lease(self, url: str) -> Iterator[str]:
+        """
+        Like `fetch`, but keeps the file from being evicted until the block exits.
+
+        Use it when the path is read after `fetch` returns, e.g. reopened by extraction
+        workers, so a download for another job cannot evict the file in the meantime.
+        """
+        if os.path.isfile(url):
+            yield url
+            return
+        path, handle = self._pin(url)
+        try:
+            yield path
+        finally:
+            self._unpin(path, handle)
+
+    def _pin(self, url: str, attempts: int = 3) -> Tuple[str, Any]:
+        for attempt in range(attempts):
+            path = self.fetch(url)
+            with self._pins_lock:
+                self._pins[path] = self._pins.get(path, 0) + 1
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                handle = None
+            else:
+                if fcntl is not None:
+                    # A shared lock keeps other processes' eviction away from the file
+                    fcntl.flock(handle, fcntl.LOCK_SH)
+                    if os.fstat(handle.fileno()).st_nlink == 0:
+                        handle.close()
+                        handle = None
+            if handle is not None:
+                return path, handle
+            # Evicted between fetching and pinning it; fetch it again
+            self._unpin(path, None)
+        raise FileNotFoundError(f"{url} was evicted from the download cache while leasing it")
+
+    def _unpin(self, path: str, handle: Any) -> None:
+        if handle is not None:
+            handle.close()
+        with self._pins_lock:
+            count = self._pins.pop(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+
+    def _is_pinned(self, path: str) -> bool:
+        with self._pins_lock:
+            return path in self._pins
+
+    def _remove_unleased(self, path: str) -> bool:
+        if self._is_pinned(path):
+            return False
+        if fcntl is None:
+            os.remove(path)
+            return True
+        try:
+            with open(path, "rb") as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False  # leased by another process
+                os.remove(path)
+                return True
+        except FileNotFoundError:
+            return False
+
+    def _touch(self, entry: Dict[str, Any]) -> str:
+        path = self.object_path(entry["sha256"])
+        os.utime(path)
+        return path
+
+    def _download(self, url: str, entry: Optional[Dict[str, Any]]) -> str:
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        with requests.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304 and entry is not None:
+                self.revalidated += 1
+                entry = {**entry, "checked_at": time.time()}
+                self._write_entry(url, entry)
+                return self._touch(entry)
+            if response.status_code != 200:
+                raise ValueError(f"Check the url of your file; returned status code {response.status_code}")
+
+            tmp_directory = os.path.join(self.directory, "tmp")
+            os.makedirs(tmp_directory, exist_ok=True)
+            tmp_path = os.path.join(tmp_directory, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}."
+                                                   f"{os.getpid()}.{threading.get_ident()}.part")
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with open(tmp_path, "wb") as f:
+                    for block in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(block)
+                        digest.update(block)
+                        size += len(block)
+                object_path = self.object_path(digest.hexdigest())
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                try:
+                    # Linking fails if the object exists, so a file already stored for identical
+                    # content from another URL, possibly leased, is never swapped for a new inode
+                    os.link(tmp_path, object_path)
+                except FileExistsError:
+                    os.utime(object_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self.downloads += 1
+            self._write_entry(url, {"url": url, "sha256": digest.hexdigest(), "size": size,
+                                    "etag": response.headers.get("ETag"),
+                                    "last_modified": response.headers.get("Last-Modified"),
+                                    "checked_at": time.time()})
+        logger.info(f"Downloaded {url} ({size} bytes)")
+        self._evict(keep=object_path)
+        return object_path
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        objects_directory = os.path.join(self.directory, "objects")
+        # Processes sharing the directory evict one at a time so they do not count files twice
+        with self._evict_lock, self._lock_file("evict.lock"):
+            files = []
+            for root, _, names in os.walk(objects_directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if path == keep or not self._remove_unleased(path):
+                    continue
+                total -= size
+                logger.debug(f"Evicted {path} from the download cache")
+
+    def metrics(self) -> Dict[str, int]:
+        return {"hits": self.hits, "revalidated": self.revalidated, "downloads": self.downloads}
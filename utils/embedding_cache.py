@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from logging_config import get_logger
+from utils.disk_cache import DiskCache, content_key
+
+logger = get_logger(__name__)
+
+
+def embedding_namespace(embeddings: Embeddings) -> str:
+    """
+    Identifies the model behind an embeddings object, so vectors from different models never mix.
+
+    Wrappers that carry their own `namespace` (e.g. `CachedEmbeddings`) are identified by it.
+    """
+    namespace = getattr(embeddings, "namespace", None)
+    if isinstance(namespace, str) and namespace:
+        return namespace
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    size = getattr(embeddings, "size", None)
+    return ":".join(str(part) for part in (type(embeddings).__name__, model, size) if part is not None)
+
+
+def encode_vector(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from a disk cache.
+
+    Vectors are stored as float32 blobs keyed by hash(namespace, text), where the
+    namespace identifies the wrapped model. Only texts missing from the cache are sent
+    to the wrapped embeddings, once each even if a batch repeats them. Cache errors fall
+    back to embedding every text.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: DiskCache, namespace: str = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace or embedding_namespace(embeddings)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, texts: List[str], kind: str, embed_misses) -> List[List[float]]:
+        keys = [content_key(self.namespace, kind, text) for text in texts]
+        try:
+            cached = {key: decode_vector(blob) for key, blob in self.cache.get_many(keys).items()}
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed, embedding every text: {e}")
+            cached = {}
+
+        misses: Dict[str, str] = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if misses:
+            vectors = embed_misses(list(misses.values()))
+            cached.update(zip(misses, vectors))
+            try:
+                self.cache.set_many({key: encode_vector(vector) for key, vector in zip(misses, vectors)})
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to store {len(misses)} embeddings in the cache: {e}")
+
+        with self._lock:
+            # Repeats of a miss within the batch are served without another provider call
+            self.hits += len(texts) - len(misses)
+            self.misses += len(misses)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query", lambda misses: [self.embeddings.embed_query(misses[0])])[0]
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": self.cache.metrics()["entries"],
+            }
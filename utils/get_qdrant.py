@@ -1,28 +1,206 @@
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Set, Tuple
+
 from icecream import ic
 
 from langchain_qdrant import Qdrant
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 
+from config.config_setting import config
+from logging_config import get_logger
+from utils.embedding_cache import embedding_namespace
+
+logger = get_logger(__name__)
+
+DEFAULT_VECTOR_SIZE = 1536
+
+
+def embedding_dimension(embeddings) -> int:
+    """
+    Vector size produced by an embeddings object.
+
+    QDRANT_VECTOR_SIZE wins when set. Otherwise the size is read from the model's
+    `size`/`dimensions` attribute (unwrapping caching wrappers) and, failing that, from
+    a single probe embedding.
+    """
+    if config.QDRANT_VECTOR_SIZE:
+        return config.QDRANT_VECTOR_SIZE
+    model = embeddings
+    # Look through at most a couple of wrapper layers, e.g. CachedEmbeddings
+    for _ in range(3):
+        if model is None:
+            break
+        for attribute in ("size", "dimensions"):
+            value = getattr(model, attribute, None)
+            if isinstance(value, int) and value > 0:
+                return value
+        model = getattr(model, "embeddings", None)
+    try:
+        probe = embeddings.embed_query("dimension probe")
+        if isinstance(probe, list) and probe:
+            return len(probe)
+    except Exception as e:
+        logger.warning(f"Failed to probe the embedding size: {e}")
+    logger.warning(f"Could not determine the embedding size, using {DEFAULT_VECTOR_SIZE}")
+    return DEFAULT_VECTOR_SIZE
+
+
+def build_collection_config(vector_size: int) -> Dict[str, Any]:
+    """
+    Keyword arguments for `create_collection` from the QDRANT_* settings.
+
+    Supports on-disk vectors and payload, scalar (int8) or product (x16) quantization with
+    the quantized vectors optionally pinned in RAM, and HNSW parameters.
+    """
+    collection_config: Dict[str, Any] = {
+        "vectors_config": models.VectorParams(size=vector_size, distance=models.Distance(config.QDRANT_DISTANCE),
+                                              on_disk=config.QDRANT_ON_DISK_VECTORS or None),
+    }
+    if config.QDRANT_ON_DISK_PAYLOAD:
+        collection_config["on_disk_payload"] = True
+
+    quantization = (config.QDRANT_QUANTIZATION or "").lower()
+    if quantization == "scalar":
+        collection_config["quantization_config"] = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99,
+                                                   always_ram=config.QDRANT_QUANTIZATION_ALWAYS_RAM))
+    elif quantization == "product":
+        collection_config["quantization_config"] = models.ProductQuantization(
+            product=models.ProductQuantizationConfig(compression=models.CompressionRatio.X16,
+                                                     always_ram=config.QDRANT_QUANTIZATION_ALWAYS_RAM))
+    elif quantization:
+        raise ValueError(f"Unsupported Qdrant quantization: {config.QDRANT_QUANTIZATION}")
+
+    hnsw = {"m": config.QDRANT_HNSW_M, "ef_construct": config.QDRANT_HNSW_EF_CONSTRUCT,
+            "on_disk": config.QDRANT_HNSW_ON_DISK}
+    if any(value is not None for value in hnsw.values()):
+        collection_config["hnsw_config"] = models.HnswConfigDiff(
+            **{key: value for key, value in hnsw.items() if value is not None})
+    return collection_config
+
+
+class QdrantStoreRegistry:
+    """
+    Per-worker registry of long-lived Qdrant clients and vector stores.
+
+    Clients are shared per (host, port) and vector stores are cached per collection and
+    embedding model with LRU eviction. Collections that are known to exist are remembered so the
+    `collection_exists` round trip only happens the first time a collection is seen.
+    """
+
+    def __init__(self, max_stores: int = 32):
+        self.max_stores = max_stores
+        self._clients: Dict[Tuple[str, int], QdrantClient] = {}
+        self._stores: "OrderedDict[Tuple[str, int, str, str], Qdrant]" = OrderedDict()
+        self._known_collections: Set[Tuple[str, int, str]] = set()
+        self._lock = threading.RLock()
+
+    def get_client(self, host: str, port: int) -> QdrantClient:
+        with self._lock:
+            client = self._clients.get((host, port))
+            if client is None:
+                logger.info(f"Opening Qdrant client for {host}:{port} (prefer_grpc={config.VECTOR_DB_PREFER_GRPC})")
+                client = QdrantClient(host=host, port=port, grpc_port=config.VECTOR_DB_GRPC_PORT,
+                                      prefer_grpc=config.VECTOR_DB_PREFER_GRPC)
+                self._clients[(host, port)] = client
+            return client
+
+    def ensure_collection(self, client: QdrantClient, host: str, port: int, collection_name: str,
+                          embeddings=None) -> None:
+        key = (host, port, collection_name)
+        if key in self._known_collections:
+            return
+        # Check if the collection exists
+        collection_exists = client.collection_exists(collection_name=collection_name)
+        # If the collection does not exist, create it with the specified configuration
+        if not collection_exists:
+            ic(f"creating collection {collection_name}")
+            vector_size = embedding_dimension(embeddings) if embeddings is not None else DEFAULT_VECTOR_SIZE
+            client.create_collection(collection_name=collection_name, **build_collection_config(vector_size))
+        self.ensure_payload_indexes(client, collection_name, created=not collection_exists)
+        self._known_collections.add(key)
+
+    @staticmethod
+    def ensure_payload_indexes(client: QdrantClient, collection_name: str, created: bool = False) -> None:
+        """
+        Create the QDRANT_PAYLOAD_INDEXES keyword indexes that the collection is missing.
+
+        Collections created before an index was configured get it the first time they are
+        seen, so filtered deletes and lookups never fall back to a full scan.
+        """
+        # langchain's Qdrant store keeps document metadata under the "metadata" payload key
+        fields = [f"metadata.{field}" for field in config.QDRANT_PAYLOAD_INDEXES]
+        if not fields:
+            return
+        existing = set() if created else set(client.get_collection(collection_name=collection_name).payload_schema or {})
+        for field_name in fields:
+            if field_name in existing:
+                continue
+            logger.info(f"Creating payload index {field_name} on collection {collection_name}")
+            client.create_payload_index(collection_name=collection_name, field_name=field_name,
+                                        field_schema=models.PayloadSchemaType.KEYWORD)
+
+    def get_store(self, host: str, port: int, embeddings, collection_name: str) -> Qdrant:
+        # Keyed by the embedding model rather than the embeddings object, since callers
+        # may build a new (equivalent) embeddings object for every message.
+        key = (host, port, collection_name, embedding_namespace(embeddings))
+        with self._lock:
+            store = self._stores.get(key)
+            if store is not None:
+                self._stores.move_to_end(key)
+                return store
+
+            client = self.get_client(host, port)
+            self.ensure_collection(client, host, port, collection_name, embeddings)
+            store = Qdrant(
+                client=client, collection_name=collection_name,
+                embeddings=embeddings,
+            )
+            self._stores[key] = store
+            self._stores.move_to_end(key)
+            while len(self._stores) > self.max_stores:
+                evicted_key, _ = self._stores.popitem(last=False)
+                logger.debug(f"Evicted Qdrant store for collection {evicted_key[2]}")
+            return store
+
+    def forget_collection(self, collection_name: str) -> None:
+        """
+        Drop cached state for a collection, e.g. after it has been deleted externally.
+        """
+        with self._lock:
+            for key in [key for key in self._stores if key[2] == collection_name]:
+                del self._stores[key]
+            self._known_collections = {key for key in self._known_collections if key[2] != collection_name}
+
+    def close(self) -> None:
+        with self._lock:
+            self._stores.clear()
+            self._known_collections.clear()
+            for (host, port), client in self._clients.items():
+                try:
+                    client.close()
+                    logger.info(f"Closed Qdrant client for {host}:{port}")
+                except Exception as e:
+                    logger.error(f"Failed to close Qdrant client for {host}:{port}: {e}")
+            self._clients.clear()
+
+
+qdrant_store_registry = QdrantStoreRegistry(max_stores=config.QDRANT_STORE_CACHE_SIZE)
+atexit.register(qdrant_store_registry.close)
+
+
 def get_qdrant_vector_store(
         host: str,
         port: int,
         embeddings,
         collection_name: str,
 ):
-    client = QdrantClient(host=host, port=port)
-    # Check if the collection exists
-    collection_exists = client.collection_exists(collection_name=collection_name)
-    # If the collection does not exist, create it with the specified configuration
-    if not collection_exists:
-        ic(f"creating collection {collection_name}")
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE),
-        )
-
-    db = Qdrant(
-        client=client, collection_name=collection_name,
-        embeddings=embeddings,
-    )
-    return db
\ No newline at end of file
+    return qdrant_store_registry.get_store(host=host, port=port, embeddings=embeddings,
+                                           collection_name=collection_name)
+
+
+def close_qdrant_vector_stores() -> None:
+    qdrant_store_registry.close()
@@ -1,5 +1,14 @@
+import bisect
+import random
+import threading
+import time
 from logging import Logger
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
 from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
 
 class MyCustomHandler(BaseCallbackHandler):
     def __init__(self, logger: Logger):
@@ -12,31 +21,234 @@ class MyCustomHandler(BaseCallbackHandler):
         self.logger = logger
 
     def on_llm_new_token(self, token: str, **kwargs) -> None:
-        self.logger.info(f"New token: {token}")
+        # Streaming models emit thousands of tokens per document; only trace them when debugging
+        self.logger.debug(f"New token: {token}")
 
     def on_llm_start(self, serialized, prompts, run_id, **kwargs):
-        self.logger.info(f"LLM start with run_id: {run_id} and prompts: {prompts}")
+        self.logger.debug(f"LLM start with run_id: {run_id} and prompts: {prompts}")
 
     def on_llm_end(self, response, run_id, parent_run_id=None, **kwargs):
-        self.logger.info(f"LLM end with run_id: {run_id} and response: {response}")
+        self.logger.debug(f"LLM end with run_id: {run_id} and response: {response}")
 
     def on_llm_error(self, error, run_id, parent_run_id=None, **kwargs):
         self.logger.error(f"LLM error with run_id: {run_id} and error: {error}")
 
     def on_chain_start(self, serialized, inputs, run_id, **kwargs):
-        self.logger.info(f"Chain start with run_id: {run_id} and inputs: {inputs}")
+        self.logger.debug(f"Chain start with run_id: {run_id} and inputs: {inputs}")
 
     def on_chain_end(self, outputs, run_id, parent_run_id=None, **kwargs):
-        self.logger.info(f"Chain end with run_id: {run_id} and outputs: {outputs}")
+        self.logger.debug(f"Chain end with run_id: {run_id} and outputs: {outputs}")
 
     def on_chain_error(self, error, run_id, parent_run_id=None, **kwargs):
         self.logger.error(f"Chain error with run_id: {run_id} and error: {error}")
 
     def on_retriever_start(self, serialized, query, run_id, **kwargs):
-        self.logger.info(f"Retriever start with run_id: {run_id} and query: {query}")
+        self.logger.debug(f"Retriever start with run_id: {run_id} and query: {query}")
 
     def on_retriever_end(self, documents, run_id, parent_run_id=None, **kwargs):
-        self.logger.info(f"Retriever end with run_id: {run_id} and documents: {documents}")
+        self.logger.debug(f"Retriever end with run_id: {run_id} and documents: {documents}")
 
     def on_retriever_error(self, error, run_id, parent_run_id=None, **kwargs):
         self.logger.error(f"Retriever error with run_id: {run_id} and error: {error}")
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with count, sum, min and max, cheap enough to update on every call.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the given fraction of observations.
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class LLMTelemetryHandler(BaseCallbackHandler):
+    """
+    Callback handler that aggregates LLM call telemetry instead of logging every event.
+
+    Latency, time to first token, prompt tokens and completion tokens are recorded per call
+    into in-memory histograms. The aggregates are logged at most once every
+    `report_interval` seconds, from the call that finishes after the interval or from a
+    background thread when no call finishes, and once more on `close` if calls finished
+    since the last report. Full prompts and responses are only logged for a `sample_rate`
+    fraction of calls. One instance is meant to be shared by every call in a worker
+    process so the aggregates cover all jobs.
+    """
+
+    def __init__(self, logger: Logger, sample_rate: float = 0.01, report_interval: float = 60.0):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.report_interval = report_interval
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.time_to_first_token = Histogram(LATENCY_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+        self.errors = 0
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._last_report = time.monotonic()
+        self._unreported = 0
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        if self.report_interval <= 0 or self._closed.is_set():
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="llm-telemetry", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed.wait(timeout=self.report_interval):
+            self.maybe_report()
+
+    def _start(self, run_id: UUID, payload: Any) -> None:
+        self._ensure_started()
+        sampled = random.random() < self.sample_rate
+        with self._lock:
+            self._runs[run_id] = {"start": time.monotonic(), "first_token": None, "streamed": 0, "sampled": sampled}
+        if sampled:
+            self.logger.info(f"Sampled LLM call {run_id} prompts: {payload}")
+
+    def on_llm_start(self, serialized, prompts: List[str], *, run_id: UUID, **kwargs) -> None:
+        self._start(run_id, prompts)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._start(run_id, messages)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                if run["first_token"] is None:
+                    run["first_token"] = time.monotonic()
+                run["streamed"] += 1
+
+    @staticmethod
+    def token_usage(response: LLMResult) -> Dict[str, Optional[int]]:
+        """
+        Reads prompt/completion token counts from the provider's llm_output or the
+        generations' usage metadata, whichever the model populated.
+        """
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if prompt_tokens is None and completion_tokens is None:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if metadata:
+                        prompt_tokens = (prompt_tokens or 0) + metadata.get("input_tokens", 0)
+                        completion_tokens = (completion_tokens or 0) + metadata.get("output_tokens", 0)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        now = time.monotonic()
+        usage = self.token_usage(response)
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            self.latency.observe(now - run["start"])
+            if run["first_token"] is not None:
+                self.time_to_first_token.observe(run["first_token"] - run["start"])
+            if usage["prompt_tokens"] is not None:
+                self.prompt_tokens.observe(usage["prompt_tokens"])
+            completion_tokens = usage["completion_tokens"]
+            if completion_tokens is None and run["streamed"]:
+                completion_tokens = run["streamed"]
+            if completion_tokens is not None:
+                self.completion_tokens.observe(completion_tokens)
+            self._unreported += 1
+        if run["sampled"]:
+            self.logger.info(f"Sampled LLM call {run_id} response: {response}")
+        self.maybe_report(now)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+            self.errors += 1
+            self._unreported += 1
+        self.logger.error(f"LLM error with run_id: {run_id} and error: {error}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "latency_seconds": self.latency.summary(),
+                "time_to_first_token_seconds": self.time_to_first_token.summary(),
+                "prompt_tokens": self.prompt_tokens.summary(),
+                "completion_tokens": self.completion_tokens.summary(),
+                "errors": self.errors,
+                "in_flight": len(self._runs),
+            }
+
+    def maybe_report(self, now: Optional[float] = None) -> bool:
+        """
+        Logs the aggregates if `report_interval` has passed since the last report and calls
+        finished since then.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._last_report < self.report_interval or not self._unreported:
+                return False
+            self._last_report = now
+            self._unreported = 0
+        self.logger.info(f"LLM telemetry: {self.metrics()}")
+        return True
+
+    def close(self) -> None:
+        """
+        Stops the report thread and logs the aggregates of calls not reported yet.
+        """
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            unreported, self._unreported = self._unreported, 0
+        if unreported:
+            self.logger.info(f"LLM telemetry: {self.metrics()}")
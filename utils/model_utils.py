@@ -1,7 +1,11 @@
-from typing import List, Optional
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 
 from langchain.chains.base import Chain
 from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
@@ -9,6 +13,11 @@ from langchain_community.chat_models.fake import FakeMessagesListChatModel
 from langchain_core.messages import BaseMessage
 from config.config_setting import config
 from icecream import ic
+from logging_config import get_logger
+from utils.disk_cache import DiskCache
+from utils.embedding_cache import CachedEmbeddings
+
+logger = get_logger(__name__)
 
 def get_openai_chat_model():
     chat_model = ChatOpenAI(temperature=.8, openai_api_key=config.OPENAI_API_KEY, model="gpt-4o")
@@ -20,23 +29,117 @@ def get_fake_chat_model():
     return chat_model
 
 
-def setup_chat_model(custom_prompt: Optional[str] = None,llm_model:Optional[str] = 'fake'):
+def get_chat_model_setup_function(llm_model: Optional[str]) -> Callable[[], BaseChatModel]:
     if llm_model == 'openai':
-        model_setup_function = get_openai_chat_model
+        return get_openai_chat_model
     elif llm_model == 'fake':
-        model_setup_function = get_fake_chat_model
+        return get_fake_chat_model
     elif llm_model == 'lmstudio':
-        model_setup_function = get_lmstudio_model
+        return get_lmstudio_model
     else:
         raise ValueError(f"Unsupported chat model provider: {llm_model}")
 
-    chat_model = model_setup_function()
 
+def build_chain(chat_model: BaseChatModel, custom_prompt: Optional[str] = None):
     # Use the custom prompt if provided, otherwise use the default from config
     prompt_template = custom_prompt+" {text}" if custom_prompt else config.TEMPLATE
     prompt = ChatPromptTemplate.from_template(prompt_template)
 
     return prompt | chat_model | StrOutputParser()
+
+
+PACKED_PROMPT_TEMPLATE = """{instruction}
+
+Apply the instruction above to each of the {count} documents below independently.
+Respond with only a JSON object that maps every document id to its result as a string,
+for example {{"0": "...", "1": "..."}}.
+
+{documents}"""
+
+
+def build_packed_chain(chat_model: BaseChatModel):
+    # The instruction and documents are both template variables, so braces in either are left alone
+    prompt = ChatPromptTemplate.from_template(PACKED_PROMPT_TEMPLATE)
+
+    return prompt | chat_model | StrOutputParser()
+
+
+def setup_chat_model(custom_prompt: Optional[str] = None,llm_model:Optional[str] = 'fake'):
+    chat_model = get_chat_model_setup_function(llm_model)()
+    return build_chain(chat_model, custom_prompt)
+
+
+class ChainCache:
+    """
+    Per-worker cache of chat model clients and the chains built on top of them.
+
+    One client is kept per provider for the life of the worker, so its HTTP connection
+    pool stays warm across jobs. Chains are cached per (llm_model, prompt) with LRU
+    eviction; evicting a chain never closes the client it shares with other prompts.
+    """
+
+    def __init__(self, max_chains: int = 32):
+        self.max_chains = max_chains
+        self._models: Dict[str, BaseChatModel] = {}
+        self._chains: "OrderedDict[Tuple[str, Optional[str], bool], object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_chat_model(self, llm_model: Optional[str]) -> BaseChatModel:
+        with self._lock:
+            chat_model = self._models.get(llm_model)
+            if chat_model is None:
+                logger.info(f"Creating chat model client for {llm_model}")
+                chat_model = get_chat_model_setup_function(llm_model)()
+                self._models[llm_model] = chat_model
+            return chat_model
+
+    def get_chain(self, custom_prompt: Optional[str] = None, llm_model: Optional[str] = 'fake',
+                  packed: bool = False):
+        key = (llm_model, None if packed else custom_prompt, packed)
+        with self._lock:
+            chain = self._chains.get(key)
+            if chain is not None:
+                self._chains.move_to_end(key)
+                self.hits += 1
+                return chain
+            self.misses += 1
+
+        chat_model = self.get_chat_model(llm_model)
+        chain = build_packed_chain(chat_model) if packed else build_chain(chat_model, custom_prompt)
+        with self._lock:
+            self._chains[key] = chain
+            self._chains.move_to_end(key)
+            while len(self._chains) > self.max_chains:
+                evicted_key, _ = self._chains.popitem(last=False)
+                logger.debug(f"Evicted chain for model {evicted_key[0]}")
+        return chain
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chains.clear()
+            self._models.clear()
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "chains": len(self._chains),
+                    "models": len(self._models)}
+
+
+chain_cache = ChainCache(max_chains=config.LLM_CHAIN_CACHE_SIZE)
+
+
+def get_cached_chain(custom_prompt: Optional[str] = None, llm_model: Optional[str] = 'fake', packed: bool = False):
+    """
+    Returns the chain for (llm_model, custom_prompt), building it on first use.
+
+    With `packed` the chain takes several documents at once (see PACKED_PROMPT_TEMPLATE)
+    and the instruction is passed in as an input, so one chain serves every prompt.
+    """
+    return chain_cache.get_chain(custom_prompt=custom_prompt, llm_model=llm_model, packed=packed)
+
+
 def get_openai_embedding_model():
     return OpenAIEmbeddings(openai_api_key=config.OPENAI_API_KEY)
 
@@ -57,4 +160,25 @@ def setup_embedding_model(llm_model:Optional[str] = 'fake'):
     else:
         raise ValueError(f"Unsupported embedding model provider: {config.EMBEDDING_MODEL_PROVIDER}")
     embedding_model = model_setup_function()
-    return embedding_model
\ No newline at end of file
+    return embedding_model
+
+
+embedding_cache = DiskCache(config.EMBEDDING_CACHE_PATH, max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES)
+atexit.register(embedding_cache.close)
+_cached_embedding_models: Dict[Optional[str], CachedEmbeddings] = {}
+_cached_embedding_models_lock = threading.Lock()
+
+
+def setup_cached_embedding_model(llm_model: Optional[str] = 'fake'):
+    """
+    Returns the worker's shared embedding model for `llm_model`, wrapped in the disk
+    embedding cache unless EMBEDDING_CACHE_ENABLED is off.
+    """
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return setup_embedding_model(llm_model)
+    with _cached_embedding_models_lock:
+        embedding_model = _cached_embedding_models.get(llm_model)
+        if embedding_model is None:
+            embedding_model = CachedEmbeddings(setup_embedding_model(llm_model), embedding_cache)
+            _cached_embedding_models[llm_model] = embedding_model
+        return embedding_model
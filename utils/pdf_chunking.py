@@ -0,0 +1,144 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+
+from langchain_core.documents import Document as LangchainDocument
+from pydantic import BaseModel
+
+from config.config_setting import config
+from logging_config import get_logger
+from utils.concurrency_limiter import estimate_tokens
+from utils.pdf_extraction import iter_pdf_page_blocks, iter_pdf_pages
+from utils.text_splitter import FastRecursiveCharacterTextSplitter
+
+logger = get_logger(__name__)
+
+ChunkingStrategy = Literal["characters", "tokens", "layout", "adaptive"]
+
+
+class ChunkingOptions(BaseModel):
+    """
+    How a PDF is cut into chunks.
+
+    Attributes:
+        strategy: "characters" splits to `chunk_size` characters (the original behaviour),
+            "tokens" to `chunk_size` tokens, "adaptive" to the token budget configured for
+            the job's model, and "layout" groups whole PyMuPDF text blocks up to
+            `chunk_size` tokens, starting a new chunk at every heading.
+        chunk_size: Characters for "characters", tokens for the other strategies.
+        chunk_overlap: Overlap between consecutive chunks, in the same unit.
+    """
+    strategy: ChunkingStrategy = "characters"
+    chunk_size: int = 500
+    chunk_overlap: int = 20
+
+
+def resolve_chunking(resource_data: Dict[str, Any], llm_model: Optional[str] = None) -> ChunkingOptions:
+    """
+    Chunking options for a job: `chunking_strategy`, `chunk_size` and `chunk_overlap` from
+    its resource_data, falling back to PDF_CHUNKING_STRATEGY and the configured sizes.
+    """
+    strategy = resource_data.get("chunking_strategy") or config.PDF_CHUNKING_STRATEGY
+    if strategy == "characters":
+        default_size, default_overlap = config.PDF_CHUNK_SIZE, config.PDF_CHUNK_OVERLAP
+    elif strategy == "adaptive":
+        default_size = config.PDF_CHUNK_TOKENS_BY_MODEL.get(llm_model or "default", config.PDF_CHUNK_TOKENS)
+        default_overlap = config.PDF_CHUNK_OVERLAP_TOKENS
+    else:
+        default_size, default_overlap = config.PDF_CHUNK_TOKENS, config.PDF_CHUNK_OVERLAP_TOKENS
+    return ChunkingOptions(strategy=strategy,
+                           chunk_size=int(resource_data.get("chunk_size", default_size)),
+                           chunk_overlap=int(resource_data.get("chunk_overlap", default_overlap)))
+
+
+def is_heading(text: str, size: float, body_size: float, size_ratio: float) -> bool:
+    return body_size > 0 and size >= body_size * size_ratio and len(text) <= 200
+
+
+class LayoutChunker:
+    """
+    Groups a PDF's text blocks into chunks of at most `token_budget` tokens.
+
+    Blocks (paragraphs, list items, captions...) are never cut unless a single block is
+    over the budget, in which case it is split with the token splitter. A block set in a
+    font at least `heading_size_ratio` times the page's body size starts a new chunk and
+    becomes the `section` of the chunks that follow it, across pages, until the next
+    heading. Chunks do not span pages so their `page` metadata stays exact.
+    """
+
+    def __init__(self, token_budget: int, token_overlap: int = 0, heading_size_ratio: float = 1.15):
+        self.token_budget = token_budget
+        self.heading_size_ratio = heading_size_ratio
+        self.splitter = FastRecursiveCharacterTextSplitter(token_budget, min(token_overlap, token_budget),
+                                                           length_function=estimate_tokens)
+        self.section: Optional[str] = None
+
+    def chunk_page(self, blocks: List[Tuple[str, float]]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Yields (chunk text, section) for one page's blocks.
+        """
+        sizes = Counter()
+        for text, size in blocks:
+            sizes[size] += len(text)
+        body_size = sizes.most_common(1)[0][0] if sizes else 0.0
+
+        current: List[str] = []
+        current_tokens = 0
+        for text, size in blocks:
+            tokens = estimate_tokens(text)
+            if is_heading(text, size, body_size, self.heading_size_ratio):
+                if current:
+                    yield "\n\n".join(current), self.section
+                self.section = re.sub(r"\s+", " ", text)
+                current, current_tokens = [text], tokens
+            elif tokens > self.token_budget:
+                if current:
+                    yield "\n\n".join(current), self.section
+                    current, current_tokens = [], 0
+                for piece in self.splitter.split_text(text):
+                    yield piece, self.section
+            else:
+                if current and current_tokens + tokens > self.token_budget:
+                    yield "\n\n".join(current), self.section
+                    current, current_tokens = [], 0
+                current.append(text)
+                current_tokens += tokens
+        if current:
+            yield "\n\n".join(current), self.section
+
+
+def iter_pdf_chunks(pdf_url: str, options: ChunkingOptions, file_path: Optional[str] = None,
+                    **extraction) -> Iterator[LangchainDocument]:
+    """
+    Chunks the PDF with the given strategy in one pass over its pages as they are extracted.
+
+    Every chunk keeps its page's metadata and records `chunking_strategy` and its
+    `token_count`, so later stages can batch by tokens without re-counting; layout chunks
+    also record their `section` heading when there is one.
+
+    Args:
+        pdf_url (str): URL or local path of the PDF.
+        options (ChunkingOptions): Strategy and sizes, see `resolve_chunking`.
+        file_path (Optional[str]): Local copy of the PDF, e.g. from the download cache.
+        **extraction: Passed to the page extractor (workers, pages_per_task, min_parallel_pages).
+    """
+    strategy_metadata = {"chunking_strategy": options.strategy}
+    if options.strategy == "layout":
+        chunker = LayoutChunker(options.chunk_size, options.chunk_overlap, config.PDF_HEADING_SIZE_RATIO)
+        for page_metadata, blocks in iter_pdf_page_blocks(pdf_url, file_path=file_path, **extraction):
+            for text, section in chunker.chunk_page(blocks):
+                metadata = {**page_metadata, **strategy_metadata, "token_count": estimate_tokens(text)}
+                if section is not None:
+                    metadata["section"] = section
+                yield LangchainDocument(page_content=text, metadata=metadata)
+        return
+
+    if options.strategy == "characters":
+        splitter = FastRecursiveCharacterTextSplitter(options.chunk_size, options.chunk_overlap)
+    else:
+        splitter = FastRecursiveCharacterTextSplitter(options.chunk_size, options.chunk_overlap,
+                                                      length_function=estimate_tokens)
+    for page in iter_pdf_pages(pdf_url, file_path=file_path, **extraction):
+        for chunk in splitter.split_documents([page]):
+            chunk.metadata.update(strategy_metadata, token_count=estimate_tokens(chunk.page_content))
+            yield chunk
@@ -0,0 +1,204 @@
+import atexit
+import mmap
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pymupdf
+from langchain_community.document_loaders.pdf import PyMuPDFLoader
+from langchain_core.documents import Document as LangchainDocument
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+# PyMuPDF is not thread safe, so documents opened in this process are only used under this lock
+_pymupdf_lock = threading.Lock()
+
+
+@contextmanager
+def open_pdf(file_path: str, password: Optional[str] = None) -> Iterator[pymupdf.Document]:
+    """
+    Opens a PDF through a read-only memory map, so pages are paged in from the OS cache
+    on demand instead of the file being read into memory up front.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            doc = pymupdf.open(stream=view, filetype="pdf")
+            try:
+                if doc.is_encrypted:
+                    doc.authenticate(password)
+                yield doc
+            finally:
+                doc.close()
+        finally:
+            view.release()
+
+
+def pdf_metadata(doc: pymupdf.Document, source: str) -> Dict[str, Any]:
+    """
+    Document metadata as PyMuPDFLoader reports it: the PDF's own string and integer
+    fields with lower-cased keys and ISO formatted dates, plus source and page count.
+    """
+    raw = {"producer": "PyMuPDF", "creator": "PyMuPDF", "creationdate": "", "source": source,
+           "file_path": source, "total_pages": len(doc),
+           **{key: value for key, value in doc.metadata.items() if isinstance(value, (str, int))}}
+    metadata: Dict[str, Any] = {}
+    for key, value in raw.items():
+        key = key.lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                metadata[key] = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                metadata[key] = value
+        else:
+            metadata[key] = value.strip() if isinstance(value, str) else value
+    # The loader reports file_path as source and also keeps the raw PDF dates
+    metadata["source"] = metadata["file_path"]
+    for key in ("modDate", "creationDate"):
+        if key in doc.metadata:
+            metadata[key] = doc.metadata[key]
+    return metadata
+
+
+def extract_page_range(file_path: str, start: int, stop: int, password: Optional[str] = None) -> List[str]:
+    """
+    Extracts the text of pages [start, stop) the way PyMuPDFLoader does.
+
+    Runs in a pool process, which opens its own handle on the file: PyMuPDF documents
+    cannot be shared between processes or used from several threads.
+    """
+    with open_pdf(file_path, password) as doc:
+        return [doc[number].get_text().strip() for number in range(start, stop)]
+
+
+def page_blocks(page: pymupdf.Page) -> List[Tuple[str, float]]:
+    """
+    Text blocks of a page in reading order, with the largest font size used in each.
+    """
+    blocks = []
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:
+            continue
+        spans = [span for line in block["lines"] for span in line["spans"]]
+        text = "\n".join("".join(span["text"] for span in line["spans"]) for line in block["lines"]).strip()
+        if text:
+            blocks.append((text, round(max((span["size"] for span in spans), default=0.0), 2)))
+    return blocks
+
+
+def extract_page_blocks(file_path: str, start: int, stop: int,
+                        password: Optional[str] = None) -> List[List[Tuple[str, float]]]:
+    """
+    Extracts the text blocks of pages [start, stop), see `page_blocks`.
+    """
+    with open_pdf(file_path, password) as doc:
+        return [page_blocks(doc[number]) for number in range(start, stop)]
+
+
+def get_extraction_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the shared extraction pool, created on first use.
+
+    Processes are spawned rather than forked because bytewax workers are threads and
+    forking a multi-threaded process can deadlock the child.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+            logger.info(f"Started PDF extraction pool with {workers} processes")
+        return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+atexit.register(shutdown_extraction_pool)
+
+
+def _iter_page_results(pdf_url: str, extractor: Callable[..., List[Any]], workers: int, pages_per_task: int,
+                       min_parallel_pages: int, file_path: Optional[str]) -> Iterator[Tuple[Dict[str, Any], Any]]:
+    """
+    Runs `extractor` over the PDF's page ranges and yields (page metadata, page result)
+    in page order. See `iter_pdf_pages`.
+    """
+    if file_path is None:
+        # The loader downloads web URLs to a temporary file it removes once garbage collected
+        loader = PyMuPDFLoader(pdf_url)
+        file_path = loader.file_path
+
+    with _pymupdf_lock:
+        with open_pdf(file_path) as doc:
+            page_count = len(doc)
+            doc_metadata = pdf_metadata(doc, pdf_url)
+
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    if workers <= 1 or page_count < max(min_parallel_pages, 1):
+        for start, stop in ranges:
+            # PyMuPDF is not thread safe; the lock is only held while a range is read
+            with _pymupdf_lock:
+                results = extractor(file_path, start, stop)
+            for offset, result in enumerate(results):
+                yield {**doc_metadata, "page": start + offset}, result
+        return
+
+    logger.info(f"Extracting {page_count} pages of {pdf_url} in {len(ranges)} ranges across {workers} processes")
+    pool = get_extraction_pool(workers)
+    futures = [pool.submit(extractor, file_path, start, stop) for start, stop in ranges]
+    try:
+        for (start, _), future in zip(ranges, futures):
+            for offset, result in enumerate(future.result()):
+                yield {**doc_metadata, "page": start + offset}, result
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def iter_pdf_pages(pdf_url: str, workers: int = 4, pages_per_task: int = 16, min_parallel_pages: int = 64,
+                   file_path: Optional[str] = None) -> Iterator[LangchainDocument]:
+    """
+    Yields one document per page of the PDF, in page order, with the same text and
+    metadata as PyMuPDFLoader(pdf_url).load().
+
+    The file is read from `file_path` when given (e.g. a cached download), otherwise
+    downloaded once. PDFs with at least `min_parallel_pages` pages have their page ranges
+    (`pages_per_task` pages each) extracted across `workers` processes, and pages are
+    yielded as soon as their range and every earlier one is done, so splitting starts
+    before the whole book has been read. Smaller PDFs are read range by range in this
+    thread.
+
+    Args:
+        pdf_url (str): URL or local path of the PDF, reported as the pages' source.
+        workers (int): Extraction processes; 1 or less disables the pool.
+        pages_per_task (int): Pages per pool task.
+        min_parallel_pages (int): Page count from which the pool is used.
+        file_path (Optional[str]): Local copy of `pdf_url` to read instead of downloading it.
+    """
+    for metadata, text in _iter_page_results(pdf_url, extract_page_range, workers, pages_per_task,
+                                             min_parallel_pages, file_path):
+        yield LangchainDocument(page_content=text, metadata=metadata)
+
+
+def iter_pdf_page_blocks(pdf_url: str, workers: int = 4, pages_per_task: int = 16, min_parallel_pages: int = 64,
+                         file_path: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], List[Tuple[str, float]]]]:
+    """
+    Like `iter_pdf_pages`, but yields each page's metadata with its text blocks and their
+    font sizes (see `page_blocks`) for layout-aware chunking.
+    """
+    yield from _iter_page_results(pdf_url, extract_page_blocks, workers, pages_per_task, min_parallel_pages, file_path)
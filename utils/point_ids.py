@@ -0,0 +1,32 @@
+import hashlib
+from typing import Iterable, List
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _md5_point_id(value: str) -> str:
+    # Same value as str(uuid.UUID(hex=md5)), formatted without building a UUID object
+    h = hashlib.md5(value.encode("UTF-8")).hexdigest()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def generate_point_ids(values: Iterable[str]) -> List[str]:
+    """
+    Derives deterministic Qdrant point IDs for a batch of vector_ids.
+
+    The IDs are the ones existing collections use (the MD5 digest of the vector_id read
+    as a UUID), formatted straight from the hex digest instead of going through
+    uuid.UUID, which is what makes a batch cheaper than calling generate_uuid_from_string
+    per document.
+
+    Args:
+        values (Iterable[str]): The vector_ids to derive point IDs from.
+
+    Returns:
+        List[str]: One point ID per value, in input order.
+    """
+    ids = [_md5_point_id(value) for value in values]
+    logger.debug(f"Generated {len(ids)} point ids")
+    return ids
@@ -3,13 +3,20 @@ from typing import Callable, Generator, Union, List, Any, Dict, Iterable, Option
 
 from pydantic import BaseModel, Field
 
+from config.config_setting import config
 from models import constants
 from models.document import Document
-from services.user_management_service import user_management_service
+from services.status_publisher import status_client, status_publisher
 from logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Metadata describing a message's position when a job's output is split across messages
+CHUNK_METADATA_KEYS = ("chunk_index", "chunk_count", "is_last_chunk", "total_document_count")
+
+# (job_id, service) pairs with a failed chunk, reported as FAILED once their last chunk is done
+_failed_chunked_jobs = set()
+
 
 class StandardizedMessage(BaseModel):
     """
@@ -33,6 +40,9 @@ def update_status(job_id: str, service: constants.Service, status: constants.Ste
     """
     Update the status of a job for a specific service.
 
+    When STATUS_UPDATE_ASYNC is enabled the update is queued on the background status
+    publisher instead of being sent on the calling (dataflow) thread.
+
     Args:
         job_id (str): The unique identifier of the job.
         service (constants.Service): The service updating the status.
@@ -40,18 +50,108 @@ def update_status(job_id: str, service: constants.Service, status: constants.Ste
     """
     logger.info(f"Updating status for job {job_id}: service={service.value}, status={status.value}")
     try:
-        user_management_service.update_status(job_id, service.value, status.value)
+        if config.STATUS_UPDATE_ASYNC:
+            status_publisher.publish(job_id, service.value, status.value)
+        else:
+            status_client.update_status(job_id, service.value, status.value)
     except Exception as e:
         logger.error(f"Error processing job {job_id}: {str(e)}")
 
 
+def resolve_chunk_status(message: StandardizedMessage, service: constants.Service,
+                         status: constants.StepStatus) -> constants.StepStatus:
+    """
+    Map the outcome of one message to the job status for its step.
+
+    Messages that are one chunk of a larger job only complete the step when they are the
+    last chunk; earlier chunks keep it IN_PROGRESS. A failed chunk makes the step FAILED
+    and keeps it failed until the last chunk has been processed.
+
+    Args:
+        message (StandardizedMessage): The message that was processed.
+        service (constants.Service): The service that processed it.
+        status (constants.StepStatus): The outcome for this message alone.
+
+    Returns:
+        constants.StepStatus: The status to report for the job.
+    """
+    if "is_last_chunk" not in message.metadata:
+        return status
+    key = (message.job_id, service)
+    is_last_chunk = message.metadata["is_last_chunk"]
+    if status == constants.StepStatus.FAILED or key in _failed_chunked_jobs:
+        if is_last_chunk:
+            _failed_chunked_jobs.discard(key)
+        else:
+            _failed_chunked_jobs.add(key)
+        return constants.StepStatus.FAILED
+    return status if is_last_chunk else constants.StepStatus.IN_PROGRESS
+
+
+def is_empty_completion(message: StandardizedMessage) -> bool:
+    """
+    Whether the message is the empty last chunk of a job that had nothing new to process,
+    e.g. a re-ingest without commits since the watermark. Stages pass it on as a success.
+    """
+    return not message.data and message.metadata.get("total_document_count") == 0
+
+
+def start_status(message: StandardizedMessage, service: constants.Service) -> None:
+    """
+    Marks the message's job IN_PROGRESS for the service, unless an earlier chunk failed.
+    """
+    if (message.job_id, service) not in _failed_chunked_jobs:
+        update_status(message.job_id, service, constants.StepStatus.IN_PROGRESS)
+
+
+def finish_status(message: StandardizedMessage, service: constants.Service, result: Any = None,
+                  error: Optional[BaseException] = None) -> List[Any]:
+    """
+    Reports COMPLETE or FAILED for the message from what processing it produced.
+
+    Args:
+        message (StandardizedMessage): The message that was processed.
+        service (constants.Service): The service that processed it.
+        result: A single result, an iterable of results or None.
+        error (Optional[BaseException]): The exception processing raised, if any.
+
+    Returns:
+        List[Any]: The results as a list, or [None] when processing failed or produced nothing.
+    """
+    job_id = message.job_id
+    if error is not None:
+        logger.error(f"Error processing job {job_id}: {str(error)}")
+        update_status(job_id, service, resolve_chunk_status(message, service, constants.StepStatus.FAILED))
+        return [None]  # Return an iterable with None to indicate failure
+
+    if isinstance(result, Generator) or (
+            isinstance(result, Iterable) and not isinstance(result, (str, bytes, StandardizedMessage))):
+        results = list(result)
+    elif result is None:
+        results = []
+    else:
+        results = [result]
+
+    if not any(results):
+        logger.warning(f"Processing yielded no results for job {job_id}")
+        status = constants.StepStatus.FAILED
+        results = [None]  # Ensure we always return an iterable
+    else:
+        logger.info(f"Processing successful for job {job_id}")
+        status = constants.StepStatus.COMPLETE
+
+    update_status(job_id, service, resolve_chunk_status(message, service, status))
+    return results
+
+
 def status_updater(service: constants.Service):
     """
     A decorator that wraps a function to provide automatic status updates for a job.
 
     This decorator handles both regular functions and generator functions. It updates
     the job status to IN_PROGRESS before execution, and then to COMPLETE or FAILED
-    after execution, depending on the result.
+    after execution, depending on the result. For chunked jobs the step only becomes
+    COMPLETE once the last chunk has been processed.
 
     Args:
         service (constants.Service): The service that is processing the job.
@@ -69,37 +169,59 @@ def status_updater(service: constants.Service):
     def decorator(func: Callable[[StandardizedMessage], Union[StandardizedMessage, None, Generator, Iterable]]):
         @wraps(func)
         def wrapper(message: StandardizedMessage) -> Iterable[Union[StandardizedMessage, None]]:
-            job_id = message.job_id
-
             try:
+                start_status(message, service)
+                # finish_status consumes generators, so errors raised while iterating count as failures
+                return finish_status(message, service, func(message))
+            except Exception as e:
+                return finish_status(message, service, error=e)
+
+        return wrapper
 
-                update_status(job_id, service, constants.StepStatus.IN_PROGRESS)
+    return decorator
 
-                result = func(message)
 
-                if isinstance(result, Generator) or (
-                        isinstance(result, Iterable) and not isinstance(result, (str, bytes, StandardizedMessage))):
-                    results = list(result)
-                elif result is None:
-                    results = []
-                else:
-                    results = [result]
+def batch_status_updater(service: constants.Service):
+    """
+    Like `status_updater`, for functions that process a batch of messages at once.
 
-                if not any(results):
-                    logger.warning(f"Processing yielded no results for job {job_id}")
-                    status = constants.StepStatus.FAILED
-                    results = [None]  # Ensure we always return an iterable
-                else:
-                    logger.info(f"Processing successful for job {job_id}")
-                    status = constants.StepStatus.COMPLETE
+    The wrapped function takes a list of messages and returns one list of results per
+    message. Each message's job is set IN_PROGRESS before the call and COMPLETE or FAILED
+    afterwards depending on its own results, so jobs sharing a batch are reported
+    independently. The wrapper takes the `(key, messages)` pairs produced by `op.collect`
+    and returns the flattened results.
 
-                update_status(job_id, service, status)
-                return results
+    Args:
+        service (constants.Service): The service that is processing the jobs.
+
+    Returns:
+        Callable: A decorator function.
+    """
+
+    def decorator(func: Callable[[List[StandardizedMessage]], List[List[Any]]]):
+        @wraps(func)
+        def wrapper(keyed_batch) -> List[Any]:
+            _, messages = keyed_batch
+            for message in messages:
+                if (message.job_id, service) not in _failed_chunked_jobs:
+                    update_status(message.job_id, service, constants.StepStatus.IN_PROGRESS)
 
+            try:
+                batch_results = func(messages)
             except Exception as e:
-                logger.error(f"Error processing job {job_id}: {str(e)}")
-                update_status(job_id, service, constants.StepStatus.FAILED)
-                return [None]  # Return an iterable with None to indicate failure
+                logger.error(f"Error processing batch of {len(messages)} messages: {str(e)}")
+                batch_results = [[] for _ in messages]
+
+            results = []
+            for message, message_results in zip(messages, batch_results):
+                if any(message_results) or is_empty_completion(message):
+                    status = constants.StepStatus.COMPLETE
+                    results.extend(message_results)
+                else:
+                    logger.warning(f"Processing yielded no results for job {message.job_id}")
+                    status = constants.StepStatus.FAILED
+                update_status(message.job_id, service, resolve_chunk_status(message, service, status))
+            return results
 
         return wrapper
 
@@ -0,0 +1,146 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document as LangchainDocument
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class FastRecursiveCharacterTextSplitter:
+    """
+    Drop-in replacement for langchain's RecursiveCharacterTextSplitter with its default
+    options (literal separators kept at the start of each piece, whitespace stripped),
+    producing exactly the same chunks for the same `length_function`.
+
+    langchain splits with `re.split`, builds a new string for every piece and joins
+    them again for every chunk. Because the separators are kept, the pieces of a chunk
+    are always contiguous in the source text, so here pieces are only boundary offsets
+    found with `str.find`, every chunk is a single slice of the source, and chunk edges
+    are found by binary search over the boundaries instead of adding pieces one at a
+    time. With a length function other than `len` (e.g. a token counter) the search
+    runs over running totals of the pieces' lengths instead, the same additive measure
+    langchain uses.
+    """
+
+    def __init__(self, chunk_size: int = 4000, chunk_overlap: int = 200,
+                 separators: Optional[Iterable[str]] = None, strip_whitespace: bool = True,
+                 length_function: Callable[[str], int] = len):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if chunk_overlap < 0:
+            raise ValueError(f"chunk_overlap must be >= 0, got {chunk_overlap}")
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), "
+                             f"should be smaller.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators or DEFAULT_SEPARATORS)
+        self.strip_whitespace = strip_whitespace
+        self.length_function = length_function
+
+    def _boundaries(self, text: str, start: int, end: int, separator: str) -> List[int]:
+        """
+        Offsets where the non-empty pieces of text[start:end] begin, followed by `end`.
+        """
+        if not separator:
+            return list(range(start, end + 1))
+        boundaries = [start]
+        position = text.find(separator, start, end)
+        step = len(separator)
+        while position != -1:
+            if position != start:
+                boundaries.append(position)
+            position = text.find(separator, position + step, end)
+        if end != boundaries[-1]:
+            boundaries.append(end)
+        return boundaries
+
+    def _running_lengths(self, text: str, boundaries: List[int]) -> List[int]:
+        """
+        Running totals of the pieces' lengths, each piece counted with the length of the
+        (empty) join separator that langchain adds between pieces.
+        """
+        if self.length_function is len:
+            # Offsets already are running character counts
+            return boundaries
+        separator_length = self.length_function("")
+        lengths = [0]
+        for start, end in zip(boundaries, boundaries[1:]):
+            lengths.append(lengths[-1] + self.length_function(text[start:end]) + separator_length)
+        return lengths
+
+    def _merge(self, text: str, boundaries: List[int], lengths: List[int], first: int, last: int,
+               chunks: List[str]) -> None:
+        """
+        Merges pieces first..last-1, all shorter than chunk_size, into overlapping chunks.
+
+        Equivalent to langchain's piece-by-piece `_merge_splits`: each chunk takes as many
+        pieces as fit, and the next one starts from the shortest tail of it that is within
+        chunk_overlap and leaves room for the piece that did not fit (or is empty). The
+        length of pieces i..j-1 joined is lengths[j] - lengths[i] - separator_length.
+        """
+        size, overlap = self.chunk_size, self.chunk_overlap
+        separator_length = 0 if self.length_function is len else self.length_function("")
+        while True:
+            # Last boundary within chunk_size of the chunk's start
+            stop = bisect_right(lengths, lengths[first] + size + separator_length, first, last + 1) - 1
+            self._emit(text, boundaries[first], boundaries[stop], chunks)
+            if stop == last:
+                return
+            tail_end = lengths[stop] - separator_length
+            within_overlap = bisect_left(lengths, tail_end - overlap, first, stop + 1)
+            leaves_room = min(bisect_left(lengths, lengths[stop + 1] - separator_length - size, first, stop + 1),
+                              bisect_left(lengths, tail_end, first, stop + 1))
+            first = max(within_overlap, leaves_room)
+
+    def _emit(self, text: str, start: int, end: int, chunks: List[str]) -> None:
+        chunk = text[start:end]
+        if self.strip_whitespace:
+            chunk = chunk.strip()
+        if chunk:
+            chunks.append(chunk)
+
+    def _split(self, text: str, start: int, end: int, separators: Tuple[str, ...], chunks: List[str]) -> None:
+        separator = separators[-1]
+        remaining: Tuple[str, ...] = ()
+        for index, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[index + 1:]
+                break
+
+        boundaries = self._boundaries(text, start, end, separator)
+        lengths = self._running_lengths(text, boundaries)
+        size = self.chunk_size
+        pieces = len(boundaries) - 1
+        # Runs of pieces shorter than chunk_size are merged; longer pieces are split further
+        run_start = 0
+        separator_length = 0 if self.length_function is len else self.length_function("")
+        for index in [i for i in range(pieces) if lengths[i + 1] - lengths[i] - separator_length >= size]:
+            if index > run_start:
+                self._merge(text, boundaries, lengths, run_start, index, chunks)
+            if remaining:
+                self._split(text, boundaries[index], boundaries[index + 1], remaining, chunks)
+            else:
+                chunks.append(text[boundaries[index]:boundaries[index + 1]])
+            run_start = index + 1
+        if run_start < pieces:
+            self._merge(text, boundaries, lengths, run_start, pieces, chunks)
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        self._split(text, 0, len(text), self.separators, chunks)
+        return chunks
+
+    def create_documents(self, texts: List[str],
+                         metadatas: Optional[List[Dict[str, Any]]] = None) -> List[LangchainDocument]:
+        metadatas = metadatas or [{}] * len(texts)
+        return [LangchainDocument(page_content=chunk, metadata=dict(metadata))
+                for text, metadata in zip(texts, metadatas) for chunk in self.split_text(text)]
+
+    def split_documents(self, documents: Iterable[LangchainDocument]) -> List[LangchainDocument]:
+        documents = list(documents)
+        return self.create_documents([doc.page_content for doc in documents], [doc.metadata for doc in documents])